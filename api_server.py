@@ -315,6 +315,8 @@ async def generate_video_async(topic: str, context: str, max_scenes: int, task_i
                 only_plan=False,
                 specific_scenes=list(range(1, max_scenes + 1))
             )
+            # The pipeline records its outcome in the state store; use it when no result is returned
+            result = result or video_generator.get_pipeline_result(topic)
 
             if result and result.get('success'):
                 # Check for generated video files
@@ -701,6 +703,10 @@ async def get_example_usage():
 if __name__ == "__main__":
     # Setup environment
     setup_environment()
+
+    # Load shared read-only resources once, before the server takes its first request
+    from src.core.resource_registry import preload_shared_resources
+    preload_shared_resources()
     
     # Run the API server
     uvicorn.run(
@@ -11,6 +11,7 @@ from moviepy import VideoFileClip
 
 from mllm_tools.litellm import LiteLLMWrapper
 from mllm_tools.gemini import GeminiWrapper
+from mllm_tools.single_flight import with_coalescing
 from eval_suite.utils import calculate_geometric_mean
 from eval_suite.text_utils import parse_srt_to_text, fix_transcript, evaluate_text
 from eval_suite.video_utils import evaluate_video_chunk_new
@@ -401,6 +402,12 @@ def main():
         temperature=0.0,
     )
 
+    # Worker threads evaluating different theorems may issue identical requests
+    if Config.USE_REQUEST_COALESCING:
+        text_model = with_coalescing(text_model)
+        video_model = with_coalescing(video_model)
+        image_model = with_coalescing(image_model)
+
     models = {
         'text': text_model,
         'video': video_model,
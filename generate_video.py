@@ -1,7 +1,7 @@
 import os
 import json
 import random
-from typing import Union, List, Dict, Optional
+from typing import Union, List, Dict, Optional, Tuple
 import subprocess
 import argparse
 import glob
@@ -9,17 +9,31 @@ from PIL import Image
 import re
 from dotenv import load_dotenv
 import asyncio
+import copy
+import threading
+import time
 import uuid # Import uuid for generating trace_id
 import warnings
 from pydantic import ConfigDict
 
 from mllm_tools.litellm import LiteLLMWrapper
+from mllm_tools.router import ModelRouter
+from mllm_tools.single_flight import with_coalescing
+from mllm_tools.usage import get_usage_tracker
 from mllm_tools.utils import _prepare_text_inputs # Keep _prepare_text_inputs if still used directly in main
 
 # Import new modules
 from src.core.video_planner import VideoPlanner
 from src.core.code_generator import CodeGenerator
 from src.core.video_renderer import VideoRenderer
+from src.core.plan_cache import PlanCache
+from src.core.local_agent_memory import LocalAgentMemory
+from src.core.auto_fixer import AutoFixer
+from src.core.pipeline_state import (PipelineStateStore, stage_index, backfill_topic, backfill_output_dir,
+                                     status_from_state, topic_file_prefix)
+from src.core.scheduler import get_scheduler, configure_scheduler
+from src.core.speculative import (SpeculationPolicy, CANDIDATE_VARIANTS, DEFAULT_DIFFICULTY, infer_difficulty,
+                                  make_candidate_model, preflight_code, race_candidates)
 from src.utils.utils import _print_response, _extract_code, extract_xml, extract_xml_tag # Import utility functions
 from src.config.config import Config # Import Config class
 
@@ -32,7 +46,7 @@ from src.core.parse_video import (
     get_images_from_video,
     image_with_most_non_black_space
 )
-from task_generator import get_banned_reasonings
+from src.core.resource_registry import get_banned_reasonings, get_json_resource
 from task_generator.prompts_raw import (_code_font_size, _code_disable, _code_limit, _prompt_manim_cheatsheet)
 
 # Suppress Pydantic serialization warnings
@@ -42,8 +56,7 @@ warnings.filterwarnings("ignore", category=DeprecationWarning, module="mem0")
 
 # Load allowed models list from JSON file
 allowed_models_path = os.path.join(os.path.dirname(__file__), 'src', 'utils', 'allowed_models.json')
-with open(allowed_models_path, 'r') as f:
-    allowed_models = json.load(f).get("allowed_models", [])
+allowed_models = get_json_resource(allowed_models_path, default={}).get("allowed_models", [])
 
 load_dotenv(override=True)
 
@@ -74,6 +87,11 @@ class VideoGenerator:
         use_memvid (bool, optional): Whether to use Memvid for error patterns and learning
         memvid_video_file (str): Path to Memvid video file
         memvid_index_file (str): Path to Memvid index file
+        use_plan_cache (bool, optional): Whether to warm-start planning from cached plans of similar topics
+        use_speculative_codegen (bool, optional): Whether to race several code candidates per scene
+        use_streaming_outline (bool, optional): Whether to start planning scenes while the outline is still streaming
+        use_model_routing (bool, optional): Whether to route auxiliary helper calls to faster models by stage
+        use_auto_fixer (bool, optional): Whether to try rule-based fixes before LLM error fixing
 
     Attributes:
         output_dir (str): Directory for output files
@@ -106,11 +124,20 @@ class VideoGenerator:
                  use_appwrite=True,
                  use_memvid=None,
                  memvid_video_file="manim_memory.mp4",
-                 memvid_index_file="manim_memory_index.json"):
+                 memvid_index_file="manim_memory_index.json",
+                 use_plan_cache=None,
+                 use_speculative_codegen=None,
+                 use_streaming_outline=None,
+                 use_model_routing=None,
+                 use_auto_fixer=None):
         self.output_dir = output_dir
         self.verbose = verbose
         self.session_id = self._load_or_create_session_id()  # Modified to load existing or create new
         self.scene_semaphore = asyncio.Semaphore(max_scene_concurrency)
+        # Process-wide LLM and render slots shared with every other topic in this process
+        self.scheduler = get_scheduler()
+        # Per-topic and per-scene progress, so resumed runs skip straight to the first incomplete step
+        self.state_store = PipelineStateStore(os.path.join(output_dir, "pipeline_state.db"))
         self.banned_reasonings = get_banned_reasonings()
 
         # Agent memory will be initialized by CodeGenerator when use_agent_memory=True
@@ -129,6 +156,18 @@ class VideoGenerator:
 
         self.use_appwrite = use_appwrite
 
+        # Route auxiliary helper stages (plugin detection, RAG and Tavily queries) to faster models
+        self.use_model_routing = Config.USE_MODEL_ROUTING if use_model_routing is None else use_model_routing
+        self.model_router = None
+        if self.use_model_routing:
+            helper_model = self.model_router = self._build_model_router(helper_model if helper_model is not None else planner_model)
+
+        # Coalesce identical concurrent requests across scenes and topics
+        if Config.USE_REQUEST_COALESCING:
+            planner_model = with_coalescing(planner_model)
+            scene_model = with_coalescing(scene_model)
+            helper_model = with_coalescing(helper_model)
+
         # Initialize the planner with the model instance, not a string
         self.planner_model = planner_model
 
@@ -162,7 +201,8 @@ class VideoGenerator:
             chroma_db_path=chroma_db_path,
             manim_docs_path=manim_docs_path,
             embedding_model=embedding_model,
-            use_langfuse=use_langfuse
+            use_langfuse=use_langfuse,
+            scheduler=self.scheduler
         )
         self.code_generator = CodeGenerator(
             scene_model=scene_model if scene_model is not None else self.planner_model, # Pass the model
@@ -189,6 +229,96 @@ class VideoGenerator:
             use_visual_fix_code=self.use_visual_fix_code
         )
 
+        # Semantic cache of plans from similar topics, used as a warm start for planning
+        self.use_plan_cache = Config.USE_PLAN_CACHE if use_plan_cache is None else use_plan_cache
+        self.plan_cache = None
+        if self.use_plan_cache:
+            try:
+                self.plan_cache = PlanCache(
+                    cache_dir=Config.PLAN_CACHE_DIR,
+                    embedding_model=embedding_model,
+                    reuse_threshold=Config.PLAN_CACHE_REUSE_THRESHOLD,
+                    adapt_threshold=Config.PLAN_CACHE_ADAPT_THRESHOLD,
+                    max_entries=Config.PLAN_CACHE_MAX_ENTRIES
+                )
+                print(f"🗂️ Plan cache enabled at {Config.PLAN_CACHE_DIR}")
+            except Exception as e:
+                print(f"⚠️ Plan cache initialization failed: {e}")
+
+        # Best-of-N code generation sized from measured first-try success rates
+        self.use_speculative_codegen = Config.USE_SPECULATIVE_CODEGEN if use_speculative_codegen is None else use_speculative_codegen
+        self.speculation_policy = None
+        if self.use_speculative_codegen:
+            self.speculation_policy = SpeculationPolicy(
+                stats_path=Config.SPECULATION_STATS_PATH,
+                max_candidates=Config.SPECULATIVE_MAX_CANDIDATES,
+                target_success=Config.SPECULATIVE_TARGET_SUCCESS
+            )
+            print(f"🏁 Speculative code generation enabled (up to {self.speculation_policy.max_candidates} candidates per scene)")
+
+        # Mechanical render errors are fixed by rules; the LLM only sees errors no rule handles
+        self.use_auto_fixer = Config.USE_AUTO_FIXER if use_auto_fixer is None else use_auto_fixer
+        self.auto_fixer = AutoFixer(stats_path=Config.AUTO_FIXER_STATS_PATH) if self.use_auto_fixer else None
+
+        # Plan each scene as soon as its outline block is streamed instead of after the whole outline
+        self.use_streaming_outline = Config.USE_STREAMING_OUTLINE if use_streaming_outline is None else use_streaming_outline
+
+    def report_usage(self) -> None:
+        """
+        Print per-generation token, latency and cost totals since the last report and save them
+        to usage_summary.json in the output directory, followed by scheduler utilization.
+        The totals are reset, so a long-lived server or worker reports each run separately.
+        """
+        tracker = get_usage_tracker()
+        usage = tracker.take_summary()
+        tracker.print_summary(usage)
+        tracker.save(os.path.join(self.output_dir, "usage_summary.json"), usage)
+        self.scheduler.print_report()
+        if self.model_router:
+            self.model_router.print_report()
+        if self.auto_fixer:
+            print(f"\n🔧 Auto-fixer: {self.auto_fixer.get_metrics()}")
+        print(f"🧹 Code extraction: {self.code_generator.get_extraction_metrics()}")
+        tavily_metrics = self.code_generator.get_tavily_metrics()
+        if tavily_metrics:
+            print(f"🌐 Tavily stages: {tavily_metrics}")
+        agent_memory = self.code_generator.agent_memory
+        if agent_memory is not None and agent_memory.enabled:
+            print(f"🧠 Memory lookups: {agent_memory.lookup_memo.get_metrics()}")
+        if isinstance(agent_memory, LocalAgentMemory):
+            print(f"🗄️ Local agent memory: {agent_memory.get_memory_stats()}")
+        if agent_memory is not None and agent_memory.write_queue is not None and not agent_memory.write_queue.closed:
+            print(f"🧠 Memory write-behind: {agent_memory.write_queue.get_metrics()}")
+        if self.use_visual_fix_code:
+            print(f"📐 Layout checks: {self.video_renderer.get_layout_metrics()}")
+
+    @staticmethod
+    def _build_model_router(helper_model) -> ModelRouter:
+        """
+        Build the per-stage router for helper calls: the given helper model as the heavy tier,
+        followed by the configured fast and lite models.
+
+        Args:
+            helper_model: Model used for unrouted helper stages
+
+        Returns:
+            ModelRouter: Router proxy usable wherever the helper model was
+        """
+        tiers = {"heavy": helper_model}
+        for tier, model_name in (("fast", Config.FAST_HELPER_MODEL), ("lite", Config.LITE_HELPER_MODEL)):
+            if model_name and model_name not in {getattr(m, "model_name", None) for m in tiers.values()}:
+                tiers[tier] = LiteLLMWrapper(
+                    model_name=model_name,
+                    temperature=getattr(helper_model, "temperature", Config.DEFAULT_MODEL_TEMPERATURE),
+                    print_cost=Config.MODEL_PRINT_COST,
+                    verbose=Config.MODEL_VERBOSE,
+                    use_langfuse=Config.USE_LANGFUSE
+                )
+        router = ModelRouter(tiers, slo_seconds=Config.HELPER_LATENCY_SLO)
+        tier_names = ", ".join(f"{tier}={getattr(model, 'model_name', model)}" for tier, model in tiers.items())
+        print(f"🧭 Model routing enabled: {tier_names}")
+        return router
+
     def _load_or_create_session_id(self) -> str:
         """
         Load existing session ID from file or create a new one.
@@ -266,6 +396,45 @@ class VideoGenerator:
         scene_outline = self.planner.generate_scene_outline(topic, description, session_id)
         return scene_outline
 
+    async def _stream_outline_and_plan(self, topic: str, description: str, session_id: str, file_prefix: str,
+                                       specific_scenes: Optional[List[int]], early_plan_tasks: Dict[int, asyncio.Task]) -> str:
+        """
+        Stream the scene outline and start planning every scene as soon as its block is complete.
+
+        Args:
+            topic (str): The topic of the video
+            description (str): Description of the video content
+            session_id (str): Session identifier
+            file_prefix (str): Prefix for file naming
+            specific_scenes (List[int], optional): Only these scenes are planned early
+            early_plan_tasks (Dict[int, asyncio.Task]): Filled with scene number -> task returning (plan, seconds)
+
+        Returns:
+            str: Generated and extracted scene outline
+        """
+        async def plan_scene(scene_num: int, scene_block: str) -> Tuple[str, float]:
+            async with self.scene_semaphore:
+                plan_start = time.monotonic()
+                implementation_plan = await self._generate_scene_implementation_single(
+                    topic, description, scene_block, scene_num, file_prefix, session_id, str(uuid.uuid4()))
+            return implementation_plan, time.monotonic() - plan_start
+
+        scene_outline = None
+        async for scene_num, scene_block in self.planner.stream_scene_outline(topic, description, session_id):
+            if scene_num is None:
+                scene_outline = scene_block
+            elif scene_num not in early_plan_tasks and (specific_scenes is None or scene_num in specific_scenes):
+                print(f"📡 Scene {scene_num} outline received, starting its implementation plan")
+                early_plan_tasks[scene_num] = asyncio.create_task(plan_scene(scene_num, scene_block))
+        return scene_outline
+
+    @staticmethod
+    def _cancel_early_plans(early_plan_tasks: Dict[int, asyncio.Task]) -> None:
+        """Cancel scene plans started from a streamed outline that will not be used."""
+        for task in early_plan_tasks.values():
+            task.cancel()
+        early_plan_tasks.clear()
+
     async def generate_scene_implementation(self,
                                       topic: str,
                                       description: str,
@@ -346,6 +515,99 @@ class VideoGenerator:
 
         return implementation_plans
 
+    def _load_or_create_scene_trace_id(self, file_prefix: str, scene_number: int) -> str:
+        """
+        Load the trace id saved for a scene, or create and save a new one.
+
+        Args:
+            file_prefix (str): Sanitized topic prefix
+            scene_number (int): Scene number
+
+        Returns:
+            str: Scene trace identifier
+        """
+        subplan_dir = os.path.join(self.output_dir, file_prefix, f"scene{scene_number}", "subplans")
+        os.makedirs(subplan_dir, exist_ok=True)  # Create directories if they don't exist
+
+        scene_trace_id_path = os.path.join(subplan_dir, "scene_trace_id.txt")
+        try:
+            with open(scene_trace_id_path, 'r') as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            scene_trace_id = str(uuid.uuid4())
+            with open(scene_trace_id_path, 'w') as f:
+                f.write(scene_trace_id)
+            return scene_trace_id
+
+    def _scene_needs_processing(self, file_prefix: str, scene_number: int, only_render: bool) -> bool:
+        """
+        Decide whether a scene still has to go through code generation and rendering.
+
+        Args:
+            file_prefix (str): Sanitized topic prefix
+            scene_number (int): Scene number
+            only_render (bool): In only_render mode only scenes without code are processed
+
+        Returns:
+            bool: True if the scene should be processed
+        """
+        scene_state = self.state_store.get_scene(file_prefix, scene_number)
+        if scene_state is not None:
+            required_stage = "coded" if only_render else "rendered"
+            return stage_index(scene_state["stage"]) < stage_index(required_stage)
+
+        scene_dir = os.path.join(self.output_dir, file_prefix, f"scene{scene_number}")
+        if only_render:
+            code_dir = os.path.join(scene_dir, "code")
+            has_code = os.path.exists(code_dir) and any(f.endswith('.py') for f in os.listdir(code_dir))
+            return not has_code
+        return not os.path.exists(os.path.join(scene_dir, "succ_rendered.txt"))
+
+    def _load_plans_from_state(self, topic_state: Dict) -> Dict[int, Optional[str]]:
+        """
+        Read the implementation plans recorded in a topic's state, without probing scene directories.
+
+        Args:
+            topic_state (Dict): Topic record from the state store
+
+        Returns:
+            Dict[int, Optional[str]]: Plan per scene number, None where the scene is not planned yet
+        """
+        implementation_plans = {}
+        for scene_number, scene in topic_state["scenes"].items():
+            plan_path = scene["artifacts"].get("plan")
+            implementation_plans[scene_number] = None
+            if plan_path and stage_index(scene["stage"]) >= stage_index("planned"):
+                try:
+                    with open(plan_path, "r", encoding='utf-8') as f:
+                        plan = f.read()
+                except OSError:
+                    print(f"Missing implementation plan for scene {scene_number}")
+                    continue
+                # Drop the header added by VideoPlanner.save_implementation_plan
+                implementation_plans[scene_number] = re.sub(r'^# Scene \d+ Implementation Plan\n\n', '', plan)
+        return implementation_plans
+
+    def get_pipeline_result(self, topic: str) -> Dict:
+        """
+        Summarise a topic's outcome from the state store.
+
+        Args:
+            topic (str): The topic of the video
+
+        Returns:
+            Dict: success flag, combined_video_path and error message
+        """
+        file_prefix = re.sub(r'[^a-z0-9_]+', '_', topic.lower())
+        topic_state = self.state_store.get_topic(file_prefix)
+        if topic_state is None:
+            return {"success": False, "error": f"No pipeline state recorded for '{topic}'"}
+        return {
+            "success": topic_state["status"] == "completed",
+            "combined_video_path": topic_state["combined_path"],
+            "error": topic_state["error"],
+        }
+
     async def render_video_fix_code(self,
                               topic: str,
                               description: str,
@@ -381,19 +643,7 @@ class VideoGenerator:
         # Create tasks for each scene
         tasks = []
         for i, implementation_plan in enumerate(implementation_plans):
-            # Try to load scene trace id, or generate new one if it doesn't exist
-            scene_dir = os.path.join(self.output_dir, file_prefix, f"scene{i+1}")
-            subplan_dir = os.path.join(scene_dir, "subplans")
-            os.makedirs(subplan_dir, exist_ok=True)  # Create directories if they don't exist
-            
-            scene_trace_id_path = os.path.join(subplan_dir, "scene_trace_id.txt")
-            try:
-                with open(scene_trace_id_path, 'r') as f:
-                    scene_trace_id = f.read().strip()
-            except FileNotFoundError:
-                scene_trace_id = str(uuid.uuid4())
-                with open(scene_trace_id_path, 'w') as f:
-                    f.write(scene_trace_id)
+            scene_trace_id = self._load_or_create_scene_trace_id(file_prefix, i + 1)
 
             # Get the scene ID for this scene
             scene_id = scene_ids[i] if i < len(scene_ids) else None
@@ -412,7 +662,140 @@ class VideoGenerator:
             # Re-raise the exception to propagate the failure up the call stack
             raise Exception(error_msg)
 
-    async def process_scene(self, i: int, scene_outline: str, scene_implementation: str, topic: str, description: str, max_retries: int, file_prefix: str, session_id: str, scene_trace_id: str, scene_id: str = None): # added scene_trace_id and scene_id
+    async def _generate_code_speculatively(self, num_candidates: int, difficulty: str, topic: str, description: str,
+                                           scene_outline: str, scene_implementation: str, curr_scene: int,
+                                           additional_context: List[str], file_prefix: str, code_dir: str,
+                                           media_dir: str, session_id: str, scene_trace_id: str,
+                                           rag_queries_cache: Dict) -> Tuple[str, str, Optional[str]]:
+        """
+        Generate several code candidates concurrently and keep the first one that validation-renders.
+
+        Candidates differ in sampling temperature and prompt emphasis. Each one is pre-flighted
+        (parse + Scene check) and dry-run rendered; as soon as one succeeds the rest are cancelled
+        and their streamed generations stopped. Only the winner is stored in agent memory.
+
+        Args:
+            num_candidates (int): Number of candidates to race
+            difficulty (str): Difficulty level the outcomes are recorded under
+            topic (str): The topic of the video
+            description (str): Description of the video content
+            scene_outline (str): Overall scene outline
+            scene_implementation (str): Implementation plan for this scene
+            curr_scene (int): Scene number
+            additional_context (List[str]): Context shared by every candidate
+            file_prefix (str): Prefix for file naming
+            code_dir (str): Scene code directory; candidates are written to its candidates/ subfolder
+            media_dir (str): Directory for Manim media output
+            session_id (str): Session identifier for tracking
+            scene_trace_id (str): Trace identifier for this scene
+            rag_queries_cache (Dict): Cache for RAG queries shared by the candidates
+
+        Returns:
+            Tuple[str, str, Optional[str]]: Chosen code, its generation log and its validation
+                error (None when a candidate rendered)
+        """
+        candidates_dir = os.path.join(code_dir, "candidates")
+        os.makedirs(candidates_dir, exist_ok=True)
+        logs = {}
+        # Set once the race is decided so the losers' streamed generations stop at their next chunk
+        cancel_event = threading.Event()
+
+        def make_candidate(index: int):
+            temperature_offset, hint = CANDIDATE_VARIANTS[index]
+            generator = copy.copy(self.code_generator)
+            generator.scene_model = make_candidate_model(self.code_generator.scene_model, temperature_offset)
+            context = additional_context + [hint] if hint else additional_context
+
+            async def run_candidate() -> Tuple[str, Optional[str]]:
+                async with self.scheduler.slot("llm", topic):
+                    code, log = await asyncio.to_thread(
+                        generator.generate_manim_code,
+                        topic=topic,
+                        description=description,
+                        scene_outline=scene_outline,
+                        scene_implementation=scene_implementation,
+                        scene_number=curr_scene,
+                        additional_context=context,
+                        scene_trace_id=scene_trace_id,
+                        session_id=session_id,
+                        rag_queries_cache=rag_queries_cache,
+                        cancel_event=cancel_event,
+                        store_in_memory=False
+                    )
+                logs[index] = log
+                file_path = os.path.join(candidates_dir, f"{file_prefix}_scene{curr_scene}_candidate{index}.py")
+                with open(file_path, "w", encoding='utf-8') as f:
+                    f.write(code)
+
+                error = preflight_code(code)
+                if error is None:
+                    async with self.scheduler.slot("render", topic):
+                        error = await self.video_renderer.validate_scene(file_path, media_dir)
+                # Only finished candidates are recorded. Stopping at the first success keeps the success
+                # ratio unbiased, while counting the stopped candidates as failures would not
+                self.speculation_policy.record(difficulty, error is None)
+                print(f"{'✅' if error is None else '❌'} Scene {curr_scene} candidate {index} "
+                      f"{'validated' if error is None else 'failed validation'}")
+                return code, error
+
+            return run_candidate
+
+        print(f"🏁 Racing {num_candidates} code candidates for scene {curr_scene} ({difficulty})")
+        try:
+            winner, results = await race_candidates([make_candidate(index) for index in range(num_candidates)])
+        finally:
+            cancel_event.set()
+        if winner is not None:
+            print(f"🏆 Scene {curr_scene}: candidate {winner} won, "
+                  f"stopped {num_candidates - len(results)} unfinished candidates")
+            code, error = results[winner]
+            await asyncio.to_thread(self.code_generator.store_generation_in_memory,
+                                    topic, scene_outline, scene_implementation, curr_scene, code)
+            return code, logs.get(winner, ""), None
+
+        # No candidate rendered: continue the fix loop from the first candidate that produced code
+        index = min((i for i, (code, _) in results.items() if code), default=min(results))
+        code, error = results[index]
+        print(f"⚠️ Scene {curr_scene}: no candidate rendered, fixing candidate {index}")
+        return code, logs.get(index, ""), error
+
+    async def _visual_fix_scene(self, code: str, file_path: str, curr_scene: int, curr_version: int, media_dir: str,
+                                layout_issues: List[str], topic: str, scene_trace_id: str, session_id: str,
+                                implementation_plan: str) -> str:
+        """
+        Run visual self-reflection on a rendered scene and render its fix, each step under its own slot.
+
+        Args:
+            code (str): Code of the rendered scene
+            file_path (str): Path to the scene code file
+            curr_scene (int): Scene number
+            curr_version (int): Code version that rendered
+            media_dir (str): Directory for Manim media output
+            layout_issues (List[str]): Layout check findings passed to the model
+            topic (str): Video topic
+            scene_trace_id (str): Trace identifier for this scene
+            session_id (str): Session identifier
+            implementation_plan (str): Scene implementation plan
+
+        Returns:
+            str: Code of the rendered video
+        """
+        async with self.scheduler.slot("llm", topic):
+            new_code = await self.video_renderer.visual_review(
+                code, curr_scene, curr_version, layout_issues,
+                visual_self_reflection_func=self.code_generator.visual_self_reflection,
+                banned_reasonings=self.banned_reasonings,
+                scene_trace_id=scene_trace_id,
+                topic=topic,
+                session_id=session_id,
+                implementation_plan=implementation_plan
+            )
+        if new_code is None:
+            return code
+        async with self.scheduler.slot("render", topic):
+            return await self.video_renderer.apply_visual_fix(code, new_code, file_path, curr_scene, media_dir)
+
+    async def process_scene(self, i: int, scene_outline: str, scene_implementation: str, topic: str, description: str, max_retries: int, file_prefix: str, session_id: str, scene_trace_id: str, scene_id: str = None, difficulty: str = None): # added scene_trace_id and scene_id
         """
         Process a single scene using CodeGenerator and VideoRenderer.
 
@@ -427,6 +810,7 @@ class VideoGenerator:
             session_id (str): Session identifier for tracking
             scene_trace_id (str): Trace identifier for this scene
             scene_id (str, optional): Scene ID for database tracking
+            difficulty (str, optional): Difficulty level used to size speculative code generation
             
         Raises:
             Exception: When max retries are reached for this scene
@@ -519,18 +903,33 @@ class VideoGenerator:
                 print(f"⚠️ Scene {scene_num} upload failed: {e}")
 
         async with self.scene_semaphore:
-            # Step 3A: Generate initial manim code
-            code, log = self.code_generator.generate_manim_code(
-                topic=topic,
-                description=description,
-                scene_outline=scene_outline,
-                scene_implementation=scene_implementation,
-                scene_number=curr_scene,
-                additional_context=[_prompt_manim_cheatsheet, _code_font_size, _code_limit, _code_disable],
-                scene_trace_id=scene_trace_id, # Use passed scene_trace_id
-                session_id=session_id,
-                rag_queries_cache=rag_queries_cache  # Pass the cache
-            )
+            # Step 3A: Generate initial manim code (in a worker thread so other scenes keep progressing)
+            additional_context = [_prompt_manim_cheatsheet, _code_font_size, _code_limit, _code_disable]
+            difficulty = difficulty or DEFAULT_DIFFICULTY
+            num_candidates = self.speculation_policy.num_candidates(difficulty) if self.speculation_policy else 1
+            # Error of the initial code when it is already known from speculative validation
+            pending_error = None
+            code_start = time.monotonic()
+            if num_candidates > 1:
+                code, log, pending_error = await self._generate_code_speculatively(
+                    num_candidates, difficulty, topic, description, scene_outline, scene_implementation,
+                    curr_scene, additional_context, file_prefix, code_dir, media_dir, session_id,
+                    scene_trace_id, rag_queries_cache
+                )
+            else:
+                async with self.scheduler.slot("llm", topic):
+                    code, log = await asyncio.to_thread(
+                        self.code_generator.generate_manim_code,
+                        topic=topic,
+                        description=description,
+                        scene_outline=scene_outline,
+                        scene_implementation=scene_implementation,
+                        scene_number=curr_scene,
+                        additional_context=additional_context,
+                        scene_trace_id=scene_trace_id, # Use passed scene_trace_id
+                        session_id=session_id,
+                        rag_queries_cache=rag_queries_cache  # Pass the cache
+                    )
 
             # Save initial code and log (file operations can be offloaded if needed)
             with open(os.path.join(code_dir, f"{file_prefix}_scene{curr_scene}_v{curr_version}_init_log.txt"), "w", encoding='utf-8') as f:
@@ -538,29 +937,59 @@ class VideoGenerator:
             with open(os.path.join(code_dir, f"{file_prefix}_scene{curr_scene}_v{curr_version}.py"), "w", encoding='utf-8') as f:
                 f.write(code)
             print(f"Code saved to {code_dir}/{file_prefix}_scene{curr_scene}_v{curr_version}.py")
+            self.state_store.update_scene(
+                file_prefix, curr_scene, stage="coded",
+                artifacts={"code": os.path.join(code_dir, f"{file_prefix}_scene{curr_scene}_v{curr_version}.py")},
+                timings={"code": time.monotonic() - code_start}, attempts=1
+            )
 
             # Step 3B: Compile and fix code if needed
             error_message = None
+            # Rules applied to produce the current code, credited if it renders
+            auto_fix_rules = []
+            # Whether the current code came from the rule-based fixer rather than an LLM or cached fix
+            auto_fixed_code = False
             while True: # Retry loop controlled by break statements
-                code, error_message = await self.video_renderer.render_scene(
-                    code=code,
-                    file_prefix=file_prefix,
-                    curr_scene=curr_scene,
-                    curr_version=curr_version,
-                    code_dir=code_dir,
-                    media_dir=media_dir,
-                    max_retries=max_retries, # Pass max_retries here if needed in render_scene
-                    use_visual_fix_code=self.use_visual_fix_code,
-                    visual_self_reflection_func=self.code_generator.visual_self_reflection, # Pass visual_self_reflection function
-                    banned_reasonings=self.banned_reasonings, # Pass banned reasonings
-                    scene_trace_id=scene_trace_id,
-                    topic=topic,
-                    session_id=session_id,
-                    on_success_callback=upload_scene_callback  # Add the upload callback
-                )
+                if pending_error is not None:
+                    # All speculative candidates failed validation; go straight to fixing
+                    error_message, pending_error = pending_error, None
+                else:
+                    render_start = time.monotonic()
+                    async with self.scheduler.slot("render", topic):
+                        code, error_message, visual_review = await self.video_renderer.render_scene(
+                            code=code,
+                            file_prefix=file_prefix,
+                            curr_scene=curr_scene,
+                            curr_version=curr_version,
+                            code_dir=code_dir,
+                            media_dir=media_dir,
+                            max_retries=max_retries, # Pass max_retries here if needed in render_scene
+                            use_visual_fix_code=self.use_visual_fix_code
+                        )
+                    if error_message is None:
+                        scene_file = os.path.join(code_dir, f"{file_prefix}_scene{curr_scene}_v{curr_version}.py")
+                        if visual_review is not None:
+                            code = await self._visual_fix_scene(
+                                code, scene_file, curr_scene, curr_version, media_dir, visual_review,
+                                topic, scene_trace_id, session_id, scene_implementation
+                            )
+                        await self.video_renderer.mark_scene_rendered(
+                            file_prefix, curr_scene, scene_file, on_success_callback=upload_scene_callback
+                        )
+                    self.state_store.update_scene(
+                        file_prefix, curr_scene, stage="rendered" if error_message is None else None,
+                        timings={"render": time.monotonic() - render_start}
+                    )
+                    if self.speculation_policy and num_candidates == 1 and curr_version == 0:
+                        # Single-candidate first tries keep the success rate of this difficulty current
+                        self.speculation_policy.record(difficulty, error_message is None)
+                    if auto_fix_rules:
+                        self.auto_fixer.record_outcome(auto_fix_rules, error_message is None)
+                        auto_fix_rules = []
                 if error_message is None: # Render success if error_message is None
-                    # Store any pending fix in memory since rendering was successful
-                    self.code_generator.store_successful_fix()
+                    if not auto_fixed_code:
+                        # Store any pending fix in memory since rendering was successful
+                        self.code_generator.store_successful_fix(topic=topic, scene_number=curr_scene)
                     break
 
                 if curr_version >= max_retries: # Max retries reached
@@ -568,7 +997,8 @@ class VideoGenerator:
                     print(f"❌ {error_msg}")
                     
                     # Clear any pending fix metadata since rendering failed
-                    self.code_generator.clear_fix_metadata()
+                    self.code_generator.clear_fix_metadata(topic=topic, scene_number=curr_scene)
+                    self.state_store.update_scene(file_prefix, curr_scene, error=error_message, failed_stage="render")
                     
                     # Update scene record with failure status if using Appwrite
                     if scene_id and self.use_appwrite and self.appwrite_manager:
@@ -585,17 +1015,28 @@ class VideoGenerator:
                     raise Exception(error_msg)
 
                 curr_version += 1
+                fix_start = time.monotonic()
                 # if program runs this, it means that the code is not rendered successfully
-                code = self.code_generator.fix_code_errors(
-                    implementation_plan=scene_implementation,
-                    code=code,
-                    error=error_message,
-                    scene_trace_id=scene_trace_id,
-                    topic=topic,
-                    scene_number=curr_scene,
-                    session_id=session_id,
-                    rag_queries_cache=rag_queries_cache
-                )
+                auto_fixed = self.auto_fixer.fix(code, error_message) if self.auto_fixer else None
+                auto_fixed_code = bool(auto_fixed)
+                if auto_fixed:
+                    # The previous LLM or cached fix did not render; fail it before replacing its code
+                    self.code_generator.clear_fix_metadata(topic=topic, scene_number=curr_scene)
+                    code, auto_fix_rules = auto_fixed
+                    print(f"🔧 Scene {curr_scene}: applied rule-based fixes {auto_fix_rules}, skipping LLM fix")
+                else:
+                    async with self.scheduler.slot("llm", topic):
+                        code = await asyncio.to_thread(
+                            self.code_generator.fix_code_errors,
+                            implementation_plan=scene_implementation,
+                            code=code,
+                            error=error_message,
+                            scene_trace_id=scene_trace_id,
+                            topic=topic,
+                            scene_number=curr_scene,
+                            session_id=session_id,
+                            rag_queries_cache=rag_queries_cache
+                        )
 
                 with open(os.path.join(code_dir, f"{file_prefix}_scene{curr_scene}_v{curr_version}_fix_log.txt"), "w", encoding='utf-8') as f:
                     f.write(error_message)
@@ -603,6 +1044,11 @@ class VideoGenerator:
                     f.write(code)
 
                 print(f"Code saved to {code_dir}/{file_prefix}_scene{curr_scene}_v{curr_version}.py")
+                self.state_store.update_scene(
+                    file_prefix, curr_scene, stage="coded",
+                    artifacts={"code": os.path.join(code_dir, f"{file_prefix}_scene{curr_scene}_v{curr_version}.py")},
+                    timings={"fix": time.monotonic() - fix_start}, attempts=curr_version + 1
+                )
 
     def run_manim_process(self,
                           topic: str):
@@ -637,6 +1083,10 @@ class VideoGenerator:
             topic (str): The topic to combine videos for
         """
         self.video_renderer.combine_videos(topic)
+        file_prefix = re.sub(r'[^a-z0-9_]+', '_', topic.lower())
+        combined_video_path = os.path.join(self.output_dir, file_prefix, f"{file_prefix}_combined.mp4")
+        if os.path.exists(combined_video_path):
+            self.state_store.set_topic_status(file_prefix, "completed", combined_path=combined_video_path)
 
     async def _generate_scene_implementation_single(self, topic: str, description: str, scene_outline_i: str, i: int, file_prefix: str, session_id: str, scene_trace_id: str) -> str:
         """
@@ -744,7 +1194,7 @@ class VideoGenerator:
                 print(f"⚠️ Failed to update scene record: {e}")
             return False
 
-    async def generate_video_pipeline(self, topic: str, description: str, max_retries: int, only_plan: bool = False, specific_scenes: List[int] = None, only_render: bool = False, only_combine: bool = False):
+    async def generate_video_pipeline(self, topic: str, description: str, max_retries: int, only_plan: bool = False, specific_scenes: List[int] = None, only_render: bool = False, only_combine: bool = False, difficulty: str = None):
         """
         Modified pipeline to handle partial scene completions and option to only generate plans for specific scenes.
 
@@ -756,6 +1206,7 @@ class VideoGenerator:
             specific_scenes (List[int], optional): List of specific scenes to process. Defaults to None.
             only_render (bool, optional): Whether to only render scenes without combining videos. Defaults to False.
             only_combine (bool, optional): Whether to only combine videos. Defaults to False.
+            difficulty (str, optional): Difficulty level of the topic, used by speculative code generation. Defaults to None.
         """
         session_id = self._load_or_create_session_id()
         self._save_topic_session_id(topic, session_id)
@@ -793,9 +1244,35 @@ class VideoGenerator:
         
         # Load or generate scene outline
         scene_outline_path = os.path.join(self.output_dir, file_prefix, f"{file_prefix}_scene_outline.txt")
-        if not os.path.exists(scene_outline_path):
-            scene_outline = self.planner.generate_scene_outline(topic, description, session_id)
+        plan_match = None
+        # Scene number -> task planning that scene while the rest of the outline is still streaming
+        early_plan_tasks = {}
+        topic_state = self.state_store.get_topic(file_prefix)
+        if topic_state and topic_state["outline_path"]:
+            print(f"Loaded existing scene outline for topic: {topic}")
+            with open(topic_state["outline_path"], "r", encoding='utf-8') as f:
+                scene_outline = f.read()
+        elif not os.path.exists(scene_outline_path):
+            if self.plan_cache:
+                # Embedding and index I/O block, keep them off the event loop
+                plan_match = await asyncio.to_thread(self.plan_cache.lookup, topic, description)
+            if plan_match and plan_match.mode == "reuse":
+                scene_outline = plan_match.scene_outline
+            else:
+                async with self.scheduler.slot("llm", topic):
+                    if plan_match:
+                        scene_outline = await asyncio.to_thread(self.planner.adapt_scene_outline, topic, description, plan_match, session_id)
+                    elif self.use_streaming_outline:
+                        try:
+                            scene_outline = await self._stream_outline_and_plan(
+                                topic, description, session_id, file_prefix, specific_scenes, early_plan_tasks)
+                        except Exception:
+                            self._cancel_early_plans(early_plan_tasks)
+                            raise
+                    else:
+                        scene_outline = await asyncio.to_thread(self.planner.generate_scene_outline, topic, description, session_id)
             if not scene_outline or not extract_xml(scene_outline):
+                self._cancel_early_plans(early_plan_tasks)
                 print(f"❌ Failed to generate a valid scene outline for topic: {topic}. Aborting.")
                 raise ValueError("Failed to generate a valid scene outline from the AI model. Please try a different topic or model.")
             
@@ -810,13 +1287,18 @@ class VideoGenerator:
         # After loading or generating, verify the outline has content
         scene_outline_content = extract_xml(scene_outline)
         if not scene_outline_content or len(re.findall(r'<SCENE_(\d+)>[^<]', scene_outline_content)) == 0:
+            self._cancel_early_plans(early_plan_tasks)
             print(f"❌ Scene outline for '{topic}' is empty or invalid. Deleting and aborting.")
             if os.path.exists(scene_outline_path):
                 os.remove(scene_outline_path)
             raise ValueError(f"The generated scene outline for '{topic}' was empty or invalid. The process cannot continue.")
 
+        if topic_state is None:
+            # First run with the state store for this topic; import whatever earlier runs left on disk
+            topic_state = backfill_topic(self.state_store, self.output_dir, topic, description, difficulty, session_id)
+
         # Load or generate implementation plans
-        implementation_plans_dict = self.load_implementation_plans(topic)
+        implementation_plans_dict = self._load_plans_from_state(topic_state)
         if not implementation_plans_dict:
             scene_outline_content = extract_xml(scene_outline)
             scene_numbers = len(re.findall(r'<SCENE_(\d+)>[^<]', scene_outline_content))
@@ -843,99 +1325,123 @@ class VideoGenerator:
             if self.verbose:
                 print(f"⚠️ Failed to create scene records: {e}")
 
-        # Generate missing implementation plans for specified scenes or all missing scenes
-        missing_scenes = []
-        for scene_num, plan in implementation_plans_dict.items():
-            if plan is None and (specific_scenes is None or scene_num in specific_scenes):
-                missing_scenes.append(scene_num)
-
+        # Each scene moves independently through plan -> code -> render -> upload, so scene 1
+        # can be rendering while a later scene is still being planned. Only combining waits for all.
+        scene_outline_content = extract_xml(scene_outline)
+        missing_scenes = [scene_num for scene_num, plan in implementation_plans_dict.items()
+                          if plan is None and (specific_scenes is None or scene_num in specific_scenes)]
         if missing_scenes:
             print(f"Generating implementation plans for missing scenes: {missing_scenes}")
-            for scene_num in missing_scenes:
-                scene_outline_content = extract_xml(scene_outline)
+
+        rendering_started = False
+        # Each missing plan and each scene still to render is one step; fewer remaining steps = higher priority
+        remaining_steps = len(missing_scenes) + sum(
+            1 for scene_num, plan in implementation_plans_dict.items()
+            if (plan is not None or scene_num in missing_scenes) and self._scene_needs_processing(file_prefix, scene_num, only_render)
+        )
+        self.scheduler.set_remaining_work(topic, 0 if only_plan else remaining_steps)
+
+        async def scene_pipeline(scene_num: int, implementation_plan: Optional[str]):
+            nonlocal rendering_started
+            scene_id = scene_ids[scene_num - 1] if scene_ids and len(scene_ids) >= scene_num else None
+
+            if implementation_plan is None:
                 scene_match = re.search(f'<SCENE_{scene_num}>(.*?)</SCENE_{scene_num}>', scene_outline_content, re.DOTALL)
-                if scene_match:
-                    scene_outline_i = scene_match.group(1)
-                    scene_trace_id = str(uuid.uuid4())
-                    implementation_plan = await self._generate_scene_implementation_single(
-                        topic, description, scene_outline_i, scene_num, file_prefix, session_id, scene_trace_id)
-                    implementation_plans_dict[scene_num] = implementation_plan
-                    
-                    # Update scene record with implementation plan
-                    if scene_ids and len(scene_ids) >= scene_num and scene_ids[scene_num - 1]:
-                        await self.update_scene_record(
-                            scene_ids[scene_num - 1], 
-                            status="planned",
-                            generated_code=implementation_plan
-                        )
+                if not scene_match:
+                    return
+                plan_start = time.monotonic()
+                if scene_num in early_plan_tasks:
+                    # Planning started while the outline was still streaming
+                    implementation_plan, plan_seconds = await early_plan_tasks.pop(scene_num)
+                    plan_start = time.monotonic() - plan_seconds
+                else:
+                    async with self.scene_semaphore:
+                        if plan_match and scene_num in plan_match.implementation_plans:
+                            if plan_match.mode == "reuse":
+                                implementation_plan = plan_match.implementation_plans[scene_num]
+                                self.planner.save_implementation_plan(file_prefix, scene_num, implementation_plan)
+                            else:
+                                implementation_plan = await self.planner.adapt_scene_implementation(
+                                    topic, description, plan_match, scene_num, file_prefix, session_id, str(uuid.uuid4()))
+                        else:
+                            implementation_plan = await self._generate_scene_implementation_single(
+                                topic, description, scene_match.group(1), scene_num, file_prefix, session_id, str(uuid.uuid4()))
+                implementation_plans_dict[scene_num] = implementation_plan
+                self.state_store.update_scene(
+                    file_prefix, scene_num, stage="planned",
+                    artifacts={"plan": self.planner.implementation_plan_path(file_prefix, scene_num)},
+                    timings={"plan": time.monotonic() - plan_start}
+                )
+                self.scheduler.complete_work(topic)
+
+                # Update scene record with implementation plan
+                if scene_id:
+                    await self.update_scene_record(
+                        scene_id,
+                        status="planned",
+                        generated_code=implementation_plan
+                    )
+
+            if only_plan or not self._scene_needs_processing(file_prefix, scene_num, only_render):
+                return
+
+            if not rendering_started:
+                rendering_started = True
+                self.state_store.set_topic_status(file_prefix, "rendering")
+                if video_id:
+                    await self.update_video_status(video_id, "rendering")
+
+            scene_trace_id = self._load_or_create_scene_trace_id(file_prefix, scene_num)
+            await self.process_scene(scene_num - 1, scene_outline, implementation_plan, topic, description,
+                                     max_retries, file_prefix, session_id, scene_trace_id, scene_id, difficulty)
+            self.scheduler.complete_work(topic)
+
+        async def tracked_scene_pipeline(scene_num: int, implementation_plan: Optional[str]):
+            try:
+                await scene_pipeline(scene_num, implementation_plan)
+            except Exception as e:
+                # Attribute the failure to the first step the scene had not completed, unless process_scene already did
+                scene_state = self.state_store.get_scene(file_prefix, scene_num)
+                if scene_state is None or scene_state["error"] is None:
+                    failed_stage = {"pending": "plan", "planned": "code"}.get(scene_state["stage"] if scene_state else "pending", "fix")
+                    self.state_store.update_scene(file_prefix, scene_num, error=str(e), failed_stage=failed_stage)
+                raise
+
+        async def cache_plans():
+            # Plans are worth caching even if a scene later fails to render
+            if self.plan_cache and missing_scenes and not (plan_match and plan_match.mode == "reuse"):
+                await asyncio.to_thread(self.plan_cache.store, topic, description, scene_outline, implementation_plans_dict)
+                print(f"🗂️ Plan cache metrics: {self.plan_cache.get_metrics()}")
+
+        scene_tasks = [
+            tracked_scene_pipeline(scene_num, plan)
+            for scene_num, plan in sorted(implementation_plans_dict.items())
+            if plan is not None or scene_num in missing_scenes
+        ]
+        print(f"Starting scene pipelines for topic: {topic}")
+        try:
+            await asyncio.gather(*scene_tasks)
+        except Exception as e:
+            self._cancel_early_plans(early_plan_tasks)
+            # A scene failed after max retries - update video status and abort the entire video generation
+            error_msg = f"Video generation aborted: {str(e)}"
+            print(f"❌ {error_msg}")
+            await cache_plans()
+            self.scheduler.finish_topic(topic)
+            self.state_store.set_topic_status(file_prefix, "failed", error_msg)
+            if video_id:
+                await self.update_video_status(video_id, "failed", error_msg)
+            raise Exception(error_msg)
+
+        # Scenes that already had a plan on disk never claimed their early plan
+        self._cancel_early_plans(early_plan_tasks)
+        await cache_plans()
+        self.scheduler.finish_topic(topic)
 
         if only_plan:
             print(f"Only generating plans - skipping code generation and video rendering for topic: {topic}")
             return
 
-        # Convert dictionary to list maintaining scene order
-        sorted_scene_numbers = sorted(implementation_plans_dict.keys())
-        implementation_plans = [implementation_plans_dict[i] for i in sorted_scene_numbers]
-        
-        # Render scenes
-        print(f"Starting video rendering for topic: {topic}")
-        
-        # Update video status to rendering
-        if video_id:
-            await self.update_video_status(video_id, "rendering")
-        
-        # Check which scenes need processing
-        scenes_to_process = []
-        for i, implementation_plan in enumerate(implementation_plans):
-            scene_dir = os.path.join(self.output_dir, file_prefix, f"scene{i+1}")
-            code_dir = os.path.join(scene_dir, "code")
-            
-            # Check if scene has any code files
-            has_code = False
-            if os.path.exists(code_dir):
-                if any(f.endswith('.py') for f in os.listdir(code_dir)):
-                    has_code = True
-            
-            # For only_render mode, only process scenes without code
-            if only_render:
-                if not has_code:
-                    scenes_to_process.append((i+1, implementation_plan))
-                    print(f"Scene {i+1} has no code, will process")
-            # For normal mode, process scenes that haven't been successfully rendered
-            elif not os.path.exists(os.path.join(scene_dir, "succ_rendered.txt")):
-                scenes_to_process.append((i+1, implementation_plan))
-        
-        if not scenes_to_process:
-            print(f"No scenes need processing for topic '{topic}'.")
-        else:
-            print(f"Rendering {len(scenes_to_process)} scenes that need processing...")
-            # Create a list of tuples with scene numbers and plans
-            scene_plans = [(scene_num, plan) for scene_num, plan in scenes_to_process]
-            # Sort by scene number to ensure correct order
-            scene_plans.sort(key=lambda x: x[0])
-            
-            # Extract just the plans in the correct order and matching scene IDs
-            filtered_implementation_plans = [plan for _, plan in scene_plans]
-            
-            # Filter scene_ids to match the scenes being processed
-            filtered_scene_ids = []
-            for scene_num, _ in scene_plans:
-                if scene_ids and len(scene_ids) >= scene_num:
-                    filtered_scene_ids.append(scene_ids[scene_num - 1])
-                else:
-                    filtered_scene_ids.append(None)
-            
-            try:
-                await self.render_video_fix_code(topic, description, scene_outline, filtered_implementation_plans,
-                                               max_retries=max_retries, session_id=session_id, scene_ids=filtered_scene_ids)
-            except Exception as e:
-                # Scene rendering failed after max retries - update video status and abort
-                if video_id:
-                    await self.update_video_status(video_id, "failed", str(e))
-                
-                # Re-raise the exception to abort the entire pipeline
-                raise e
-        
         if not only_render:  # Skip video combination in only_render mode
             print(f"Video rendering completed for topic '{topic}'.")
             # Combine videos after rendering is complete
@@ -1022,6 +1528,11 @@ class VideoGenerator:
         topic = theorem['theorem']
         file_prefix = topic.lower()
         file_prefix = re.sub(r'[^a-z0-9_]+', '_', file_prefix)
+
+        # Topics known to the state store are answered without touching the output tree
+        topic_state = self.state_store.get_topic(file_prefix)
+        if topic_state is not None:
+            return status_from_state(topic, topic_state)
         
         # Check scene outline
         scene_outline_path = os.path.join(self.output_dir, file_prefix, f"{file_prefix}_scene_outline.txt")
@@ -1123,13 +1634,32 @@ if __name__ == "__main__":
     parser.add_argument('--max_scene_concurrency', type=int, default=Config.DEFAULT_MAX_SCENE_CONCURRENCY, help='Maximum number of scenes to process concurrently')
     parser.add_argument('--max_topic_concurrency', type=int, default=1,
                        help='Maximum number of topics to process concurrently')
+    parser.add_argument('--max_llm_concurrency', type=int, default=Config.MAX_LLM_CONCURRENCY,
+                       help='Maximum number of concurrent LLM-bound steps across all topics')
+    parser.add_argument('--max_render_concurrency', type=int, default=Config.MAX_RENDER_CONCURRENCY,
+                       help='Maximum number of concurrent manim renders across all topics')
     parser.add_argument('--debug_combine_topic', type=str, help='Debug combine videos', default=None)
     parser.add_argument('--only_plan', action='store_true', help='Only generate scene outline and implementation plans')
     parser.add_argument('--check_status', action='store_true', 
                        help='Check planning and code status for all theorems')
+    parser.add_argument('--report', action='store_true',
+                       help='Print per-difficulty completion, per-stage failures and average attempts from the pipeline state store')
     parser.add_argument('--only_render', action='store_true', help='Only render scenes without combining videos')
     parser.add_argument('--scenes', nargs='+', type=int, help='Specific scenes to process (if theorems_path is provided)')
     args = parser.parse_args()
+    configure_scheduler(args.max_llm_concurrency, args.max_render_concurrency)
+
+    if args.report:
+        state_store = PipelineStateStore(os.path.join(args.output_dir, "pipeline_state.db"))
+        report_theorems = None
+        if args.theorems_path:
+            with open(args.theorems_path, "r") as f:
+                report_theorems = json.load(f)
+        imported = backfill_output_dir(state_store, args.output_dir, report_theorems, infer_difficulty(args.theorems_path))
+        if imported:
+            print(f"Imported {imported} topic folder(s) into the pipeline state store")
+        state_store.print_report()
+        exit()
 
     # Initialize planner model using LiteLLM
     if args.verbose:
@@ -1170,88 +1700,24 @@ if __name__ == "__main__":
 
         if args.peek_existing_videos:
             print(f"Here's the results of checking whether videos are rendered successfully in {args.output_dir}:")
-            # in output_dir, find all combined.mp4 files and print number of successful rendered videos out of total number of folders
-            successful_rendered_videos = 0
-            total_folders = 0
-            for item in os.listdir(args.output_dir):
-                if os.path.isdir(os.path.join(args.output_dir, item)):
-                    total_folders += 1
-                    if os.path.exists(os.path.join(args.output_dir, item, f"{item}_combined.mp4")):
-                        successful_rendered_videos += 1
-            print(f"Number of successful rendered videos: {successful_rendered_videos}/{total_folders}")
-
-            # also check whether any succ_rendered.txt in scene{i} folder, and then add up the number of successful rendered videos
-            successful_rendered_videos = 0
-            total_scenes = 0
-            for item in os.listdir(args.output_dir):
-                if os.path.isdir(os.path.join(args.output_dir, item)):
-                    for scene_folder in os.listdir(os.path.join(args.output_dir, item)):
-                        if "scene" in scene_folder and os.path.isdir(os.path.join(args.output_dir, item, scene_folder)):
-                            total_scenes += 1
-                            if os.path.exists(os.path.join(args.output_dir, item, scene_folder, "succ_rendered.txt")):
-                                successful_rendered_videos += 1
-            print(f"Number of successful rendered scenes: {successful_rendered_videos}/{total_scenes}")
-            exit()
-
-        video_generator = VideoGenerator(
-            planner_model=planner_model,
-            scene_model=scene_model, # Pass scene_model
-            helper_model=helper_model, # Pass helper_model
-            output_dir=args.output_dir,
-            verbose=args.verbose,
-            use_rag=args.use_rag,
-            use_context_learning=args.use_context_learning,
-            context_learning_path=args.context_learning_path,
-            chroma_db_path=args.chroma_db_path,
-            manim_docs_path=args.manim_docs_path,
-            embedding_model=args.embedding_model,
-            use_visual_fix_code=args.use_visual_fix_code,
-            use_langfuse=args.use_langfuse,
-            max_scene_concurrency=args.max_scene_concurrency
-        )
-
-        if args.debug_combine_topic is not None:
-            video_generator.combine_videos(args.debug_combine_topic)
+            # Counts come from the pipeline state store; only folders it has never seen are scanned
+            state_store = PipelineStateStore(os.path.join(args.output_dir, "pipeline_state.db"))
+            backfill_output_dir(state_store, args.output_dir, theorems, infer_difficulty(args.theorems_path))
+            report = state_store.report()
+            total_topics = sum(row['topics'] for row in report['difficulty'].values())
+            combined_videos = sum(row['completed'] or 0 for row in report['difficulty'].values())
+            print(f"Number of successful rendered videos: {combined_videos}/{total_topics}")
+            print(f"Number of successful rendered scenes: {report['stages'].get('rendered', 0)}/{sum(report['stages'].values())}")
             exit()
 
-        if args.only_gen_vid:
-            # Generate videos for existing plans
-            print("Generating videos for existing plans...")
-
-            async def process_theorem(theorem, topic_semaphore):
-                async with topic_semaphore:
-                    topic = theorem['theorem']
-                    print(f"Processing topic: {topic}")
-                    await video_generator.render_video_fix_code(topic, theorem['description'], max_retries=args.max_retries)
-
-            async def main():
-                # Use the command-line argument for topic concurrency
-                topic_semaphore = asyncio.Semaphore(args.max_topic_concurrency)
-                tasks = [process_theorem(theorem, topic_semaphore) for theorem in theorems]
-                await asyncio.gather(*tasks)
-
-            asyncio.run(main())
-
-        elif args.check_status:
+        if args.check_status:
             print("\nChecking theorem status...")
-            video_generator = VideoGenerator(
-                planner_model=planner_model,
-                scene_model=scene_model,
-                helper_model=helper_model,
-                output_dir=args.output_dir,
-                verbose=args.verbose,
-                use_rag=args.use_rag,
-                use_context_learning=args.use_context_learning,
-                context_learning_path=args.context_learning_path,
-                chroma_db_path=args.chroma_db_path,
-                manim_docs_path=args.manim_docs_path,
-                embedding_model=args.embedding_model,
-                use_visual_fix_code=args.use_visual_fix_code,
-                use_langfuse=args.use_langfuse,
-                max_scene_concurrency=args.max_scene_concurrency
-            )
-            
-            all_statuses = [video_generator.check_theorem_status(theorem) for theorem in theorems]
+            # Status comes from the pipeline state store; only folders it has never seen are scanned
+            state_store = PipelineStateStore(os.path.join(args.output_dir, "pipeline_state.db"))
+            backfill_output_dir(state_store, args.output_dir, theorems, infer_difficulty(args.theorems_path))
+            topic_states = state_store.get_topics([topic_file_prefix(theorem['theorem']) for theorem in theorems])
+            all_statuses = [status_from_state(theorem['theorem'], topic_states.get(topic_file_prefix(theorem['theorem'])))
+                            for theorem in theorems]
             
             # Print combined status table
             print("\nTheorem Status:")
@@ -1309,6 +1775,46 @@ if __name__ == "__main__":
             print(f"Combined videos: {sum(1 for status in all_statuses if status['has_combined_video'])}/{len(theorems)}")
             exit()
 
+        video_generator = VideoGenerator(
+            planner_model=planner_model,
+            scene_model=scene_model, # Pass scene_model
+            helper_model=helper_model, # Pass helper_model
+            output_dir=args.output_dir,
+            verbose=args.verbose,
+            use_rag=args.use_rag,
+            use_context_learning=args.use_context_learning,
+            context_learning_path=args.context_learning_path,
+            chroma_db_path=args.chroma_db_path,
+            manim_docs_path=args.manim_docs_path,
+            embedding_model=args.embedding_model,
+            use_visual_fix_code=args.use_visual_fix_code,
+            use_langfuse=args.use_langfuse,
+            max_scene_concurrency=args.max_scene_concurrency
+        )
+
+        if args.debug_combine_topic is not None:
+            video_generator.combine_videos(args.debug_combine_topic)
+            exit()
+
+        if args.only_gen_vid:
+            # Generate videos for existing plans
+            print("Generating videos for existing plans...")
+
+            async def process_theorem(theorem, topic_semaphore):
+                async with topic_semaphore:
+                    topic = theorem['theorem']
+                    print(f"Processing topic: {topic}")
+                    await video_generator.render_video_fix_code(topic, theorem['description'], max_retries=args.max_retries)
+
+            async def main():
+                # Use the command-line argument for topic concurrency
+                topic_semaphore = asyncio.Semaphore(args.max_topic_concurrency)
+                tasks = [process_theorem(theorem, topic_semaphore) for theorem in theorems]
+                await asyncio.gather(*tasks)
+
+            asyncio.run(main())
+            video_generator.report_usage()
+
         else:
             # Generate video pipeline from scratch
             print("Generating video pipeline from scratch...")
@@ -1328,7 +1834,8 @@ if __name__ == "__main__":
                             only_plan=args.only_plan,
                             specific_scenes=args.scenes,
                             only_render=args.only_render,
-                            only_combine=args.only_combine
+                            only_combine=args.only_combine,
+                            difficulty=theorem.get('difficulty') or infer_difficulty(args.theorems_path)
                         )
                         if not args.only_plan and not args.only_render:  # Add condition for only_render
                             video_generator.combine_videos(topic)
@@ -1340,6 +1847,7 @@ if __name__ == "__main__":
                 await asyncio.gather(*tasks)
 
             asyncio.run(main())
+            video_generator.report_usage()
 
     elif args.topic and args.context:
         video_generator = VideoGenerator(
@@ -1378,6 +1886,7 @@ if __name__ == "__main__":
             ))
             if not args.only_plan and not args.only_render:
                 video_generator.combine_videos(args.topic)
+            video_generator.report_usage()
     else:
         print("Please provide either (--theorems_path) or (--topic and --context)")
         exit()
@@ -0,0 +1,17 @@
+"""
+Error responses of the model wrappers.
+
+The wrappers return provider errors as text instead of raising, and callers
+rely on always getting a string back. Returning that text as a
+``ModelErrorResponse`` keeps those callers working while letting proxies
+such as the model router tell a failed call from a real answer.
+"""
+
+
+class ModelErrorResponse(str):
+    """Error text returned by a model wrapper in place of a completion."""
+
+
+def is_error_response(response) -> bool:
+    """Whether a wrapper response signals a failed call (an error response or no content at all)."""
+    return response is None or isinstance(response, ModelErrorResponse)
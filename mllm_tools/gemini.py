@@ -1,4 +1,4 @@
-from typing import List, Dict, Any, Union, Optional
+from typing import List, Dict, Any, Union, Optional, Callable, Tuple
 import io
 import os
 import base64
@@ -7,12 +7,55 @@ import mimetypes
 import google.generativeai as genai
 import tempfile
 import time
+import asyncio
+import hashlib
+import threading
+from datetime import datetime, timezone
 from urllib.parse import urlparse
 import requests
 from io import BytesIO
 
+from mllm_tools.media import MediaPreprocessor, format_size, is_image_path
+from mllm_tools.single_flight import get_single_flight_group
+from mllm_tools.errors import ModelErrorResponse
+from mllm_tools.usage import get_usage_tracker
+
+# Uploaded files expire on the provider side after 48 hours; stop reusing them a bit earlier
+_UPLOAD_TTL_SECONDS = 48 * 3600
+_UPLOAD_EXPIRY_MARGIN_SECONDS = 3600
+_POLL_INITIAL_DELAY = 0.25
+_POLL_MAX_DELAY = 5.0
+
+
+def _run_coroutine_sync(coro):
+    """Run a coroutine to completion from synchronous code, even if an event loop is already running in this thread."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    result = {}
+
+    def runner():
+        try:
+            result["value"] = asyncio.run(coro)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=runner)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
 class GeminiWrapper:
     """Wrapper for Gemini to support multiple models and logging"""
+
+    # Process-wide cache: (API key hash, content hash) -> (uploaded file handle, expiry timestamp).
+    # Uploaded files belong to the project of the key that uploaded them
+    _upload_cache: Dict[Tuple[str, str], Any] = {}
+    _upload_cache_lock = threading.Lock()
     
     def __init__(
         self,
@@ -37,6 +80,7 @@ class GeminiWrapper:
         self.print_cost = print_cost
         self.verbose = verbose
         self.accumulated_cost = 0
+        self.media_preprocessor = MediaPreprocessor.for_model(self.model_name)
 
         # Implement fallback mechanism for multiple API keys
         gemini_key_env = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
@@ -57,6 +101,7 @@ class GeminiWrapper:
             api_key = gemini_key_env
             
         genai.configure(api_key=api_key)
+        self._api_key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
 
         generation_config = {
             "temperature": self.temperature,
@@ -109,20 +154,22 @@ class GeminiWrapper:
         else:
             raise ValueError(f"Failed to download file from URL: {url}")
 
-    def _save_image_to_temp(self, image: Image.Image) -> str:
+    def _save_image_to_temp(self, image: Union[str, Image.Image]) -> Tuple[str, str]:
         """
-        Save a PIL Image to a temporary file
+        Downscale and compress an image into a temporary file
         
         Args:
-            image: PIL Image object
+            image: PIL Image object or path to an image file
             
         Returns:
-            Path to the temporary file
+            Tuple of (path to the temporary file, MIME type)
         """
-        temp_file = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
-        image.save(temp_file, format="PNG")
+        data, mime_type = self.media_preprocessor.encode_image(image)
+        suffix = mimetypes.guess_extension(mime_type) or ".img"
+        temp_file = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+        temp_file.write(data)
         temp_file.close()
-        return temp_file.name
+        return temp_file.name, mime_type
 
     def _upload_to_gemini(self, file_path: str, mime_type: Optional[str] = None):
         """
@@ -137,55 +184,230 @@ class GeminiWrapper:
         """
         return genai.upload_file(file_path, mime_type=mime_type)
 
-    def __call__(self, messages: List[Dict[str, Any]], metadata: Optional[Dict[str, Any]] = None) -> str:
+    @staticmethod
+    def _hash_file(file_path: str) -> str:
         """
-        Process messages and return completion
+        Compute the SHA-256 of a file's contents
         
         Args:
-            messages: List of message dictionaries with 'type' and 'content' keys
-            metadata: Optional metadata to pass to Gemini completion
+            file_path: Path to the file
+            
+        Returns:
+            Hex digest of the file contents
+        """
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _expiry_timestamp(uploaded_file) -> float:
+        """
+        Work out until when an uploaded file can safely be reused
         
+        Args:
+            uploaded_file: File handle returned by the Files API
+            
         Returns:
-            Generated text response
+            Unix timestamp after which the cached handle must not be used
+        """
+        expiration = getattr(uploaded_file, "expiration_time", None)
+        if isinstance(expiration, datetime):
+            if expiration.tzinfo is None:
+                expiration = expiration.replace(tzinfo=timezone.utc)
+            expires_at = expiration.timestamp()
+        else:
+            expires_at = time.time() + _UPLOAD_TTL_SECONDS
+        return expires_at - _UPLOAD_EXPIRY_MARGIN_SECONDS
+
+    def _get_cached_upload(self, cache_key: Tuple[str, str]):
+        """Return a still-valid uploaded file for this (API key hash, content hash), or None."""
+        with self._upload_cache_lock:
+            entry = self._upload_cache.get(cache_key)
+            if entry is None:
+                return None
+            uploaded_file, expires_at = entry
+            if time.time() >= expires_at:
+                del self._upload_cache[cache_key]
+                return None
+            return uploaded_file
+
+    async def _wait_until_active(self, uploaded_file):
+        """
+        Poll an uploaded file until processing finishes, backing off from a sub-second delay
+        
+        Args:
+            uploaded_file: File handle returned by the Files API
+            
+        Returns:
+            File handle in its final state
+        """
+        delay = _POLL_INITIAL_DELAY
+        while uploaded_file.state.name == "PROCESSING":
+            if self.verbose:
+                print('.', end='')
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _POLL_MAX_DELAY)
+            uploaded_file = await asyncio.to_thread(genai.get_file, uploaded_file.name)
+        if uploaded_file.state.name == "FAILED":
+            raise ValueError(uploaded_file.state.name)
+        return uploaded_file
+
+    async def _upload_media(self, content: Union[str, Image.Image]):
         """
-        contents = []
+        Upload one media item, reusing an earlier upload of identical content when it has not expired
+        
+        Args:
+            content: PIL Image, local file path or URL
+            
+        Returns:
+            Uploaded file handle ready to be used in a request
+        """
+        temp_path = None
+        if isinstance(content, Image.Image) or (isinstance(content, str) and not content.startswith("http") and is_image_path(content)):
+            temp_path, mime_type = await asyncio.to_thread(self._save_image_to_temp, content)
+            file_path = temp_path
+        elif isinstance(content, str):
+            if content.startswith("http"):
+                temp_path = await asyncio.to_thread(self._download_file, content)
+                file_path, mime_type = temp_path, self._get_mime_type(content)
+            else:
+                file_path, mime_type = content, self._get_mime_type(content)
+        else:
+            raise ValueError("Unsupported content type")
+
+        try:
+            content_hash = await asyncio.to_thread(self._hash_file, file_path)
+            cache_key = (self._api_key_hash, content_hash)
+            cached = self._get_cached_upload(cache_key)
+            if cached is not None:
+                if self.verbose:
+                    print(f"Reusing uploaded file {cached.name}")
+                return cached
+
+            # Identical content uploaded concurrently by other calls shares one upload
+            uploaded_file = await get_single_flight_group().do_async(
+                f"gemini-upload:{self._api_key_hash}:{content_hash}", self._upload_to_gemini, file_path, mime_type
+            )
+            uploaded_file = await self._wait_until_active(uploaded_file)
+            print(f"📦 Uploaded {format_size(os.path.getsize(file_path))} ({mime_type}) to Gemini")
+            with self._upload_cache_lock:
+                self._upload_cache[cache_key] = (uploaded_file, self._expiry_timestamp(uploaded_file))
+            print("Upload successfully")
+            return uploaded_file
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    async def _prepare_contents(self, messages: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Convert messages into Gemini contents, uploading all media parts in parallel
+        
+        Args:
+            messages: List of message dictionaries with 'type' and 'content' keys
+            
+        Returns:
+            Contents in message order
+        """
+        contents: List[Any] = []
+        uploads = []
         for msg in messages:
             if msg["type"] == "text":
                 contents.append(msg["content"])
             elif msg["type"] in ["image", "audio", "video"]:
-                if isinstance(msg["content"], Image.Image):
-                    file_path = self._save_image_to_temp(msg["content"])
-                    mime_type = "image/png"
-                elif isinstance(msg["content"], str):
-                    if msg["content"].startswith("http"):
-                        file_path = self._download_file(msg["content"])
-                        mime_type = self._get_mime_type(msg["content"])
-                    else:
-                        file_path = msg["content"]
-                        mime_type = self._get_mime_type(file_path)
-                else:
-                    raise ValueError("Unsupported content type")
-
-                uploaded_file = self._upload_to_gemini(file_path, mime_type)
-
-                while uploaded_file.state.name == "PROCESSING":
-                    print('.', end='')
-                    time.sleep(3)
-                    uploaded_file = genai.get_file(uploaded_file.name)
-                if uploaded_file.state.name == "FAILED":
-                    raise ValueError(uploaded_file.state.name)
-                print("Upload successfully")
-                contents.append(uploaded_file)
+                uploads.append((len(contents), self._upload_media(msg["content"])))
+                contents.append(None)
             else:
                 raise ValueError("Unsupported message type")
 
+        if uploads:
+            uploaded_files = await asyncio.gather(*(coro for _, coro in uploads))
+            for (index, _), uploaded_file in zip(uploads, uploaded_files):
+                contents[index] = uploaded_file
+        return contents
+
+    def _stream_generate(self, contents: List[Any], stop_predicate: Callable[[str], bool]) -> Tuple[str, Any]:
+        """
+        Stream a generation and stop reading as soon as the stop predicate accepts the text so far
+        
+        Args:
+            contents: Contents to send to the model
+            stop_predicate: Callable receiving the accumulated text, returns True to stop generation
+            
+        Returns:
+            Tuple of (accumulated text response, usage metadata of the last chunk received or None).
+            Errors while streaming are raised, so a truncated response is never returned as complete
+        """
+        response = self.model.generate_content(contents, request_options={"timeout": 600}, stream=True)
+        text = ""
+        usage = None
+        for chunk in response:
+            # Token counts are cumulative, the last chunk received carries the totals so far
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            try:
+                text += chunk.text
+            except Exception:
+                # Chunks without text parts (e.g. safety or finish metadata)
+                continue
+            if stop_predicate(text):
+                if self.verbose:
+                    print(f"Stop condition met after {len(text)} characters, ending stream early")
+                break
+        if not text:
+            print(response.prompt_feedback)
+            return ModelErrorResponse(str(response.prompt_feedback)), usage
+        return text, usage
+
+    def __call__(self, messages: List[Dict[str, Any]], metadata: Optional[Dict[str, Any]] = None, stop_predicate: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        Process messages and return completion
+        
+        Args:
+            messages: List of message dictionaries with 'type' and 'content' keys
+            metadata: Optional metadata to pass to Gemini completion
+            stop_predicate: Optional callable receiving the text generated so far. When given, the
+                response is streamed and generation stops as soon as the predicate returns True
+        
+        Returns:
+            Generated text response
+        """
+        contents = _run_coroutine_sync(self._prepare_contents(messages))
+        generation_name = (metadata or {}).get("generation_name")
+
+        start_time = time.time()
+        if stop_predicate is not None:
+            usage = None
+            try:
+                text, usage = self._stream_generate(contents, stop_predicate)
+            finally:
+                get_usage_tracker().record(
+                    generation_name,
+                    self.model_name,
+                    input_tokens=getattr(usage, "prompt_token_count", 0),
+                    output_tokens=getattr(usage, "candidates_token_count", 0),
+                    latency=time.time() - start_time,
+                )
+            return text
+
         response = self.model.generate_content(contents, request_options={"timeout": 600})
+        usage = getattr(response, "usage_metadata", None)
+        get_usage_tracker().record(
+            generation_name,
+            self.model_name,
+            input_tokens=getattr(usage, "prompt_token_count", 0),
+            output_tokens=getattr(usage, "candidates_token_count", 0),
+            latency=time.time() - start_time,
+        )
         try:
-            return response.text
+            text = response.text
+            if self.verbose:
+                print(f"📦 {self.model_name}: response {format_size(len(text.encode('utf-8')))}")
+            return text
         except Exception as e:
             print(e)
             print(response.prompt_feedback)
-            return str(response.prompt_feedback)
+            return ModelErrorResponse(str(response.prompt_feedback))
 
 if __name__ == "__main__":
     pass
\ No newline at end of file
@@ -1,6 +1,6 @@
 import json
 import re
-from typing import List, Dict, Any, Union, Optional
+from typing import List, Dict, Any, Union, Optional, Callable, Tuple
 import io
 import os
 import base64
@@ -10,6 +10,11 @@ import litellm
 from litellm import completion, completion_cost
 from dotenv import load_dotenv
 import random
+import time
+
+from mllm_tools.media import MediaPreprocessor, format_size, is_image_path
+from mllm_tools.errors import ModelErrorResponse
+from mllm_tools.usage import get_usage_tracker
 
 load_dotenv()
 
@@ -39,6 +44,7 @@ class LiteLLMWrapper:
         self.print_cost = print_cost
         self.verbose = verbose
         self.accumulated_cost = 0
+        self.media_preprocessor = MediaPreprocessor.for_model(model_name)
         
         # Handle Gemini API key fallback mechanism
         if "gemini" in model_name.lower():
@@ -98,6 +104,57 @@ class LiteLLMWrapper:
             with open(file_path, "rb") as file:
                 return base64.b64encode(file.read()).decode("utf-8")
 
+    def _encode_media(self, content: Union[str, Image.Image]) -> Tuple[str, str]:
+        """
+        Encode a media item for a data URL, downscaling and compressing images first
+        
+        Args:
+            content: Path to local file or PIL Image object
+            
+        Returns:
+            Tuple of (MIME type, base64 encoded data)
+        """
+        if isinstance(content, Image.Image) or is_image_path(content):
+            data, mime_type = self.media_preprocessor.encode_image(content)
+            return mime_type, base64.b64encode(data).decode("utf-8")
+        return self._get_mime_type(content), self._encode_file(content)
+
+    def _log_payload_sizes(self, request_bytes: int, media_parts: int, content: str) -> None:
+        """Log request and response sizes for calls that carry media."""
+        if media_parts:
+            response_bytes = len(content.encode("utf-8")) if content else 0
+            print(f"📦 {self.model_name}: request {format_size(request_bytes)} "
+                  f"({media_parts} media part(s)), response {format_size(response_bytes)}")
+
+    def _record_usage(self, response: Any, metadata: Dict[str, Any], latency: float) -> None:
+        """
+        Record token counts, latency and cost of a completion under its generation name
+        
+        Args:
+            response: LiteLLM response (None when it could not be rebuilt from a stream)
+            metadata: Call metadata holding the generation name
+            latency: Seconds spent in the call
+        """
+        usage = getattr(response, "usage", None)
+        cost = 0.0
+        if response is not None:
+            try:
+                cost = float(completion_cost(completion_response=response))
+            except Exception as e:
+                if self.print_cost:
+                    print(f"Could not compute cost: {e}")
+        if self.print_cost:
+            self.accumulated_cost += cost
+            print(f"Accumulated Cost: ${self.accumulated_cost:.10f}")
+        get_usage_tracker().record(
+            generation_name=metadata.get("generation_name"),
+            model=self.model_name,
+            input_tokens=getattr(usage, "prompt_tokens", 0),
+            output_tokens=getattr(usage, "completion_tokens", 0),
+            latency=latency,
+            cost=cost,
+        )
+
     def _get_mime_type(self, file_path: str) -> str:
         """
         Get the MIME type of a file based on its extension
@@ -113,13 +170,51 @@ class LiteLLMWrapper:
             raise ValueError(f"Unsupported file type: {file_path}")
         return mime_type
 
-    def __call__(self, messages: List[Dict[str, Any]], metadata: Optional[Dict[str, Any]] = None) -> str:
+    def _stream_completion(self, completion_kwargs: Dict[str, Any], stop_predicate: Callable[[str], bool]) -> Tuple[str, list]:
+        """
+        Stream a completion and stop reading as soon as the stop predicate accepts the text so far
+        
+        Args:
+            completion_kwargs: Keyword arguments for litellm completion
+            stop_predicate: Callable receiving the accumulated text, returns True to stop generation
+            
+        Returns:
+            Tuple of (accumulated text, received chunks)
+        """
+        chunks = []
+        text = ""
+        stream = completion(**completion_kwargs, stream=True)
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    text += delta
+                    if stop_predicate(text):
+                        if self.verbose:
+                            print(f"Stop condition met after {len(text)} characters, ending stream early")
+                        break
+        finally:
+            # Closing the stream drops the connection so the provider stops generating
+            close = getattr(stream, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception:
+                    pass
+        return text, chunks
+
+    def __call__(self, messages: List[Dict[str, Any]], metadata: Optional[Dict[str, Any]] = None, stop_predicate: Optional[Callable[[str], bool]] = None) -> str:
         """
         Process messages and return completion
         
         Args:
             messages: List of message dictionaries with 'type' and 'content' keys
             metadata: Optional metadata to pass to litellm completion, e.g. for Langfuse tracking
+            stop_predicate: Optional callable receiving the text generated so far. When given, the
+                completion is streamed and generation stops as soon as the predicate returns True
         
         Returns:
             Generated text response
@@ -130,8 +225,11 @@ class LiteLLMWrapper:
         metadata["trace_name"] = f"litellm-completion-{self.model_name}"
         # Convert messages to LiteLLM format
         formatted_messages = []
+        request_bytes = 0
+        media_parts = 0
         for msg in messages:
             if msg["type"] == "text":
+                request_bytes += len(msg["content"].encode("utf-8"))
                 formatted_messages.append({
                     "role": "user",
                     "content": [{"type": "text", "text": msg["content"]}]
@@ -140,17 +238,15 @@ class LiteLLMWrapper:
                 # Check if content is a local file path or PIL Image
                 if isinstance(msg["content"], Image.Image) or os.path.isfile(msg["content"]):
                     try:
-                        if isinstance(msg["content"], Image.Image):
-                            mime_type = "image/png"
-                        else:
-                            mime_type = self._get_mime_type(msg["content"])
-                        base64_data = self._encode_file(msg["content"])
+                        mime_type, base64_data = self._encode_media(msg["content"])
                         data_url = f"data:{mime_type};base64,{base64_data}"
                     except ValueError as e:
                         print(f"Error processing file {msg['content']}: {e}")
                         continue
                 else:
                     data_url = msg["content"]
+                request_bytes += len(data_url)
+                media_parts += 1
                 
                 # Append the formatted message based on the model
                 if "gemini" in self.model_name:
@@ -185,43 +281,47 @@ class LiteLLMWrapper:
                     raise ValueError("Only support Gemini and Gpt for Multimodal capability now")
 
         try:
+            completion_kwargs = {
+                "model": self.model_name,
+                "messages": formatted_messages,
+                "temperature": self.temperature,
+                "metadata": metadata,
+                "max_retries": 99
+            }
             # if it's openai o series model, set temperature to None and reasoning_effort to "medium"
             if (re.match(r"^o\d+.*$", self.model_name) or re.match(r"^openai/o.*$", self.model_name)):
                 self.temperature = None
                 self.reasoning_effort = "medium"
-                response = completion(
-                    model=self.model_name,
-                    messages=formatted_messages,
-                    temperature=self.temperature,
-                    reasoning_effort=self.reasoning_effort,
-                    metadata=metadata,
-                    max_retries=99
-                )
-            else:
-                response = completion(
-                    model=self.model_name,
-                    messages=formatted_messages,
-                    temperature=self.temperature,
-                    metadata=metadata,
-                    max_retries=99
-                )
-            if self.print_cost:
-                # pass your response from completion to completion_cost
-                cost = completion_cost(completion_response=response)
-                formatted_string = f"Cost: ${float(cost):.10f}"
-                # print(formatted_string)
-                self.accumulated_cost += cost
-                print(f"Accumulated Cost: ${self.accumulated_cost:.10f}")
+                completion_kwargs["temperature"] = self.temperature
+                completion_kwargs["reasoning_effort"] = self.reasoning_effort
+
+            start_time = time.time()
+            if stop_predicate is not None:
+                content, chunks = self._stream_completion(completion_kwargs, stop_predicate)
+                try:
+                    response = litellm.stream_chunk_builder(chunks, messages=formatted_messages)
+                except Exception as e:
+                    print(f"Could not rebuild streamed response for usage accounting: {e}")
+                    response = None
+                self._record_usage(response, metadata, time.time() - start_time)
+                if not content:
+                    raise ValueError(f"Model {self.model_name} returned empty streamed content")
+                self._log_payload_sizes(request_bytes, media_parts, content)
+                return content
+
+            response = completion(**completion_kwargs)
+            self._record_usage(response, metadata, time.time() - start_time)
                 
             content = response.choices[0].message.content
             if content is None:
                 print(f"Got null response from model. Full response: {response}")
                 raise ValueError(f"Model {self.model_name} returned None content. Full response: {response}")
+            self._log_payload_sizes(request_bytes, media_parts, content)
             return content
         
         except Exception as e:
             print(f"Error in model completion: {e}")
-            return str(e)
+            return ModelErrorResponse(str(e))
         
 if __name__ == "__main__":
     pass
\ No newline at end of file
@@ -0,0 +1,160 @@
+"""
+Image preprocessing for multimodal model calls.
+
+Snapshots and evaluation frames are rendered at full resolution (1920x1080
+PNG), which makes every visual request several megabytes. The preprocessor
+downscales images to a per-model maximum dimension, re-encodes them as
+JPEG/WebP and caches the result by content hash.
+
+Environment overrides:
+    MEDIA_PREPROCESSING: "false" to send images untouched
+    MEDIA_MAX_DIMENSION: Longest side in pixels, overrides the per-model default
+    MEDIA_IMAGE_FORMAT: "JPEG" or "WEBP"
+    MEDIA_IMAGE_QUALITY: Encoder quality (1-100)
+    MEDIA_CACHE_SIZE: Number of encoded images kept in memory
+"""
+
+import hashlib
+import io
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from typing import Tuple, Union
+
+from PIL import Image
+
+# Longest side that the provider actually looks at; anything larger is resized server-side anyway
+MODEL_MAX_DIMENSIONS = {
+    "gpt": 2048,
+    "o1": 2048,
+    "o3": 2048,
+    "o4": 2048,
+    "claude": 1568,
+    "gemini": 3072,
+}
+DEFAULT_MAX_DIMENSION = 1536
+
+_FORMAT_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+
+def format_size(num_bytes: int) -> str:
+    """Human readable byte count used in payload logs."""
+    if num_bytes >= 1024 * 1024:
+        return f"{num_bytes / (1024 * 1024):.2f} MB"
+    if num_bytes >= 1024:
+        return f"{num_bytes / 1024:.1f} KB"
+    return f"{num_bytes} B"
+
+
+def is_image_path(path: str) -> bool:
+    """Check whether a local path points to an image file."""
+    mime_type, _ = mimetypes.guess_type(path)
+    return mime_type is not None and mime_type.startswith("image/")
+
+
+class MediaPreprocessor:
+    """Downscales and re-encodes images before they are sent to a model."""
+
+    # Shared by all instances; keys include the encoding settings
+    _cache: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self,
+                 max_dimension: int = DEFAULT_MAX_DIMENSION,
+                 image_format: str = "JPEG",
+                 quality: int = 85,
+                 cache_size: int = 64,
+                 enabled: bool = True):
+        """
+        Args:
+            max_dimension: Longest image side in pixels after downscaling
+            image_format: Output encoding, "JPEG" or "WEBP"
+            quality: Encoder quality (1-100)
+            cache_size: Number of encoded images kept in the LRU cache
+            enabled: When False images are encoded as lossless PNG at full size
+        """
+        self.max_dimension = max_dimension
+        self.image_format = image_format.upper()
+        if self.image_format not in _FORMAT_MIME_TYPES:
+            raise ValueError(f"Unsupported image format: {image_format}")
+        self.quality = quality
+        self.cache_size = cache_size
+        self.enabled = enabled
+
+    @classmethod
+    def for_model(cls, model_name: str) -> "MediaPreprocessor":
+        """
+        Build a preprocessor for a model, applying environment overrides
+
+        Args:
+            model_name: Model name, with or without provider prefix
+
+        Returns:
+            MediaPreprocessor: Configured preprocessor
+        """
+        base_name = model_name.split("/")[-1].lower()
+        max_dimension = next(
+            (dim for prefix, dim in MODEL_MAX_DIMENSIONS.items() if base_name.startswith(prefix)),
+            DEFAULT_MAX_DIMENSION,
+        )
+        return cls(
+            max_dimension=int(os.getenv("MEDIA_MAX_DIMENSION", max_dimension)),
+            image_format=os.getenv("MEDIA_IMAGE_FORMAT", "JPEG"),
+            quality=int(os.getenv("MEDIA_IMAGE_QUALITY", "85")),
+            cache_size=int(os.getenv("MEDIA_CACHE_SIZE", "64")),
+            enabled=os.getenv("MEDIA_PREPROCESSING", "true").lower() in ["true", "1", "yes", "on", "enabled"],
+        )
+
+    @property
+    def mime_type(self) -> str:
+        return _FORMAT_MIME_TYPES[self.image_format if self.enabled else "PNG"]
+
+    def _cache_key(self, image: Image.Image) -> str:
+        digest = hashlib.sha256(image.tobytes())
+        digest.update(f"{image.size}{image.mode}{self.max_dimension}{self.image_format}{self.quality}{self.enabled}".encode())
+        return digest.hexdigest()
+
+    def _encode(self, image: Image.Image) -> bytes:
+        buffered = io.BytesIO()
+        if not self.enabled:
+            image.save(buffered, format="PNG")
+            return buffered.getvalue()
+
+        if max(image.size) > self.max_dimension:
+            image = image.copy()
+            image.thumbnail((self.max_dimension, self.max_dimension), Image.LANCZOS)
+        if self.image_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(buffered, format=self.image_format, quality=self.quality)
+        return buffered.getvalue()
+
+    def encode_image(self, image: Union[str, Image.Image]) -> Tuple[bytes, str]:
+        """
+        Encode an image for upload, using the cache when the same content was seen before
+
+        Args:
+            image: PIL Image or path to an image file
+
+        Returns:
+            Tuple[bytes, str]: Encoded bytes and their MIME type
+        """
+        if isinstance(image, str):
+            with Image.open(image) as opened:
+                opened.load()
+                image = opened.copy()
+
+        key = self._cache_key(image)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        encoded = (self._encode(image), self.mime_type)
+        with self._lock:
+            self._cache[key] = encoded
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return encoded
@@ -0,0 +1,211 @@
+"""
+Latency-aware routing of model calls by pipeline stage.
+
+Auxiliary calls (plugin detection, RAG query generation, Tavily query
+extraction) sit on the critical path of every scene but rarely need the
+heaviest model. ``ModelRouter`` maps each ``generation_name`` to a model tier,
+tracks an exponentially weighted latency and failure rate per model, and
+moves a stage with a latency SLO to the next faster tier while its preferred
+model is breaching that SLO. A call counts as failed when the wrapper raises
+or returns an error response (see ``mllm_tools.errors``); a failed routed
+call is retried once on the next faster tier.
+"""
+
+import fnmatch
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from mllm_tools.errors import is_error_response
+
+# Tier preferred by each stage, matched against the call's generation_name (fnmatch patterns).
+# Stages that are not listed always use the default (strongest) tier.
+DEFAULT_ROUTES = {
+    "detect-relevant-plugins": "fast",
+    "rag_query_generation*": "fast",
+    "rag-query-generation*": "fast",
+    "tavily-query-generation": "fast",
+}
+
+# Latency SLO in seconds for routed stages
+DEFAULT_SLO_SECONDS = 15.0
+
+
+class ModelStats:
+    """Exponentially weighted latency and failure rate of one model."""
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self.failure_rate = 0.0
+        self.calls = 0
+
+    def record(self, latency: float, failed: bool) -> None:
+        self.calls += 1
+        self.latency = latency if self.latency is None else self.alpha * latency + (1 - self.alpha) * self.latency
+        self.failure_rate = self.alpha * float(failed) + (1 - self.alpha) * self.failure_rate
+
+
+class ModelRouter:
+    """Model wrapper proxy that picks a model tier per call from its generation_name.
+
+    Tiers are given strongest first; shifting a stage moves it to a later tier.
+    Stages without a route use ``default_tier``. Attribute access falls through
+    to the default tier's model, so ``model_name`` and cost counters behave as
+    before for code that inspects the helper model.
+    """
+
+    def __init__(self,
+                 tiers: Dict[str, Any],
+                 routes: Optional[Dict[str, str]] = None,
+                 default_tier: Optional[str] = None,
+                 slo_seconds: float = DEFAULT_SLO_SECONDS,
+                 max_failure_rate: float = 0.3,
+                 alpha: float = 0.2,
+                 probe_every: int = 10,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            tiers (Dict[str, Any]): Tier name -> model wrapper, ordered strongest first
+            routes (Dict[str, str], optional): generation_name pattern -> preferred tier. Defaults to DEFAULT_ROUTES.
+            default_tier (str, optional): Tier for unrouted stages. Defaults to the first tier.
+            slo_seconds (float): Latency SLO of routed stages
+            max_failure_rate (float): Failure rate above which a model counts as unhealthy
+            alpha (float): Weight of the newest observation in the moving averages
+            probe_every (int): While shifted, send every n-th call to the preferred tier so it can recover
+            clock (Callable[[], float]): Time source, injectable for tests
+        """
+        if not tiers:
+            raise ValueError("ModelRouter needs at least one tier")
+        self.tiers = dict(tiers)
+        self.tier_order: List[str] = list(self.tiers)
+        self.routes = dict(DEFAULT_ROUTES if routes is None else routes)
+        self.default_tier = default_tier or self.tier_order[0]
+        self.slo_seconds = slo_seconds
+        self.max_failure_rate = max_failure_rate
+        self.alpha = alpha
+        self.probe_every = max(1, probe_every)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._stats: Dict[str, ModelStats] = {}
+        self._shifted_calls: Dict[str, int] = {}
+        self._routed: Dict[str, Dict[str, int]] = {}
+
+    def __getattr__(self, name):
+        return getattr(self.tiers[self.default_tier], name)
+
+    @staticmethod
+    def _model_key(model) -> str:
+        return getattr(model, "model_name", type(model).__name__)
+
+    def _preferred_tier(self, generation_name: str) -> Optional[str]:
+        for pattern, tier in self.routes.items():
+            if fnmatch.fnmatchcase(generation_name, pattern) and tier in self.tiers:
+                return tier
+        return None
+
+    def _healthy(self, model) -> bool:
+        stats = self._stats.get(self._model_key(model))
+        if stats is None or stats.latency is None:
+            return True
+        return stats.latency <= self.slo_seconds and stats.failure_rate <= self.max_failure_rate
+
+    def select_tier(self, generation_name: Optional[str]) -> str:
+        """Choose the tier for a call, shifting to faster tiers while the preferred one breaches its SLO.
+
+        Args:
+            generation_name (Optional[str]): Stage of the call
+
+        Returns:
+            str: Tier name
+        """
+        generation_name = generation_name or ""
+        preferred = self._preferred_tier(generation_name)
+        if preferred is None:
+            return self.default_tier
+
+        with self._lock:
+            start = self.tier_order.index(preferred)
+            tier = preferred
+            for candidate in self.tier_order[start:]:
+                tier = candidate
+                if self._healthy(self.tiers[candidate]):
+                    break
+            if tier != preferred:
+                # Occasionally retry the preferred tier so its statistics can recover
+                shifted = self._shifted_calls.get(generation_name, 0) + 1
+                self._shifted_calls[generation_name] = shifted
+                if shifted % self.probe_every == 0:
+                    tier = preferred
+            else:
+                self._shifted_calls.pop(generation_name, None)
+            counts = self._routed.setdefault(generation_name, {})
+            counts[tier] = counts.get(tier, 0) + 1
+        return tier
+
+    def _record(self, model, latency: float, failed: bool) -> None:
+        key = self._model_key(model)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = ModelStats(self.alpha)
+            stats.record(latency, failed)
+
+    def __call__(self, messages: List[Dict[str, Any]], metadata: Optional[Dict[str, Any]] = None, **kwargs) -> str:
+        generation_name = (metadata or {}).get("generation_name")
+        tier = self.select_tier(generation_name)
+        try:
+            result, error = self._call_tier(tier, messages, metadata, **kwargs), None
+        except Exception as e:
+            result, error = None, e
+        if error is None and not is_error_response(result):
+            return result
+
+        # A failed auxiliary call is retried once on the next faster tier
+        fallback = self._fallback_tier(generation_name, tier)
+        if fallback is None:
+            if error is not None:
+                raise error
+            return result
+        print(f"⚠️ {self._model_key(self.tiers[tier])} failed for {generation_name}, retrying on the {fallback} tier")
+        return self._call_tier(fallback, messages, metadata, **kwargs)
+
+    def _fallback_tier(self, generation_name: Optional[str], tier: str) -> Optional[str]:
+        """Next faster tier for a routed stage whose call failed, if any."""
+        if self._preferred_tier(generation_name or "") is None:
+            return None
+        index = self.tier_order.index(tier)
+        return self.tier_order[index + 1] if index + 1 < len(self.tier_order) else None
+
+    def _call_tier(self, tier: str, messages: List[Dict[str, Any]], metadata: Optional[Dict[str, Any]], **kwargs) -> str:
+        model = self.tiers[tier]
+        start = self.clock()
+        try:
+            result = model(messages, metadata, **kwargs)
+        except Exception:
+            self._record(model, self.clock() - start, failed=True)
+            raise
+        self._record(model, self.clock() - start, failed=is_error_response(result))
+        return result
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return per-model latency/failure averages and per-stage routing counts."""
+        with self._lock:
+            return {
+                "models": {
+                    name: {"ewma_latency": round(stats.latency or 0.0, 3),
+                           "failure_rate": round(stats.failure_rate, 3),
+                           "calls": stats.calls}
+                    for name, stats in self._stats.items()
+                },
+                "routes": {stage: dict(counts) for stage, counts in self._routed.items()},
+            }
+
+    def print_report(self) -> None:
+        """Print where each stage was routed and how each model performed."""
+        metrics = self.get_metrics()
+        print("\n🧭 Model routing:")
+        for name, stats in metrics["models"].items():
+            print(f"  {name}: {stats['calls']} calls, ~{stats['ewma_latency']:.1f}s, failure rate {stats['failure_rate']:.0%}")
+        for stage, counts in sorted(metrics["routes"].items()):
+            print(f"  {stage}: " + ", ".join(f"{tier}={n}" for tier, n in counts.items()))
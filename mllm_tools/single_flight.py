@@ -0,0 +1,219 @@
+"""
+In-flight request coalescing for the model wrappers.
+
+When several scenes or topics issue the exact same prompt at the same moment
+(plugin detection for one topic, RAG query generation for repeated plans,
+eval transcript fixes), only one provider call is made and every concurrent
+caller receives its result. Nothing is cached once the call completes.
+Deterministic requests (temperature 0) are always coalesced. Sampled
+requests are only coalesced for the helper stages in
+``COALESCED_GENERATION_NAMES``, whose callers are fine sharing one sampled
+answer; other sampled requests are expected to differ. Streamed requests with
+a stop predicate are never coalesced, since the predicate is the caller's own.
+"""
+
+import asyncio
+import fnmatch
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is still running wait on the same future. Works from plain
+    threads and from coroutines.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self.stats = {"calls": 0, "coalesced": 0}
+
+    def _claim(self, key: str) -> Tuple[Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.stats["calls"] += 1
+            return future, True
+
+    def _settle(self, key: str, future: Future, result: Any = None,
+                error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, fn: Callable, *args, **kwargs) -> Any:
+        """Run ``fn`` once for all concurrent callers using ``key``.
+
+        Args:
+            key (str): Request identity; callers with equal keys share one call
+            fn (Callable): Function performing the request
+
+        Returns:
+            Any: The result of the shared call (exceptions are re-raised to every caller)
+        """
+        future, leader = self._claim(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result=result)
+        return result
+
+    async def do_async(self, key: str, fn: Callable, *args, **kwargs) -> Any:
+        """Async variant of :meth:`do`; ``fn`` is a blocking callable run in a worker thread.
+
+        Args:
+            key (str): Request identity; callers with equal keys share one call
+            fn (Callable): Blocking function performing the request
+
+        Returns:
+            Any: The result of the shared call
+        """
+        future, leader = self._claim(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await asyncio.to_thread(fn, *args, **kwargs)
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result=result)
+        return result
+
+
+_default_group = SingleFlight()
+
+
+def get_single_flight_group() -> SingleFlight:
+    """Return the process-wide coalescing group shared by all wrapped models."""
+    return _default_group
+
+
+def _fingerprint_content(content: Any) -> Any:
+    """Turn message content into something stable and cheap to hash."""
+    if HAS_PIL and isinstance(content, Image.Image):
+        return {"image": hashlib.sha256(content.tobytes()).hexdigest(), "size": content.size, "mode": content.mode}
+    if isinstance(content, str) and os.path.isfile(content):
+        # Media paths: identify by path + size + mtime instead of reading large videos
+        stat = os.stat(content)
+        return {"file": os.path.abspath(content), "size": stat.st_size, "mtime": stat.st_mtime}
+    return content
+
+
+def make_request_key(model_name: str, temperature: Any, messages: List[Dict[str, Any]],
+                     extra: Optional[Dict[str, Any]] = None) -> str:
+    """Build the coalescing key for a model request.
+
+    Metadata (trace ids, generation names) is deliberately excluded so that the
+    same prompt issued from different scenes is still recognised as identical.
+
+    Args:
+        model_name (str): Name of the model
+        temperature (Any): Sampling temperature
+        messages (List[Dict[str, Any]]): Messages in the wrapper input format
+        extra (Optional[Dict[str, Any]]): Additional call options that affect the output
+
+    Returns:
+        str: Hex digest identifying the request
+    """
+    payload = {
+        "model": model_name,
+        "temperature": temperature,
+        "messages": [
+            {"type": msg.get("type"), "content": _fingerprint_content(msg.get("content"))}
+            for msg in messages
+        ],
+        "extra": {
+            k: getattr(v, "__qualname__", v) if callable(v) else v
+            for k, v in (extra or {}).items()
+        },
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=repr)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+# generation_name patterns coalesced even when the model samples
+COALESCED_GENERATION_NAMES = (
+    "detect-relevant-plugins",
+    "rag_query_generation*",
+    "rag-query-generation*",
+)
+
+
+def _is_shared_stage(metadata: Optional[Dict[str, Any]]) -> bool:
+    """Whether a request comes from a helper stage whose sampled answer may be shared."""
+    generation_name = (metadata or {}).get("generation_name") or ""
+    return any(fnmatch.fnmatchcase(generation_name, pattern) for pattern in COALESCED_GENERATION_NAMES)
+
+
+def _is_deterministic(temperature: Any) -> bool:
+    """Whether a request at this temperature is expected to produce the same output every time."""
+    try:
+        return temperature is not None and float(temperature) <= 0
+    except (TypeError, ValueError):
+        return False
+
+
+class CoalescingModelWrapper:
+    """Model wrapper proxy that coalesces identical concurrent requests.
+
+    Requests are passed straight through when a ``stop_predicate`` is given,
+    or when the model samples (temperature above 0 or unknown) and the
+    request's ``generation_name`` is not in ``COALESCED_GENERATION_NAMES``.
+
+    Attribute access falls through to the wrapped model, so ``model_name``,
+    ``temperature`` and cost counters behave as before. The metadata of the
+    caller that actually issues the request is the one reported to tracing.
+    """
+
+    def __init__(self, model, group: Optional[SingleFlight] = None):
+        self.wrapped_model = model
+        self.group = group or get_single_flight_group()
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped_model, name)
+
+    def __call__(self, messages: List[Dict[str, Any]], metadata: Optional[Dict[str, Any]] = None, **kwargs) -> str:
+        model_name = getattr(self.wrapped_model, "model_name", type(self.wrapped_model).__name__)
+        temperature = getattr(self.wrapped_model, "temperature", None)
+        if kwargs.get("stop_predicate") is not None or not (_is_deterministic(temperature) or _is_shared_stage(metadata)):
+            return self.wrapped_model(messages, metadata, **kwargs)
+        key = make_request_key(model_name, temperature, messages, kwargs)
+        return self.group.do(key, self.wrapped_model, messages, metadata, **kwargs)
+
+
+def with_coalescing(model, group: Optional[SingleFlight] = None):
+    """Wrap ``model`` in a :class:`CoalescingModelWrapper` unless it already is one (or is None)."""
+    if model is None or isinstance(model, CoalescingModelWrapper):
+        return model
+    return CoalescingModelWrapper(model, group)
+
+
+def unwrap_model(model):
+    """Return the underlying model wrapper of a coalescing proxy."""
+    while isinstance(model, CoalescingModelWrapper):
+        model = model.wrapped_model
+    return model
@@ -0,0 +1,124 @@
+"""
+Per-call token, latency and cost accounting for the model wrappers.
+
+Every wrapper call is recorded under the ``generation_name`` from its
+metadata, so a run can be broken down by pipeline stage (scene outline,
+code generation, error fixing, ...) once it finishes. Calls are aggregated
+per stage as they are recorded, so a long-lived server or worker keeps one
+entry per stage rather than one per call, and ``take_summary`` hands out the
+totals since the last report.
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+
+def _empty_stats() -> Dict[str, Any]:
+    return {"calls": 0, "input_tokens": 0, "output_tokens": 0,
+            "total_latency": 0.0, "max_latency": 0.0, "cost": 0.0}
+
+
+class UsageTracker:
+    """Thread-safe per-stage totals of model call usage, queryable at the end of a run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, Any]] = {}
+
+    def record(self,
+               generation_name: Optional[str],
+               model: str,
+               input_tokens: int = 0,
+               output_tokens: int = 0,
+               latency: float = 0.0,
+               cost: float = 0.0) -> None:
+        """
+        Record one model call.
+
+        Args:
+            generation_name (Optional[str]): Pipeline stage that issued the call
+            model (str): Model name
+            input_tokens (int): Prompt tokens
+            output_tokens (int): Completion tokens
+            latency (float): Wall-clock seconds spent in the call
+            cost (float): Cost in USD, 0 when unknown
+        """
+        latency = float(latency)
+        with self._lock:
+            stats = self._totals.setdefault(generation_name or "unnamed", _empty_stats())
+            stats["calls"] += 1
+            stats["input_tokens"] += int(input_tokens or 0)
+            stats["output_tokens"] += int(output_tokens or 0)
+            stats["total_latency"] += latency
+            stats["max_latency"] = max(stats["max_latency"], latency)
+            stats["cost"] += float(cost or 0.0)
+            stats.setdefault("models", set()).add(model)
+
+    @staticmethod
+    def _finish(totals: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        summary = {}
+        for name, stats in totals.items():
+            stats = dict(stats)
+            stats["models"] = sorted(stats.get("models", ()))
+            stats["avg_latency"] = stats["total_latency"] / stats["calls"]
+            summary[name] = stats
+        return summary
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Aggregate usage per generation name.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Per generation name the call count, token totals,
+                total/average/max latency, total cost and the models used
+        """
+        with self._lock:
+            return self._finish(self._totals)
+
+    def take_summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return the usage per generation name since the last call and start counting afresh.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Same shape as :meth:`summary`
+        """
+        with self._lock:
+            totals, self._totals = self._totals, {}
+        return self._finish(totals)
+
+    def print_summary(self, summary: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        """Print a per-stage usage table, of the current totals unless a summary is given."""
+        summary = self.summary() if summary is None else summary
+        if not summary:
+            return
+        print("\n📊 Model usage by generation:")
+        print(f"{'Generation':<40} {'Calls':>6} {'In tok':>10} {'Out tok':>10} {'Avg s':>8} {'Max s':>8} {'Cost $':>10}")
+        for name, s in sorted(summary.items(), key=lambda item: -item[1]["total_latency"]):
+            print(f"{name[:40]:<40} {s['calls']:>6} {s['input_tokens']:>10} {s['output_tokens']:>10} "
+                  f"{s['avg_latency']:>8.2f} {s['max_latency']:>8.2f} {s['cost']:>10.4f}")
+
+    def save(self, path: str, summary: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        """
+        Write the per-stage summary to a JSON file.
+
+        Args:
+            path (str): Destination file
+            summary (Optional[Dict]): Summary to write. Defaults to the current totals
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"summary": self.summary() if summary is None else summary}, f, indent=2)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals.clear()
+
+
+_usage_tracker = UsageTracker()
+
+
+def get_usage_tracker() -> UsageTracker:
+    """Return the process-wide usage tracker shared by all wrappers."""
+    return _usage_tracker
@@ -3,6 +3,7 @@ from PIL import Image
 import google.generativeai as genai
 import tempfile
 import os
+import re
 from .gemini import GeminiWrapper
 try:
     from .vertex_ai import VertexAIWrapper
@@ -127,6 +128,20 @@ def _extract_code(text: str) -> str:
     except IndexError:
         return text
     
+def _diff_fence_closed(text: str) -> bool:
+    """Stop predicate for streamed patch responses: True once the first ```diff block has been closed.
+
+    Args:
+        text (str): Text generated so far.
+
+    Returns:
+        bool: Whether a complete ```diff ... ``` block is present in the text.
+    """
+    start = text.find("```diff")
+    if start == -1:
+        return False
+    return re.search(r"\n\s*```", text[start + len("```diff"):]) is not None
+    
 def _upload_to_gemini(input, mime_type=None):
     """Uploads the given file or PIL image to Gemini.
 
@@ -1,5 +1,5 @@
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 try:
     import vertexai
     from vertexai.generative_models import GenerativeModel, Part
@@ -56,12 +56,14 @@ class VertexAIWrapper:
         vertexai.init(project=project_id, location=location)
         self.model = GenerativeModel(model_name)
         
-    def __call__(self, messages: List[Dict[str, Any]], metadata: Optional[Dict[str, Any]] = None) -> str:
+    def __call__(self, messages: List[Dict[str, Any]], metadata: Optional[Dict[str, Any]] = None, stop_predicate: Optional[Callable[[str], bool]] = None) -> str:
         """Process messages and return completion.
         
         Args:
             messages: List of message dictionaries containing type and content
             metadata: Optional metadata dictionary to pass to the model
+            stop_predicate: Optional callable receiving the text generated so far. When given, the
+                response is streamed and generation stops as soon as the predicate returns True
             
         Returns:
             Generated text response from the model
@@ -89,12 +91,21 @@ class VertexAIWrapper:
                         mime_type=mime_type
                     ))
                     
+        generation_config = {
+            "temperature": self.temperature,
+            "top_p": 0.95,
+        }
+        if stop_predicate is not None:
+            text = ""
+            for chunk in self.model.generate_content(parts, generation_config=generation_config, stream=True):
+                text += chunk.text
+                if stop_predicate(text):
+                    break
+            return text
+
         response = self.model.generate_content(
             parts,
-            generation_config={
-                "temperature": self.temperature,
-                "top_p": 0.95,
-            }
+            generation_config=generation_config
         )
         
         return response.text
\ No newline at end of file
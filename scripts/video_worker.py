@@ -28,6 +28,7 @@ from appwrite.exception import AppwriteException
 # from generate_video import VideoGenerator
 # from mllm_tools.litellm import LiteLLMWrapper
 from src.core.appwrite_integration import AppwriteVideoManager
+from src.core.resource_registry import preload_shared_resources
 from src.config.config import Config
 
 class VideoWorker:
@@ -156,6 +157,8 @@ class VideoWorker:
                 max_retries=Config.DEFAULT_MAX_RETRIES,
                 only_plan=False
             )
+            # The pipeline records its outcome in the state store; use it when no result is returned
+            result = result or generator.get_pipeline_result(topic)
             
             if result and result.get('success'):
                 # Check for generated video file
@@ -276,6 +279,9 @@ async def main():
     
     args = parser.parse_args()
     
+    # Load context examples, plugin descriptions and model lists once for every job this worker runs
+    preload_shared_resources()
+
     try:
         worker = VideoWorker()
         
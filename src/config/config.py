@@ -21,11 +21,94 @@ class Config:
 
     _visual_fix_flag = os.getenv("USE_VISUAL_FIX_CODE", "false").lower()
     USE_VISUAL_FIX_CODE = _visual_fix_flag in ["true", "1", "yes", "on", "enabled"]
+    # With visual fix code: record mobject layouts while rendering and call the VLM only when they look wrong
+    _layout_probe_flag = os.getenv("USE_LAYOUT_PROBE", "true").lower()
+    USE_LAYOUT_PROBE = _layout_probe_flag in ["true", "1", "yes", "on", "enabled"]
+    LAYOUT_SAFE_MARGIN = float(os.getenv("LAYOUT_SAFE_MARGIN", "0.5"))
+    LAYOUT_MIN_SPACING = float(os.getenv("LAYOUT_MIN_SPACING", "0.3"))
     
     # Memvid toggle - disabled by default to prevent segfaults
     _memvid_flag = os.getenv("USE_MEMVID", "false").lower()
     USE_MEMVID = _memvid_flag in ["true", "1", "yes", "on", "enabled"]
     
+    # Stream code-producing completions and stop once the first ```python block is closed
+    _stream_stop_flag = os.getenv("USE_STREAMING_EARLY_STOP", "true").lower()
+    USE_STREAMING_EARLY_STOP = _stream_stop_flag in ["true", "1", "yes", "on", "enabled"]
+    
+    # Share one provider call between identical concurrent LLM requests
+    _coalesce_flag = os.getenv("USE_REQUEST_COALESCING", "true").lower()
+    USE_REQUEST_COALESCING = _coalesce_flag in ["true", "1", "yes", "on", "enabled"]
+    
+    # Warm-start planning from cached plans of similar topics
+    _plan_cache_flag = os.getenv("USE_PLAN_CACHE", "false").lower()
+    USE_PLAN_CACHE = _plan_cache_flag in ["true", "1", "yes", "on", "enabled"]
+    PLAN_CACHE_DIR = os.getenv("PLAN_CACHE_DIR", os.path.join("data", "plan_cache"))
+    PLAN_CACHE_REUSE_THRESHOLD = float(os.getenv("PLAN_CACHE_REUSE_THRESHOLD", "0.97"))
+    PLAN_CACHE_ADAPT_THRESHOLD = float(os.getenv("PLAN_CACHE_ADAPT_THRESHOLD", "0.85"))
+    PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "500"))
+
+    # Race several code candidates per scene and keep the first one that renders
+    _speculative_flag = os.getenv("USE_SPECULATIVE_CODEGEN", "false").lower()
+    USE_SPECULATIVE_CODEGEN = _speculative_flag in ["true", "1", "yes", "on", "enabled"]
+    SPECULATIVE_MAX_CANDIDATES = int(os.getenv("SPECULATIVE_MAX_CANDIDATES", "3"))
+    SPECULATIVE_TARGET_SUCCESS = float(os.getenv("SPECULATIVE_TARGET_SUCCESS", "0.9"))
+    SPECULATION_STATS_PATH = os.getenv("SPECULATION_STATS_PATH", os.path.join("data", "speculation_stats.json"))
+
+    # Start planning each scene as soon as its outline block has been streamed
+    _stream_outline_flag = os.getenv("USE_STREAMING_OUTLINE", "false").lower()
+    USE_STREAMING_OUTLINE = _stream_outline_flag in ["true", "1", "yes", "on", "enabled"]
+
+    # Route auxiliary helper calls to faster models and shift them further when their latency SLO is breached
+    _routing_flag = os.getenv("USE_MODEL_ROUTING", "false").lower()
+    USE_MODEL_ROUTING = _routing_flag in ["true", "1", "yes", "on", "enabled"]
+    FAST_HELPER_MODEL = os.getenv("FAST_HELPER_MODEL", "gemini/gemini-2.5-flash")
+    LITE_HELPER_MODEL = os.getenv("LITE_HELPER_MODEL", "gemini/gemini-2.5-flash-lite-preview-06-17")
+    HELPER_LATENCY_SLO = float(os.getenv("HELPER_LATENCY_SLO", "15"))
+
+    # Try deterministic rule-based fixes before asking the LLM to fix a render error
+    _auto_fixer_flag = os.getenv("USE_AUTO_FIXER", "true").lower()
+    USE_AUTO_FIXER = _auto_fixer_flag in ["true", "1", "yes", "on", "enabled"]
+    AUTO_FIXER_STATS_PATH = os.getenv("AUTO_FIXER_STATS_PATH", os.path.join("data", "auto_fixer_stats.json"))
+
+    # Replay diffs of previously successful fixes for recurring errors before calling the LLM
+    _fix_cache_flag = os.getenv("USE_FIX_CACHE", "true").lower()
+    USE_FIX_CACHE = _fix_cache_flag in ["true", "1", "yes", "on", "enabled"]
+    FIX_CACHE_PATH = os.getenv("FIX_CACHE_PATH", os.path.join("data", "fix_cache.db"))
+    FIX_CACHE_MIN_SUCCESSES = int(os.getenv("FIX_CACHE_MIN_SUCCESSES", "1"))
+
+    # Launch the Tavily and plain LLM fix strategies together and keep the first fix that passes pre-flight
+    _concurrent_fix_flag = os.getenv("USE_CONCURRENT_FIX_STRATEGIES", "true").lower()
+    USE_CONCURRENT_FIX_STRATEGIES = _concurrent_fix_flag in ["true", "1", "yes", "on", "enabled"]
+    # Without cached Tavily results for an error, start the Tavily fix only after the LLM fix ran this many seconds
+    # without a valid fix (or as soon as it failed); with cached results both start together
+    TAVILY_FIX_HEDGE_DELAY = float(os.getenv("TAVILY_FIX_HEDGE_DELAY", "30"))
+
+    # Fix render errors with a diff against the failing code window, regenerating the whole file only as a fallback
+    _localized_fix_flag = os.getenv("USE_LOCALIZED_FIX", "true").lower()
+    USE_LOCALIZED_FIX = _localized_fix_flag in ["true", "1", "yes", "on", "enabled"]
+    LOCALIZED_FIX_WINDOW_RADIUS = int(os.getenv("LOCALIZED_FIX_WINDOW_RADIUS", "8"))
+
+    # Journal agent memory stores and send them to Mem0 in the background instead of on the critical path
+    _memory_queue_flag = os.getenv("USE_MEMORY_WRITE_QUEUE", "true").lower()
+    USE_MEMORY_WRITE_QUEUE = _memory_queue_flag in ["true", "1", "yes", "on", "enabled"]
+    MEMORY_WRITE_JOURNAL_PATH = os.getenv("MEMORY_WRITE_JOURNAL_PATH", os.path.join("data", "memory_write_journal.db"))
+
+    # Agent memory backend: "mem0" (remote, default) or "local" (opt-in SQLite + in-process vector search)
+    AGENT_MEMORY_BACKEND = os.getenv("AGENT_MEMORY_BACKEND", "mem0").lower()
+    LOCAL_AGENT_MEMORY_PATH = os.getenv("LOCAL_AGENT_MEMORY_PATH", os.path.join("data", "agent_memory.db"))
+    # Mirror memories stored by the local backend to Mem0 in the background when a Mem0 key is set
+    _memory_sync_flag = os.getenv("AGENT_MEMORY_SYNC_TO_MEM0", "true").lower()
+    AGENT_MEMORY_SYNC_TO_MEM0 = _memory_sync_flag in ["true", "1", "yes", "on", "enabled"]
+    # Seconds a similar-fix or preventive-example lookup is reused within a run (0 disables); storing a fix invalidates
+    AGENT_MEMORY_LOOKUP_TTL = float(os.getenv("AGENT_MEMORY_LOOKUP_TTL", "900"))
+
+    # Cache Tavily search responses by normalized query and extracted pages by URL across runs
+    _tavily_cache_flag = os.getenv("USE_TAVILY_CACHE", "true").lower()
+    USE_TAVILY_CACHE = _tavily_cache_flag in ["true", "1", "yes", "on", "enabled"]
+    TAVILY_CACHE_PATH = os.getenv("TAVILY_CACHE_PATH", os.path.join("data", "tavily_cache.db"))
+    TAVILY_SEARCH_CACHE_TTL = float(os.getenv("TAVILY_SEARCH_CACHE_TTL", str(7 * 24 * 3600)))
+    TAVILY_EXTRACT_CACHE_TTL = float(os.getenv("TAVILY_EXTRACT_CACHE_TTL", str(30 * 24 * 3600)))
+    
     # AI Model configurations - configurable from environment variables
     DEFAULT_PLANNER_MODEL = os.getenv('DEFAULT_PLANNER_MODEL', 'gemini/gemini-2.5-pro')
     DEFAULT_SCENE_MODEL = os.getenv('DEFAULT_SCENE_MODEL', 'gemini/gemini-2.5-pro')
@@ -38,6 +121,9 @@ class Config:
     DEFAULT_MODEL_TEMPERATURE = float(os.getenv('DEFAULT_MODEL_TEMPERATURE', '0.7'))
     DEFAULT_MAX_RETRIES = int(os.getenv('DEFAULT_MAX_RETRIES', '5'))
     DEFAULT_MAX_SCENE_CONCURRENCY = int(os.getenv('DEFAULT_MAX_SCENE_CONCURRENCY', '5'))
+    # Process-wide limits shared by all topics in a batch run
+    MAX_LLM_CONCURRENCY = int(os.getenv('MAX_LLM_CONCURRENCY', '8'))
+    MAX_RENDER_CONCURRENCY = int(os.getenv('MAX_RENDER_CONCURRENCY', str(max(1, (os.cpu_count() or 2) // 2))))
     
     # ElevenLabs TTS configurations
     ELEVENLABS_API_KEY = os.getenv('ELEVENLABS_API_KEY')
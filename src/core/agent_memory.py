@@ -6,11 +6,17 @@ allowing the agent to learn from past mistakes and improve code generation.
 """
 
 import os
+import copy
 import json
 import hashlib
-from typing import List, Dict, Optional, Tuple
+import threading
+import time
+from typing import Any, Callable, List, Dict, Optional, Tuple
 from datetime import datetime
 
+from mllm_tools.single_flight import SingleFlight
+from src.core.memory_write_queue import get_memory_write_queue
+
 try:
     from mem0 import MemoryClient
     HAS_MEM0 = True
@@ -18,22 +24,100 @@ except ImportError:
     MemoryClient = None
     HAS_MEM0 = False
 
+class LookupMemo:
+    """
+    Per-run memo for memory lookups.
+
+    Scenes of the same topic and scene type ask for the same preventive
+    examples, and retries of one error search for the same fixes. Each
+    distinct lookup reaches the backend once per ``ttl`` seconds; concurrent
+    identical lookups share one backend call. Storing a new fix invalidates
+    everything, and a lookup that was running while the memo was invalidated
+    is not kept. Neither is a lookup that started while the backend was still
+    behind on stores, e.g. with memories waiting in the write-behind queue.
+    """
+
+    def __init__(self, ttl: float = 900.0, backend_lagging: Optional[Callable[[], bool]] = None):
+        """
+        Args:
+            ttl: Seconds a lookup result is reused; 0 or less disables the memo
+            backend_lagging: Returns True while stored memories may not be searchable yet; lookups
+                started then are computed but not memoized
+        """
+        self.ttl = ttl
+        self.backend_lagging = backend_lagging
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._generation = 0
+        self._flight = SingleFlight()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get_or_compute(self, key: Tuple, compute: Callable[[], Any]) -> Any:
+        """
+        Return the memoized result for ``key``, computing it on a miss.
+
+        Args:
+            key: Hashable description of the lookup
+            compute: Runs the lookup against the backend; exceptions are not memoized
+
+        Returns:
+            A shallow copy of the lookup result
+        """
+        if self.ttl <= 0:
+            return compute()
+        digest = hashlib.md5(json.dumps(key, default=str).encode("utf-8")).hexdigest()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[0] > time.monotonic():
+                self.stats["hits"] += 1
+                return copy.copy(entry[1])
+            self.stats["misses"] += 1
+            generation = self._generation
+        memoize = self.backend_lagging is None or not self.backend_lagging()
+
+        def run():
+            result = compute()
+            with self._lock:
+                if memoize and self._generation == generation:
+                    self._entries[digest] = (time.monotonic() + self.ttl, result)
+            return result
+
+        return copy.copy(self._flight.do(f"{generation}:{int(memoize)}:{digest}", run))
+
+    def invalidate(self) -> None:
+        """Drop every memoized result."""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self.stats["invalidations"] += 1
+
+    def get_metrics(self) -> Dict[str, int]:
+        """Return hit, miss and invalidation counts and the number of memoized lookups."""
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries)}
+
+
 class AgentMemory:
     """
     Manages agent memory for learning from coding errors and successful fixes.
     Uses Mem0 to store and retrieve patterns that help improve code generation.
     """
     
-    def __init__(self, api_key: Optional[str] = None, agent_id: str = "manimAnimationAgent"):
+    def __init__(self, api_key: Optional[str] = None, agent_id: str = "manimAnimationAgent", write_queue_path: Optional[str] = None,
+                 lookup_ttl: float = 900.0):
         """
         Initialize the agent memory system.
         
         Args:
             api_key: Mem0 API key. If None, tries to get from environment
             agent_id: Unique identifier for this agent
+            write_queue_path: Journal of the write-behind queue for memory stores. If None, stores write inline
+            lookup_ttl: Seconds a similar-fix or preventive-example lookup is reused within the run; 0 disables
         """
         self.agent_id = agent_id
         self.enabled = HAS_MEM0
+        self.write_queue = None
+        self.lookup_memo = LookupMemo(lookup_ttl, backend_lagging=self._has_unsent_writes)
         
         if not self.enabled:
             print("Warning: mem0ai not available. Agent memory features disabled.")
@@ -51,6 +135,8 @@ class AgentMemory:
         try:
             self.client = MemoryClient(api_key=api_key)
             print(f"Agent memory initialized for agent: {self.agent_id}")
+            if write_queue_path:
+                self.write_queue = get_memory_write_queue(write_queue_path, self._send)
         except Exception as e:
             # Don't crash on Mem0 initialization failure - it's optional
             error_msg = str(e)
@@ -61,6 +147,22 @@ class AgentMemory:
             self.enabled = False
             self.client = None
 
+    def _has_unsent_writes(self) -> bool:
+        """Whether memories stored through the write-behind queue may not have reached Mem0 yet."""
+        return self.write_queue is not None and not self.write_queue.closed and self.write_queue.pending() > 0
+
+    def _send(self, payload: Dict) -> None:
+        """Write one memory to Mem0; raises on failure so the write-behind queue retries it."""
+        self.client.add(**payload)
+
+    def _add(self, messages: List[Dict], metadata: Dict) -> None:
+        """Queue a memory for a background write, or write it inline without a queue."""
+        payload = {"messages": messages, "agent_id": self.agent_id, "metadata": metadata}
+        if self.write_queue is not None and not self.write_queue.closed:
+            self.write_queue.enqueue(payload)
+        else:
+            self._send(payload)
+
     def _create_error_hash(self, error_message: str, code_context: str) -> str:
         """Create a hash for similar error patterns."""
         # Normalize error message to capture similar patterns
@@ -139,11 +241,8 @@ class AgentMemory:
                 metadata["original_snippet"] = original_code[:100] + "..."
                 metadata["fixed_snippet"] = fixed_code[:100] + "..."
             
-            result = self.client.add(
-                messages=messages,
-                agent_id=self.agent_id,
-                metadata=metadata
-            )
+            self._add(messages, metadata)
+            self.lookup_memo.invalidate()
             
             print(f"Stored error-fix pattern: {error_hash} for topic: {topic}")
             return True
@@ -175,26 +274,10 @@ class AgentMemory:
             return []
             
         try:
-            # Create search query
-            query = f"error fix pattern similar to '{error_message[:100]}' in {topic or 'general'} code"
-            
-            # Search with filters
-            filters = {
-                "type": "error_fix"
-            }
-            
-            if topic:
-                filters["topic"] = topic
-            if scene_type:
-                filters["scene_type"] = scene_type
-                
-            results = self.client.search(
-                query=query,
-                agent_id=self.agent_id,
-                filters=filters,
-                limit=limit
+            results = self.lookup_memo.get_or_compute(
+                ("similar_fixes", error_message, code_context, topic, scene_type, limit),
+                lambda: self._search_similar_fixes(error_message, code_context, topic, scene_type, limit)
             )
-            
             print(f"Found {len(results)} similar error patterns")
             return results
             
@@ -202,6 +285,29 @@ class AgentMemory:
             print(f"Failed to search for similar fixes: {e}")
             return []
 
+    def _search_similar_fixes(self, error_message: str, code_context: str, topic: Optional[str],
+                              scene_type: Optional[str], limit: int) -> List[Dict]:
+        """Search Mem0 for similar error fixes; raises on failure so the result is not memoized."""
+        # Create search query
+        query = f"error fix pattern similar to '{error_message[:100]}' in {topic or 'general'} code"
+        
+        # Search with filters
+        filters = {
+            "type": "error_fix"
+        }
+        
+        if topic:
+            filters["topic"] = topic
+        if scene_type:
+            filters["scene_type"] = scene_type
+            
+        return self.client.search(
+            query=query,
+            agent_id=self.agent_id,
+            filters=filters,
+            limit=limit
+        )
+
     def get_preventive_examples(self, 
                               task_description: str, 
                               topic: str = None,
@@ -223,36 +329,10 @@ class AgentMemory:
             return []
             
         try:
-            # Search for successful patterns
-            query = f"successful {scene_type or 'general'} code examples for {topic or 'general'} {task_description}"
-            
-            filters = {
-                "type": "error_fix",
-                "success": True
-            }
-            
-            if topic:
-                filters["topic"] = topic
-            if scene_type:
-                filters["scene_type"] = scene_type
-                
-            results = self.client.search(
-                query=query,
-                agent_id=self.agent_id,
-                filters=filters,
-                limit=limit
+            examples = self.lookup_memo.get_or_compute(
+                ("preventive_examples", task_description, topic, scene_type, limit),
+                lambda: self._search_preventive_examples(task_description, topic, scene_type, limit)
             )
-            
-            examples = []
-            for result in results:
-                if 'metadata' in result:
-                    meta = result['metadata']
-                    # Handle both old and new metadata structures
-                    problem = meta.get('error_snippet', meta.get('error_message', 'Unknown error'))
-                    solution = meta.get('fixed_snippet', meta.get('fixed_code', meta.get('code_snippet', '')))
-                    if solution:
-                        examples.append((problem, solution))
-            
             print(f"Retrieved {len(examples)} preventive examples")
             return examples
             
@@ -260,6 +340,40 @@ class AgentMemory:
             print(f"Failed to get preventive examples: {e}")
             return []
 
+    def _search_preventive_examples(self, task_description: str, topic: Optional[str],
+                                    scene_type: Optional[str], limit: int) -> List[Tuple[str, str]]:
+        """Search Mem0 for preventive examples; raises on failure so the result is not memoized."""
+        # Search for successful patterns
+        query = f"successful {scene_type or 'general'} code examples for {topic or 'general'} {task_description}"
+        
+        filters = {
+            "type": "error_fix",
+            "success": True
+        }
+        
+        if topic:
+            filters["topic"] = topic
+        if scene_type:
+            filters["scene_type"] = scene_type
+            
+        results = self.client.search(
+            query=query,
+            agent_id=self.agent_id,
+            filters=filters,
+            limit=limit
+        )
+        
+        examples = []
+        for result in results:
+            if 'metadata' in result:
+                meta = result['metadata']
+                # Handle both old and new metadata structures
+                problem = meta.get('error_snippet', meta.get('error_message', 'Unknown error'))
+                solution = meta.get('fixed_snippet', meta.get('fixed_code', meta.get('code_snippet', '')))
+                if solution:
+                    examples.append((problem, solution))
+        return examples
+
     def store_successful_generation(self, 
                                   task_description: str, 
                                   generated_code: str, 
@@ -316,11 +430,7 @@ class AgentMemory:
                 metadata["code_snippet"] = generated_code[:200] + "..."
                 metadata["task_description"] = task_description[:100] + "..."
             
-            result = self.client.add(
-                messages=messages,
-                agent_id=self.agent_id,
-                metadata=metadata
-            )
+            self._add(messages, metadata)
             
             return True
             
@@ -371,6 +481,7 @@ class AgentMemory:
             
             for memory in all_memories:
                 self.client.delete(memory_id=memory['id'])
+            self.lookup_memo.invalidate()
                 
             print(f"Cleared {len(all_memories)} memories for agent {self.agent_id}")
             return True
@@ -0,0 +1,326 @@
+"""
+Deterministic, rule-based fixes for mechanical Manim render errors.
+
+Renamed APIs, missing imports, unexpected keyword arguments and unescaped
+LaTeX strings make up a large share of render failures. Each rule matches the
+error output, locates the offending nodes with ``ast`` and patches only those
+source spans, so formatting and comments survive. The LLM fixer is only
+needed when no rule applies. Per-rule hit and resolution counts, plus the
+signatures of errors no rule handled, are persisted so the library can grow
+from production data.
+"""
+
+import ast
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Manim names that were renamed or removed, mapped to their Community Edition replacement
+RENAMED_MANIM_NAMES = {
+    "ShowCreation": "Create",
+    "TextMobject": "Tex",
+    "TexMobject": "MathTex",
+    "ParametricSurface": "Surface",
+    "FadeInFrom": "FadeIn",
+    "FadeOutAndShift": "FadeOut",
+    "FadeInFromDown": "FadeIn",
+    "ShowCreationThenFadeOut": "ShowPassingFlash",
+    "CircleIndicate": "Circumscribe",
+}
+
+# Renamed methods, matched on attribute access
+RENAMED_MANIM_ATTRIBUTES = {
+    "get_graph": "plot",
+    "get_parametric_curve": "plot_parametric_curve",
+    "get_implicit_curve": "plot_implicit_curve",
+}
+
+# Modules that scene code commonly uses without importing
+STANDARD_IMPORTS = {
+    "np": "import numpy as np",
+    "math": "import math",
+    "random": "import random",
+    "itertools": "import itertools",
+}
+
+_NAME_ERROR = re.compile(r"NameError: name '(\w+)' is not defined")
+_ATTRIBUTE_ERROR = re.compile(r"AttributeError: '?\w+'? object has no attribute '(\w+)'")
+_IMPORT_ERROR = re.compile(r"ImportError: cannot import name '(\w+)'")
+_UNEXPECTED_KWARG = re.compile(r"got an unexpected keyword argument '(\w+)'")
+_LATEX_ERROR = re.compile(r"LaTeX Error|latex error converting to dvi|Missing \$ inserted|Undefined control sequence", re.IGNORECASE)
+_SCENE_LINE = re.compile(r"(?:_scene\d+_v\d+\.py\", line |_scene\d+_v\d+\.py:)(\d+)")
+
+
+@dataclass
+class FixRule:
+    """A rule that rewrites code when the error output matches its pattern"""
+    name: str
+    pattern: re.Pattern
+    apply: Callable[[str, ast.Module, re.Match, str], Optional[str]]
+
+
+def _source_lines(code: str) -> List[str]:
+    """Split code into lines the way ``ast`` numbers them (only at newlines), keeping line endings."""
+    lines = code.split("\n")
+    return [line + "\n" for line in lines[:-1]] + ([lines[-1]] if lines[-1] else [])
+
+
+def _apply_edits(code: str, edits: List[Tuple[int, int, int, int, str]]) -> Optional[str]:
+    """Replace (lineno, col, end_lineno, end_col) source spans, as reported by ``ast``, with new text."""
+    if not edits:
+        return None
+    lines = _source_lines(code)
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+
+    # ast column offsets count UTF-8 bytes; convert them to string indices
+    def index(lineno: int, col: int) -> int:
+        line = lines[lineno - 1] if lineno - 1 < len(lines) else ""
+        return offsets[lineno - 1] + len(line.encode("utf-8")[:col].decode("utf-8", errors="ignore"))
+
+    spans = sorted({(index(l, c), index(el, ec), text) for l, c, el, ec, text in edits}, reverse=True)
+    for start, end, text in spans:
+        code = code[:start] + text + code[end:]
+    return code
+
+
+def error_line(error: str) -> Optional[int]:
+    """Line of the scene file where the error was raised, taken from the last matching traceback frame."""
+    matches = _SCENE_LINE.findall(error)
+    return int(matches[-1]) if matches else None
+
+
+def _has_star_import(tree: ast.Module, module: str) -> bool:
+    return any(isinstance(node, ast.ImportFrom) and node.module == module and any(a.name == "*" for a in node.names)
+               for node in tree.body)
+
+
+def _insert_import(code: str, tree: ast.Module, statement: str) -> str:
+    """Insert an import after the module docstring and any leading imports."""
+    insert_after = 0
+    for node in tree.body:
+        is_docstring = isinstance(node, ast.Expr) and isinstance(getattr(node, "value", None), ast.Constant) \
+            and isinstance(node.value.value, str)
+        if isinstance(node, (ast.Import, ast.ImportFrom)) or (is_docstring and insert_after == 0):
+            insert_after = node.end_lineno
+        else:
+            break
+    lines = _source_lines(code)
+    if insert_after and not lines[insert_after - 1].endswith("\n"):
+        lines[insert_after - 1] += "\n"
+    lines.insert(insert_after, statement + "\n")
+    return "".join(lines)
+
+
+def _rename_name(code: str, tree: ast.Module, match: re.Match, error: str) -> Optional[str]:
+    old = match.group(1)
+    new = RENAMED_MANIM_NAMES.get(old)
+    if not new:
+        return None
+    edits = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id == old:
+            edits.append((node.lineno, node.col_offset, node.end_lineno, node.end_col_offset, new))
+        elif isinstance(node, ast.alias) and node.name == old and node.asname is None and hasattr(node, "lineno"):
+            edits.append((node.lineno, node.col_offset, node.end_lineno, node.end_col_offset, new))
+    return _apply_edits(code, edits)
+
+
+def _rename_attribute(code: str, tree: ast.Module, match: re.Match, error: str) -> Optional[str]:
+    old = match.group(1)
+    new = RENAMED_MANIM_ATTRIBUTES.get(old)
+    if not new or new == old:
+        return None
+    edits = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and node.attr == old:
+            # The attribute name is the last len(old) characters of the node's span
+            edits.append((node.end_lineno, node.end_col_offset - len(old.encode("utf-8")),
+                          node.end_lineno, node.end_col_offset, new))
+    return _apply_edits(code, edits)
+
+
+def _add_missing_import(code: str, tree: ast.Module, match: re.Match, error: str) -> Optional[str]:
+    name = match.group(1)
+    if name in STANDARD_IMPORTS:
+        return _insert_import(code, tree, STANDARD_IMPORTS[name])
+    if name not in RENAMED_MANIM_NAMES and not _has_star_import(tree, "manim"):
+        return _insert_import(code, tree, "from manim import *")
+    return None
+
+
+def _drop_unexpected_kwarg(code: str, tree: ast.Module, match: re.Match, error: str) -> Optional[str]:
+    keyword_name = match.group(1)
+    line = error_line(error)
+    candidates = [
+        (call, kw) for call in ast.walk(tree) if isinstance(call, ast.Call)
+        for kw in call.keywords if kw.arg == keyword_name
+    ]
+    if line is not None:
+        candidates = [(call, kw) for call, kw in candidates if call.lineno <= line <= call.end_lineno]
+    # Without a traceback line, only act when the keyword is unambiguous
+    if len(candidates) != 1:
+        return None
+    call, kw = candidates[0]
+    # Remove the keyword together with the separating comma
+    arguments = sorted(call.args + call.keywords, key=lambda n: (n.lineno, n.col_offset))
+    position = arguments.index(kw)
+    if position > 0:
+        previous = arguments[position - 1]
+        edit = (previous.end_lineno, previous.end_col_offset, kw.end_lineno, kw.end_col_offset, "")
+    elif len(arguments) > 1:
+        following = arguments[1]
+        edit = (kw.lineno, kw.col_offset, following.lineno, following.col_offset, "")
+    else:
+        edit = (kw.lineno, kw.col_offset, kw.end_lineno, kw.end_col_offset, "")
+    return _apply_edits(code, [edit])
+
+
+_TEX_CLASSES = {"Tex", "MathTex", "TexText", "SingleStringMathTex"}
+_STRING_PREFIX = re.compile(r"^([a-zA-Z]*)(['\"])")
+_ESCAPED_LATEX = re.compile(r"\\[a-zA-Z]")
+
+
+def _fix_latex_strings(code: str, tree: ast.Module, match: re.Match, error: str) -> Optional[str]:
+    """Make backslash-bearing Tex strings raw, and render math-only Tex strings with MathTex."""
+    lines = _source_lines(code)
+    edits = []
+    for call in ast.walk(tree):
+        if not (isinstance(call, ast.Call) and isinstance(call.func, ast.Name) and call.func.id in _TEX_CLASSES):
+            continue
+        for arg in call.args:
+            if not (isinstance(arg, ast.Constant) and isinstance(arg.value, str)) or arg.lineno != arg.end_lineno:
+                continue
+            source = lines[arg.lineno - 1].encode("utf-8")[arg.col_offset:arg.end_col_offset].decode("utf-8", errors="ignore")
+            prefix = _STRING_PREFIX.match(source)
+            if not prefix or "r" in prefix.group(1).lower():
+                continue
+            # "\frac" in a plain string is a form feed followed by "rac"; "\\frac" is already correct
+            if _ESCAPED_LATEX.search(source) and "\\\\" not in source:
+                edits.append((arg.lineno, arg.col_offset, arg.end_lineno, arg.end_col_offset, "r" + source))
+        if call.func.id == "Tex" and call.args and all(
+                isinstance(a, ast.Constant) and isinstance(a.value, str) and "$" not in a.value
+                and re.search(r"[\^_]|\\(frac|sqrt|sum|int|cdot)", a.value) for a in call.args):
+            func = call.func
+            edits.append((func.lineno, func.col_offset, func.end_lineno, func.end_col_offset, "MathTex"))
+    return _apply_edits(code, edits)
+
+
+DEFAULT_RULES = [
+    FixRule("renamed_manim_name", _NAME_ERROR, _rename_name),
+    FixRule("renamed_manim_import", _IMPORT_ERROR, _rename_name),
+    FixRule("renamed_manim_attribute", _ATTRIBUTE_ERROR, _rename_attribute),
+    FixRule("missing_import", _NAME_ERROR, _add_missing_import),
+    FixRule("unexpected_keyword_argument", _UNEXPECTED_KWARG, _drop_unexpected_kwarg),
+    FixRule("latex_escaping", _LATEX_ERROR, _fix_latex_strings),
+]
+
+
+def error_signature(error: str) -> str:
+    """Reduce an error to its last exception line with quoted names and numbers masked."""
+    exception_lines = re.findall(r"^\W*(\w+(?:Error|Exception)\b.*)$", error, re.MULTILINE)
+    line = exception_lines[-1] if exception_lines else (error.strip().splitlines() or [""])[-1]
+    line = re.sub(r"'[^']*'", "'…'", line)
+    return re.sub(r"\d+", "N", line).strip()[:200]
+
+
+class AutoFixer:
+    """Applies the first matching rules to failing scene code and keeps per-rule statistics."""
+
+    def __init__(self, stats_path: Optional[str] = None, rules: Optional[List[FixRule]] = None):
+        """
+        Args:
+            stats_path (str, optional): JSON file for rule hit counts; statistics stay in memory when None
+            rules (List[FixRule], optional): Rule library. Defaults to DEFAULT_RULES.
+        """
+        self.stats_path = stats_path
+        self.rules = list(DEFAULT_RULES if rules is None else rules)
+        self._lock = threading.Lock()
+        self.stats = {"rules": {}, "unmatched": {}}
+        if stats_path and os.path.exists(stats_path):
+            try:
+                with open(stats_path, "r") as f:
+                    self.stats.update(json.load(f))
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"⚠️ Could not load auto-fixer stats: {e}")
+
+    def fix(self, code: str, error: str) -> Optional[Tuple[str, List[str]]]:
+        """Rewrite ``code`` with every rule that matches ``error`` and changes something.
+
+        Args:
+            code (str): Scene code that failed to render
+            error (str): Error output of the failed render
+
+        Returns:
+            Optional[Tuple[str, List[str]]]: Fixed code and names of the applied rules, or None if no rule applied
+        """
+        try:
+            ast.parse(code)
+        except SyntaxError:
+            self._record_unmatched(error)
+            return None
+
+        applied = []
+        for rule in self.rules:
+            match = rule.pattern.search(error)
+            if not match:
+                continue
+            try:
+                new_code = rule.apply(code, ast.parse(code), match, error)
+            except Exception as e:
+                print(f"⚠️ Auto-fix rule {rule.name} failed: {e}")
+                continue
+            if new_code and new_code != code:
+                try:
+                    ast.parse(new_code)
+                except SyntaxError:
+                    continue
+                code = new_code
+                applied.append(rule.name)
+
+        if not applied:
+            self._record_unmatched(error)
+            return None
+        with self._lock:
+            for name in applied:
+                counts = self.stats["rules"].setdefault(name, {"hits": 0, "resolved": 0})
+                counts["hits"] += 1
+            self._save()
+        return code, applied
+
+    def record_outcome(self, rule_names: List[str], resolved: bool) -> None:
+        """Record whether the render after an auto-fix succeeded."""
+        if not resolved or not rule_names:
+            return
+        with self._lock:
+            for name in rule_names:
+                self.stats["rules"].setdefault(name, {"hits": 0, "resolved": 0})["resolved"] += 1
+            self._save()
+
+    def _record_unmatched(self, error: str) -> None:
+        signature = error_signature(error)
+        with self._lock:
+            self.stats["unmatched"][signature] = self.stats["unmatched"].get(signature, 0) + 1
+            self._save()
+
+    def _save(self) -> None:
+        if not self.stats_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.stats_path) or ".", exist_ok=True)
+            tmp_path = f"{self.stats_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.stats, f, indent=2)
+            os.replace(tmp_path, self.stats_path)
+        except OSError as e:
+            print(f"⚠️ Could not save auto-fixer stats: {e}")
+
+    def get_metrics(self) -> Dict:
+        """Return per-rule hit/resolution counts and the most frequent unmatched errors."""
+        with self._lock:
+            unmatched = sorted(self.stats["unmatched"].items(), key=lambda item: -item[1])[:10]
+            return {"rules": {k: dict(v) for k, v in self.stats["rules"].items()}, "top_unmatched": unmatched}
@@ -1,13 +1,17 @@
 import os
 import re
 import json
-from typing import Union, List, Dict, Optional
+from typing import Callable, Union, List, Dict, Optional, Tuple
 from PIL import Image
 import glob
 import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
-from mllm_tools.utils import _prepare_text_inputs, _extract_code
+from mllm_tools.utils import _prepare_text_inputs, _extract_code, _diff_fence_closed
 from mllm_tools.gemini import GeminiWrapper
+from mllm_tools.single_flight import unwrap_model
 try:
     from mllm_tools.vertex_ai import VertexAIWrapper
 except ImportError:
@@ -15,8 +19,8 @@ except ImportError:
 from task_generator import (
     get_prompt_code_generation,
     get_prompt_fix_error,
+    get_prompt_fix_error_diff,
     get_prompt_visual_fix_error,
-    get_banned_reasonings,
     get_prompt_rag_query_generation_fix_error,
     get_prompt_context_learning_code,
     get_prompt_rag_query_generation_code,
@@ -31,6 +35,22 @@ from task_generator.prompts_raw import (
 )
 # Central configuration
 from src.config.config import Config
+from src.core.resource_registry import get_context_examples, get_banned_reasonings
+from src.core.fix_cache import FixCache
+from src.core.fix_window import extract_fix_window, trim_traceback
+from src.core.speculative import preflight_code
+from src.utils.diff_utils import apply_unified_diff
+from src.utils.code_extraction import extract_python_code, scene_code_closed
+from src.utils.prompt_assembler import (
+    PromptAssembler,
+    ContextSection,
+    PRIORITY_REQUIRED,
+    PRIORITY_CHEATSHEET,
+    PRIORITY_EXAMPLES,
+    PRIORITY_MEMORY,
+    PRIORITY_MEMVID,
+    PRIORITY_RAG
+)
 try:
     from src.rag.vector_store import RAGVectorStore # Import RAGVectorStore
     HAS_RAG = True
@@ -45,13 +65,22 @@ except ImportError:
     AgentMemory = None
     HAS_AGENT_MEMORY = False
 
+try:
+    from src.core.local_agent_memory import LocalAgentMemory
+    HAS_LOCAL_AGENT_MEMORY = True
+except ImportError:
+    LocalAgentMemory = None
+    HAS_LOCAL_AGENT_MEMORY = False
+
 # Import Tavily search functionality
 try:
     from src.utils.tavily_search import TavilyErrorSearchEngine, search_error_solution
+    from src.utils.tavily_cache import get_tavily_cache
     HAS_TAVILY = True
 except ImportError:
     TavilyErrorSearchEngine = None
     search_error_solution = None
+    get_tavily_cache = None
     HAS_TAVILY = False
 
 # Import Memvid integration for video-based RAG
@@ -66,7 +95,7 @@ except ImportError:
 class CodeGenerator:
     """A class for generating and managing Manim code."""
 
-    def __init__(self, scene_model, helper_model, output_dir="output", print_response=False, use_rag=None, use_context_learning=None, context_learning_path="data/context_learning", chroma_db_path="rag/chroma_db", manim_docs_path="rag/manim_docs", embedding_model="gemini/text-embedding-004", use_visual_fix_code=None, use_langfuse=True, session_id=None, use_agent_memory=True, use_memvid=True, memvid_video_file="manim_memory.mp4", memvid_index_file="manim_memory_index.json"):
+    def __init__(self, scene_model, helper_model, output_dir="output", print_response=False, use_rag=None, use_context_learning=None, context_learning_path="data/context_learning", chroma_db_path="rag/chroma_db", manim_docs_path="rag/manim_docs", embedding_model="gemini/text-embedding-004", use_visual_fix_code=None, use_langfuse=True, session_id=None, use_agent_memory=True, use_memvid=True, memvid_video_file="manim_memory.mp4", memvid_index_file="manim_memory_index.json", use_streaming_early_stop=None, use_fix_cache=None, use_concurrent_fix_strategies=None, use_localized_fix=None):
         """Initialize the CodeGenerator.
 
         Args:
@@ -87,6 +116,10 @@ class CodeGenerator:
             use_memvid (bool, optional): Whether to use Memvid video-based RAG. Defaults to True.
             memvid_video_file (str, optional): Path to memvid video file. Defaults to "manim_memory.mp4".
             memvid_index_file (str, optional): Path to memvid index file. Defaults to "manim_memory_index.json".
+            use_streaming_early_stop (bool, optional): Whether to stream code responses and stop at the first closed ```python fence. Defaults to None.
+            use_fix_cache (bool, optional): Whether to replay locally cached fixes before asking the LLM. Defaults to None.
+            use_concurrent_fix_strategies (bool, optional): Whether to race the Tavily and plain LLM fix strategies. Defaults to None.
+            use_localized_fix (bool, optional): Whether to ask for a diff against the failing code window before regenerating the whole file. Defaults to None.
         """
         self.scene_model = scene_model
         self.helper_model = helper_model
@@ -100,9 +133,49 @@ class CodeGenerator:
         self.manim_docs_path = manim_docs_path
 
         self.use_visual_fix_code = Config.USE_VISUAL_FIX_CODE if use_visual_fix_code is None else use_visual_fix_code
+        self.use_streaming_early_stop = Config.USE_STREAMING_EARLY_STOP if use_streaming_early_stop is None else use_streaming_early_stop
+        # Code responses only need the first ```python block, anything after it is discarded by extraction
+        self.code_stop_predicate = scene_code_closed if self.use_streaming_early_stop else None
+        self.prompt_assembler = PromptAssembler(model_name=getattr(scene_model, "model_name", ""))
         self.banned_reasonings = get_banned_reasonings()
         self.session_id = session_id # Use session_id passed from VideoGenerator
 
+        # Fixes awaiting a successful render, keyed by (topic, scene_number) so concurrent scenes don't clash
+        self._pending_fixes: Dict = {}
+        self._last_fix_key = None
+        self._fix_metadata_lock = threading.Lock()
+        self._extraction_stats = {"clean": 0, "repaired": 0, "requeries": 0, "failures": 0}
+
+        # Local index of fixes that led to successful renders, replayed for recurring errors
+        self.use_fix_cache = Config.USE_FIX_CACHE if use_fix_cache is None else use_fix_cache
+        self.fix_cache = None
+        if self.use_fix_cache:
+            try:
+                self.fix_cache = FixCache(Config.FIX_CACHE_PATH, min_successes=Config.FIX_CACHE_MIN_SUCCESSES)
+            except Exception as e:
+                print(f"⚠️ Fix cache initialization failed: {e}")
+                self.use_fix_cache = False
+
+        # Race fix strategies instead of trying Tavily first and the plain LLM fix second
+        self.use_concurrent_fix_strategies = (Config.USE_CONCURRENT_FIX_STRATEGIES if use_concurrent_fix_strategies is None
+                                              else use_concurrent_fix_strategies)
+        self.tavily_hedge_delay = Config.TAVILY_FIX_HEDGE_DELAY
+
+        # Patch the failing lines with a model-written diff; regenerate the whole file only if it doesn't apply
+        self.use_localized_fix = Config.USE_LOCALIZED_FIX if use_localized_fix is None else use_localized_fix
+
+        # One Tavily engine per generator so cached searches and stage latencies are shared across fixes
+        self.tavily_engine = None
+        if HAS_TAVILY:
+            tavily_cache = None
+            if Config.USE_TAVILY_CACHE:
+                try:
+                    tavily_cache = get_tavily_cache(Config.TAVILY_CACHE_PATH, search_ttl=Config.TAVILY_SEARCH_CACHE_TTL,
+                                                    extract_ttl=Config.TAVILY_EXTRACT_CACHE_TTL)
+                except Exception as e:
+                    print(f"⚠️ Tavily cache initialization failed: {e}")
+            self.tavily_engine = TavilyErrorSearchEngine(verbose=True, cache=tavily_cache)
+
         # Store memvid configuration
         self.use_memvid = use_memvid
         self.memvid_video_file = memvid_video_file
@@ -111,7 +184,19 @@ class CodeGenerator:
         # Initialize Agent Memory for self-improving capabilities
         self.use_agent_memory = use_agent_memory and HAS_AGENT_MEMORY
         if self.use_agent_memory:
-            self.agent_memory = AgentMemory(agent_id=f"manimAnimationAgent-{session_id}" if session_id else "manimAnimationAgent")
+            agent_id = f"manimAnimationAgent-{session_id}" if session_id else "manimAnimationAgent"
+            write_queue_path = Config.MEMORY_WRITE_JOURNAL_PATH if Config.USE_MEMORY_WRITE_QUEUE else None
+            if Config.AGENT_MEMORY_BACKEND == "local" and HAS_LOCAL_AGENT_MEMORY:
+                self.agent_memory = LocalAgentMemory(
+                    db_path=Config.LOCAL_AGENT_MEMORY_PATH,
+                    agent_id=agent_id,
+                    mirror_to_mem0=Config.AGENT_MEMORY_SYNC_TO_MEM0,
+                    write_queue_path=write_queue_path,
+                    lookup_ttl=Config.AGENT_MEMORY_LOOKUP_TTL
+                )
+            else:
+                self.agent_memory = AgentMemory(agent_id=agent_id, write_queue_path=write_queue_path,
+                                                lookup_ttl=Config.AGENT_MEMORY_LOOKUP_TTL)
         else:
             self.agent_memory = None
             if use_agent_memory:
@@ -166,10 +251,7 @@ class CodeGenerator:
         Returns:
             str: Formatted context learning examples, or None if no examples found.
         """
-        examples = []
-        for example_file in glob.glob(f"{self.context_learning_path}/**/*.py", recursive=True):
-            with open(example_file, 'r') as f:
-                examples.append(f"# Example from {os.path.basename(example_file)}\n{f.read()}\n")
+        examples = get_context_examples(self.context_learning_path, '*.py')
 
         # Format examples using get_prompt_context_learning_code instead of _prompt_context_learning
         if examples:
@@ -293,19 +375,26 @@ class CodeGenerator:
 
         return queries
 
-    def _extract_code_with_retries(self, response_text: str, pattern: str, generation_name: str = None, trace_id: str = None, session_id: str = None, max_retries: int = 10) -> str:
-        """Extract code from response text with retry logic.
+    def _extract_code_with_retries(self, response_text: str, pattern: str, generation_name: str = None, trace_id: str = None, session_id: str = None, max_retries: int = 10,
+                                   cancel_event: Optional[threading.Event] = None) -> Optional[str]:
+        """Extract code from response text, re-querying the model only when local extraction fails.
+
+        Responses are first handled by the local extraction engine (multiple or unclosed
+        fences, stray fence lines, prose in the block, truncated endings, all validated with
+        ``ast``). The scene model is asked to reformat its response only as a last resort.
 
         Args:
             response_text (str): The text containing code to extract
-            pattern (str): Regex pattern for extracting code
+            pattern (str): Expected code format, quoted in the re-query prompt
             generation_name (str, optional): Name of generation step. Defaults to None.
             trace_id (str, optional): Trace identifier. Defaults to None.
             session_id (str, optional): Session identifier. Defaults to None.
             max_retries (int, optional): Maximum number of retries. Defaults to 10.
+            cancel_event (threading.Event, optional): Set when another fix strategy already won; no
+                further re-query is made once it is set. Defaults to None.
 
         Returns:
-            str: The extracted code
+            Optional[str]: The extracted code, or None if cancelled before it could be extracted
 
         Raises:
             ValueError: If code extraction fails after max retries
@@ -319,36 +408,18 @@ class CodeGenerator:
         """
 
         for attempt in range(max_retries):
-            code_match = re.search(pattern, response_text, re.DOTALL)
-            if code_match:
-                extracted_code = code_match.group(1).strip()
-
-                # Refined cleanup for internal backticks:
-                # Remove lines that are exactly '```' or '```python' if they appear internally.
-                # This is safer than just counting, but might still be imperfect for very complex cases.
-                lines = extracted_code.split('\n')
-                cleaned_lines = []
-                for line in lines:
-                    stripped_line = line.strip()
-                    if stripped_line == "```" or stripped_line == "```python":
-                        # Potentially problematic internal backtick line, skip it
-                        print(f"Notice: Removing suspicious internal backtick line: '{line}'")
-                        continue
-                    cleaned_lines.append(line)
-                extracted_code = "\n".join(cleaned_lines)
-
-                # Basic Python syntax validation
-                try:
-                    import ast
-                    ast.parse(extracted_code)
-                    return extracted_code  # Return successfully parsed code
-                except SyntaxError as e:
-                    print(f"Attempt {attempt + 1}: Extracted code has syntax error after cleanup: {e}.")
-                    print(f"Problematic code after cleanup:\n---\n{extracted_code}\n---")
-                    # Fall through to retry logic, the LLM will get the original response_text
-            
+            extracted = extract_python_code(response_text)
+            if extracted is not None:
+                if extracted.repairs:
+                    print(f"🧹 Extracted code locally with repairs: {', '.join(extracted.repairs)}")
+                self._record_extraction("repaired" if extracted.repairs else "clean")
+                return extracted.code
+
+            if cancel_event is not None and cancel_event.is_set():
+                return None
             if attempt < max_retries - 1:
                 print(f"Attempt {attempt + 1}: Failed to extract valid Python code from response. Retrying with LLM...")
+                self._record_extraction("requeries")
                 # Regenerate response with a more explicit prompt
                 response_text = self.scene_model(
                     _prepare_text_inputs(retry_prompt.format(pattern=pattern, response_text=response_text)),
@@ -361,9 +432,39 @@ class CodeGenerator:
             else: # Last attempt failed
                 print(f"Final attempt {attempt + 1}: Failed to extract valid code. Original response:\n{response_text}")
 
-
+        self._record_extraction("failures")
         raise ValueError(f"Failed to extract valid Python code after {max_retries} attempts. Pattern: {pattern}")
 
+    def _record_extraction(self, outcome: str) -> None:
+        """Count a code extraction outcome: clean, repaired, requeries or failures."""
+        with self._fix_metadata_lock:
+            self._extraction_stats[outcome] = self._extraction_stats.get(outcome, 0) + 1
+
+    def get_extraction_metrics(self) -> Dict[str, Union[int, float]]:
+        """Return extraction outcome counts and the share of extractions that needed a re-query.
+
+        Returns:
+            Dict[str, Union[int, float]]: Counts of clean, repaired, requeries and failures, plus requery_rate
+        """
+        with self._fix_metadata_lock:
+            stats = dict(self._extraction_stats)
+        extractions = stats["clean"] + stats["repaired"] + stats["failures"]
+        stats["requery_rate"] = round(stats["requeries"] / extractions, 3) if extractions else 0.0
+        return stats
+
+    def get_tavily_metrics(self) -> Dict[str, Dict]:
+        """Return per-stage call counts, cache hits and mean latency of Tavily-assisted fixes, plus cache counts.
+
+        Returns:
+            Dict[str, Dict]: Stage name -> metrics, and "cache" -> search/extract hits and misses when caching is on
+        """
+        if self.tavily_engine is None:
+            return {}
+        metrics = self.tavily_engine.get_stage_metrics()
+        if self.tavily_engine.cache is not None:
+            metrics["cache"] = self.tavily_engine.cache.get_metrics()
+        return metrics
+
     def generate_manim_code(self,
                             topic: str,
                             description: str,                            
@@ -373,7 +474,9 @@ class CodeGenerator:
                             additional_context: Union[str, List[str]] = None,
                             scene_trace_id: str = None,
                             session_id: str = None,
-                            rag_queries_cache: Dict = None) -> str:
+                            rag_queries_cache: Dict = None,
+                            cancel_event: Optional[threading.Event] = None,
+                            store_in_memory: bool = True) -> str:
         """Generate Manim code from video plan.
 
         Args:
@@ -386,20 +489,25 @@ class CodeGenerator:
             scene_trace_id (str, optional): Trace identifier. Defaults to None.
             session_id (str, optional): Session identifier. Defaults to None.
             rag_queries_cache (Dict, optional): Cache for RAG queries. Defaults to None.
+            cancel_event (threading.Event, optional): Set to abandon the generation; the streamed
+                response then stops at its next chunk and empty code is returned. Defaults to None.
+            store_in_memory (bool, optional): Whether to store the generated code in agent memory.
+                Speculative candidates pass False and only the winner is stored. Defaults to True.
 
         Returns:
             Tuple[str, str]: Generated code and response text
         """
+        # Collect context as prioritised sections so the prompt can be fitted to the model's token budget
+        if additional_context is None:
+            additional_context = []
+        elif isinstance(additional_context, str):
+            additional_context = [additional_context]
+        sections = [self._classify_context_section(text) for text in additional_context]
+
         if self.use_context_learning:
-            # Add context examples to additional_context
-            if additional_context is None:
-                additional_context = []
-            elif isinstance(additional_context, str):
-                additional_context = [additional_context]
-            
             # Now using the properly formatted code examples
             if self.context_examples:
-                additional_context.append(self.context_examples)
+                sections.append(ContextSection("context_examples", self.context_examples, PRIORITY_EXAMPLES))
 
         # Add preventive examples from agent memory to avoid common errors
         if self.use_agent_memory and self.agent_memory:
@@ -413,18 +521,13 @@ class CodeGenerator:
             )
             
             if preventive_examples:
-                if additional_context is None:
-                    additional_context = []
-                elif isinstance(additional_context, str):
-                    additional_context = [additional_context]
-                
                 # Format preventive examples for inclusion in prompt
                 examples_text = "# Previous successful patterns to avoid common errors:\n"
                 for i, (problem, solution) in enumerate(preventive_examples, 1):
                     examples_text += f"# Example {i}: Avoided error '{problem[:100]}...'\n"
                     examples_text += f"# Successful approach:\n{solution[:300]}...\n\n"
                 
-                additional_context.append(examples_text)
+                sections.append(ContextSection("memory_examples", examples_text, PRIORITY_MEMORY))
                 print(f"Added {len(preventive_examples)} preventive examples from agent memory")
 
         if self.use_rag:
@@ -444,10 +547,7 @@ class CodeGenerator:
                 topic=topic,
                 scene_number=scene_number
             )
-            # Format the retrieved documents into a string
-            if additional_context is None:
-                additional_context = []
-            additional_context.append(retrieved_docs)
+            sections.append(ContextSection("rag_docs", retrieved_docs, PRIORITY_RAG))
 
         # Use Memvid video-based RAG system for additional documentation context
         if self.use_memvid and self.memvid_rag:
@@ -484,30 +584,40 @@ class CodeGenerator:
                             # Format memvid results for LLM consumption
                             memvid_context = self.memvid_rag.format_rag_context(memvid_results)
                             
-                            if additional_context is None:
-                                additional_context = []
-                            additional_context.append(memvid_context)
+                            sections.append(ContextSection("memvid", memvid_context, PRIORITY_MEMVID))
                             print(f"✅ Added {len(memvid_results)} results from memvid video memory")
 
             except Exception as e:
                 print(f"⚠️ Memvid RAG search failed: {e}")
                 # Continue without memvid results
 
-        # Format code generation prompt with plan and retrieved context
+        # Format code generation prompt with plan and retrieved context, keeping it within the token budget
+        base_prompt = get_prompt_code_generation(
+            scene_outline=scene_outline,
+            scene_implementation=scene_implementation,
+            topic=topic,
+            description=description,
+            scene_number=scene_number
+        )
+        fitted_context = self.prompt_assembler.fit(base_prompt, sections)
         prompt = get_prompt_code_generation(
             scene_outline=scene_outline,
             scene_implementation=scene_implementation,
             topic=topic,
             description=description,
             scene_number=scene_number,
-            additional_context=additional_context
+            additional_context=fitted_context or None
         )
 
         # Generate code using model
         response_text = self.scene_model(
             _prepare_text_inputs(prompt),
-            metadata={"generation_name": "code_generation", "trace_id": scene_trace_id, "tags": [topic, f"scene{scene_number}"], "session_id": session_id}
+            metadata={"generation_name": "code_generation", "trace_id": scene_trace_id, "tags": [topic, f"scene{scene_number}"], "session_id": session_id},
+            stop_predicate=self._cancellable_stop_predicate(cancel_event, self.code_stop_predicate)
         )
+        if cancel_event is not None and cancel_event.is_set():
+            # Partial output of an abandoned stream; don't spend format retries on it
+            return "", response_text
 
         # Extract code with retries
         code = self._extract_code_with_retries(
@@ -517,7 +627,22 @@ class CodeGenerator:
             trace_id=scene_trace_id,
             session_id=session_id
         )
-        # Store successful generation in agent memory
+        if store_in_memory:
+            self.store_generation_in_memory(topic, scene_outline, scene_implementation, scene_number, code)
+
+        return code, response_text
+
+    def store_generation_in_memory(self, topic: str, scene_outline: str, scene_implementation: str,
+                                   scene_number: int, code: str) -> None:
+        """Store generated scene code in agent memory, if enabled.
+
+        Args:
+            topic (str): Topic of the scene
+            scene_outline (str): Outline of the scene
+            scene_implementation (str): Implementation details, used to infer the scene type
+            scene_number (int): Scene number
+            code (str): Generated code
+        """
         if self.use_agent_memory and self.agent_memory:
             scene_type = self._infer_scene_type(scene_implementation)
             self.agent_memory.store_successful_generation(
@@ -527,7 +652,20 @@ class CodeGenerator:
                 scene_type=scene_type
             )
 
-        return code, response_text
+    def _classify_context_section(self, text: str) -> ContextSection:
+        """Wrap caller-provided context in a section, recognising the code rules and the cheatsheet.
+
+        Args:
+            text (str): Context text passed to generate_manim_code
+
+        Returns:
+            ContextSection: Section with the priority matching its source
+        """
+        if text in (_code_font_size, _code_limit, _code_disable):
+            return ContextSection("code_rules", text, PRIORITY_REQUIRED, trimmable=False)
+        if text == _prompt_manim_cheatsheet:
+            return ContextSection("manim_cheatsheet", text, PRIORITY_CHEATSHEET)
+        return ContextSection("additional_context", text, PRIORITY_REQUIRED)
 
     def _infer_scene_type(self, scene_implementation: str) -> str:
         """
@@ -579,9 +717,166 @@ class CodeGenerator:
         """
         scene_type = self._infer_scene_type(implementation_plan)
         original_code = code
+
+        # A pending fix at this point did not render; a cached diff that produced it loses confidence
+        previous_fix = self._pop_fix_metadata(topic, scene_number)
+        if self.fix_cache and previous_fix and previous_fix.get("cache_entry_id"):
+            self.fix_cache.record_failure(previous_fix["cache_entry_id"])
+
+        # Replay a known fix for this error signature without any network calls
+        if self.fix_cache:
+            cached = self.fix_cache.lookup(code, error, validate=lambda patched: preflight_code(patched) is None)
+            if cached:
+                entry_id, fixed_code = cached
+                print(f"♻️ Applied cached fix #{entry_id} for a recurring error, skipping LLM fix")
+                self._set_fix_metadata(topic, scene_number, {
+                    "error_message": error,
+                    "original_code": original_code,
+                    "fixed_code": fixed_code,
+                    "topic": topic,
+                    "scene_type": scene_type,
+                    "fix_method": "cache",
+                    "cache_entry_id": entry_id
+                })
+                return fixed_code
         
         print("🔧 Starting dynamic error resolution with LLM, Memory, and Tavily integration...")
-        
+
+        strategies = {}
+        start_delays = {}
+        if self.tavily_engine is not None:
+            strategies["tavily"] = lambda cancel_event: self._fix_error_with_tavily(
+                implementation_plan=implementation_plan, code=code, error=error, scene_trace_id=scene_trace_id,
+                topic=topic, scene_number=scene_number, session_id=session_id, cancel_event=cancel_event
+            )
+            # Cost rule: without cached search results the Tavily fix is a hedge against a slow or failed LLM fix
+            analysis = self.tavily_engine.analyze_error_for_search(error, code[:500])
+            if not self.tavily_engine.has_cached_solution(analysis):
+                start_delays["tavily"] = self.tavily_hedge_delay
+        strategies["llm"] = lambda cancel_event: self._fix_error_with_llm(
+            implementation_plan=implementation_plan, code=code, error=error, scene_trace_id=scene_trace_id,
+            topic=topic, scene_number=scene_number, session_id=session_id, scene_type=scene_type, cancel_event=cancel_event
+        )
+        fix_method, fixed_code = self._run_fix_strategies(strategies, original_code, start_delays)
+
+        # Store fix metadata for later storage after successful rendering (only if fix was actually applied)
+        if fixed_code is not None and fixed_code != original_code:
+            self._set_fix_metadata(topic, scene_number, {
+                "error_message": error,
+                "original_code": original_code,
+                "fixed_code": fixed_code,
+                "topic": topic,
+                "scene_type": scene_type,
+                "fix_method": fix_method
+            })
+            return fixed_code
+        self._set_fix_metadata(topic, scene_number, None)
+        return fixed_code if fixed_code is not None else original_code
+
+    def _run_fix_strategies(self, strategies: Dict[str, Callable], original_code: str,
+                            start_delays: Optional[Dict[str, float]] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Run fix strategies and pick the first candidate that passes pre-flight.
+
+        With concurrent fix strategies enabled, strategies without a start delay start at
+        once and the first validated candidate wins. A delayed strategy is a hedge: it only
+        starts once its delay has passed without a winner, or as soon as every running
+        strategy has finished without one, so a second paid fix is only bought when the
+        first is slow or fails. ``fix_code_errors`` delays the Tavily fix unless its search
+        results are already cached. The losers are cancelled through a shared event: they
+        skip any paid step that has not started yet (Tavily search, scene model call,
+        format retries) and in-flight streams stop at their next chunk. Otherwise
+        strategies run one after another in the given order.
+
+        Args:
+            strategies (Dict[str, Callable]): Strategy name -> callable taking a cancel event and returning code or None
+            original_code (str): Code being fixed
+            start_delays (Dict[str, float], optional): Strategy name -> seconds to wait before starting it
+
+        Returns:
+            Tuple[Optional[str], Optional[str]]: Winning strategy name and its code. When no candidate
+            validates, the last strategy's unvalidated output (as before); (None, None) if there is none.
+        """
+        cancel_event = threading.Event()
+        results: Dict[str, Optional[str]] = {}
+
+        def is_valid(candidate: Optional[str]) -> bool:
+            return bool(candidate) and candidate != original_code and preflight_code(candidate) is None
+
+        if not self.use_concurrent_fix_strategies or len(strategies) == 1:
+            for name, strategy in strategies.items():
+                results[name] = strategy(cancel_event)
+                if is_valid(results[name]):
+                    return name, results[name]
+        else:
+            pool = ThreadPoolExecutor(max_workers=len(strategies), thread_name_prefix="fix-strategy")
+            deferred = {name: delay for name, delay in (start_delays or {}).items() if name in strategies and delay > 0}
+            futures = {pool.submit(strategy, cancel_event): name
+                       for name, strategy in strategies.items() if name not in deferred}
+            pending = set(futures)
+            start = time.monotonic()
+            try:
+                while pending or deferred:
+                    elapsed = time.monotonic() - start
+                    for name in [n for n, delay in deferred.items() if delay <= elapsed or not pending]:
+                        del deferred[name]
+                        print(f"⏱️ Starting fix strategy '{name}' after {elapsed:.0f}s without a valid fix")
+                        future = pool.submit(strategies[name], cancel_event)
+                        futures[future] = name
+                        pending.add(future)
+                    timeout = max(0.0, min(deferred.values()) - elapsed) if deferred else None
+                    done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = futures[future]
+                        try:
+                            results[name] = future.result()
+                        except Exception as e:
+                            print(f"⚠️ Fix strategy '{name}' failed: {e}")
+                            results[name] = None
+                        if is_valid(results[name]):
+                            if pending:
+                                print(f"🏁 Fix strategy '{name}' won; cancelling {[futures[f] for f in pending]}")
+                            return name, results[name]
+            finally:
+                cancel_event.set()
+                pool.shutdown(wait=False)
+
+        # Nothing validated: fall back to the last strategy's output, which the render will judge
+        for name in reversed(list(strategies)):
+            if results.get(name):
+                return name, results[name]
+        return None, None
+
+    @staticmethod
+    def _cancellable_stop_predicate(cancel_event: Optional[threading.Event], base: Optional[Callable[[str], bool]] = None) -> Optional[Callable[[str], bool]]:
+        """Combine a streaming stop predicate with a cancel event so an abandoned stream stops at its next chunk."""
+        if cancel_event is None:
+            return base
+
+        def stop(text: str) -> bool:
+            return cancel_event.is_set() or (base is not None and base(text))
+        return stop
+
+    def _fix_error_with_llm(self, implementation_plan: str, code: str, error: str, scene_trace_id: str, topic: str,
+                            scene_number: int, session_id: str, scene_type: str,
+                            cancel_event: Optional[threading.Event] = None) -> Optional[str]:
+        """
+        Fix errors with the scene model, using similar fixes from agent memory, RAG and Memvid as context.
+
+        Args:
+            implementation_plan (str): The implementation plan for context
+            code (str): The original code with errors
+            error (str): The error message to fix
+            scene_trace_id (str): Trace ID for the scene
+            topic (str): Topic of the scene
+            scene_number (int): Scene number
+            session_id (str): Session identifier
+            scene_type (str): Inferred scene type, used to search agent memory
+            cancel_event (threading.Event, optional): Set when another strategy already produced a fix
+
+        Returns:
+            Optional[str]: Fixed code, or None if cancelled
+        """
         # Check agent memory for similar errors first
         similar_fixes = []
         if self.use_agent_memory and self.agent_memory:
@@ -596,37 +891,7 @@ class CodeGenerator:
             if similar_fixes:
                 print(f"Found {len(similar_fixes)} similar error patterns in memory")
         
-        # Try Tavily-enhanced error resolution if available
-        tavily_result = None
-        if HAS_TAVILY:
-            try:
-                print("🌐 Attempting Tavily-enhanced error resolution...")
-                tavily_result = self._fix_error_with_tavily(
-                    implementation_plan=implementation_plan,
-                    code=code,
-                    error=error,
-                    scene_trace_id=scene_trace_id,
-                    topic=topic,
-                    scene_number=scene_number,
-                    session_id=session_id
-                )
-                
-                if tavily_result and tavily_result != code:
-                    print("✅ Tavily-enhanced fix applied successfully")
-                    # Store fix metadata for later storage after successful rendering
-                    self._last_fix_metadata = {
-                        "error_message": error,
-                        "original_code": original_code,
-                        "fixed_code": tavily_result,
-                        "topic": topic,
-                        "scene_type": scene_type,
-                        "fix_method": "tavily"
-                    }
-                    return tavily_result
-            except Exception as e:
-                print(f"⚠️ Tavily error resolution failed: {e}")
-        
-        # Fallback to LLM with memory and RAG context
+        # Build the prompt context from memory, RAG and Memvid
         context = ""
         
         # Add similar fixes from memory to context
@@ -711,44 +976,96 @@ class CodeGenerator:
                 context = manim_code_hint
             print("💡 Added specific hint for Manim Code object line access.")
 
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+
+        if self.use_localized_fix:
+            patched_code = self._fix_error_with_diff(
+                code=code, error=error, context=context, scene_trace_id=scene_trace_id,
+                topic=topic, scene_number=scene_number, session_id=session_id, cancel_event=cancel_event
+            )
+            if patched_code is not None or (cancel_event is not None and cancel_event.is_set()):
+                return patched_code
+
         # Generate fixed code using LLM with context
-        prompt = get_prompt_fix_error(error, code, context)
+        prompt = get_prompt_fix_error(implementation_plan, code, error, context)
         fixed_code_response_text = self.scene_model( # Renamed to avoid conflict
             _prepare_text_inputs(prompt),
-            metadata={"generation_name": "fix-error", "trace_id": scene_trace_id, "tags": [topic, f"scene{scene_number}"], "session_id": session_id}
+            metadata={"generation_name": "fix-error", "trace_id": scene_trace_id, "tags": [topic, f"scene{scene_number}"], "session_id": session_id},
+            stop_predicate=self._cancellable_stop_predicate(cancel_event, self.code_stop_predicate)
         )
+        if cancel_event is not None and cancel_event.is_set():
+            # Partial output of an abandoned stream; don't spend format retries on it
+            return None
 
         fixed_code = self._extract_code_with_retries(
             fixed_code_response_text, # Use the new variable name
             pattern=r'```python\n(.*?)\n```',
             generation_name="fix-error",
             trace_id=scene_trace_id,
-            session_id=session_id
+            session_id=session_id,
+            cancel_event=cancel_event
         )
 
-        # Store fix metadata for later storage after successful rendering (only if fix was actually applied)
-        if fixed_code != original_code:
-            self._last_fix_metadata = {
-                "error_message": error,
-                "original_code": original_code,
-                "fixed_code": fixed_code,
-                "topic": topic,
-                "scene_type": scene_type,
-                "fix_method": "llm"
-            }
-        else:
-            self._last_fix_metadata = None
-
         return fixed_code
 
+    def _fix_error_with_diff(self, code: str, error: str, context: str, scene_trace_id: str, topic: str,
+                             scene_number: int, session_id: str,
+                             cancel_event: Optional[threading.Event] = None) -> Optional[str]:
+        """
+        Fix an error by asking for a unified diff against the failing code window only.
+
+        The prompt holds the lines around the traceback's failing line and the definitions
+        they reference instead of the implementation plan and the whole file, and the
+        response is a short patch instead of a new file.
+
+        Args:
+            code (str): The original code with errors
+            error (str): The error message to fix
+            context (str): Memory, RAG and Memvid context gathered for the fix
+            scene_trace_id (str): Trace ID for the scene
+            topic (str): Topic of the scene
+            scene_number (int): Scene number
+            session_id (str): Session identifier
+            cancel_event (threading.Event, optional): Set when another strategy already produced a fix
+
+        Returns:
+            Optional[str]: Patched code that passes pre-flight, or None to fall back to whole-file regeneration
+        """
+        window = extract_fix_window(code, error, radius=Config.LOCALIZED_FIX_WINDOW_RADIUS)
+        if window is None:
+            return None
+
+        prompt = get_prompt_fix_error_diff(window.render(code), trim_traceback(error), context or None)
+        response_text = self.scene_model(
+            _prepare_text_inputs(prompt),
+            metadata={"generation_name": "fix-error-diff", "trace_id": scene_trace_id, "tags": [topic, f"scene{scene_number}"], "session_id": session_id},
+            stop_predicate=self._cancellable_stop_predicate(cancel_event, _diff_fence_closed if self.use_streaming_early_stop else None)
+        )
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+
+        match = re.search(r"```diff\n(.*?)(?:```|$)", response_text or "", re.DOTALL)
+        patched_code = apply_unified_diff(code, match.group(1)) if match else None
+        if patched_code is None or patched_code == code or preflight_code(patched_code) is not None:
+            print("⚠️ Localized diff did not apply cleanly, regenerating the whole file")
+            return None
+        print(f"🩹 Patched lines {window.start}-{window.end} with a localized diff ({len(prompt)} prompt chars)")
+        return patched_code
+
     def _fix_error_with_tavily(self, implementation_plan: str, code: str, error: str, 
-                              scene_trace_id: str, topic: str, scene_number: int, session_id: str) -> Optional[str]:
+                              scene_trace_id: str, topic: str, scene_number: int, session_id: str,
+                              cancel_event: Optional[threading.Event] = None) -> Optional[str]:
         """
         Implement the two-step Tavily-enhanced error resolution strategy.
         
         Step 1: Generate targeted search query using LLM
         Step 2: Use Tavily to search for solutions and apply them with LLM assistance
         
+        Search results are cached under both the generated query and the query derived
+        from the traceback, so a recurring error skips query generation, search and
+        extraction and goes straight to the assisted fix.
+        
         Args:
             implementation_plan: Implementation plan for context
             code: Code with errors
@@ -757,51 +1074,59 @@ class CodeGenerator:
             topic: Topic name
             scene_number: Scene number
             session_id: Session ID
+            cancel_event: Set when another strategy already produced a fix
             
         Returns:
-            Fixed code string or None if Tavily fix failed
+            Fixed code string or None if Tavily fix failed or was cancelled
         """
+        tavily_engine = self.tavily_engine
         try:
-            # Step 1: Generate targeted search query using LLM
-            print("🎯 Step 1: Generating optimized search query...")
-            query_prompt = get_prompt_tavily_search_query_generation(
-                traceback=error,
-                code_context=code[:500],
-                implementation_plan=implementation_plan[:200]
-            )
-            
-            query_response = self.helper_model(
-                _prepare_text_inputs(query_prompt),
-                metadata={
-                    "generation_name": "tavily-query-generation", 
-                    "trace_id": scene_trace_id, 
-                    "tags": [topic, f"scene{scene_number}"], 
-                    "session_id": session_id
-                }
-            )
+            error_analysis = tavily_engine.analyze_error_for_search(error, code[:500])
+            signature_query = error_analysis.search_query
+            search_results = tavily_engine.cached_solution(error_analysis)
+            search_query = signature_query
             
-            search_query = self._extract_search_query_from_response(query_response)
-            if not search_query:
-                print("⚠️ Failed to generate search query")
-                return None
+            if search_results is None:
+                if not tavily_engine.is_available():
+                    print("⚠️ Tavily not available - skipping Tavily-enhanced fix")
+                    return None
+                    
+                # Step 1: Generate targeted search query using LLM
+                print("🎯 Step 1: Generating optimized search query...")
+                query_prompt = get_prompt_tavily_search_query_generation(
+                    traceback=error,
+                    code_context=code[:500],
+                    implementation_plan=implementation_plan[:200]
+                )
                 
-            print(f"📝 Generated search query: {search_query}")
-            
-            # Step 2: Use Tavily to search for solutions
-            print("🌐 Step 2: Searching for solutions with Tavily...")
-            tavily_engine = TavilyErrorSearchEngine(verbose=True)
-            
-            if not tavily_engine.is_available():
-                print("⚠️ Tavily not available - skipping Tavily-enhanced fix")
-                return None
+                start = time.monotonic()
+                query_response = self.helper_model(
+                    _prepare_text_inputs(query_prompt),
+                    metadata={
+                        "generation_name": "tavily-query-generation", 
+                        "trace_id": scene_trace_id, 
+                        "tags": [topic, f"scene{scene_number}"], 
+                        "session_id": session_id
+                    }
+                )
+                tavily_engine.record_stage("query_generation", time.monotonic() - start)
                 
-            # Analyze error and search for solutions
-            error_analysis = tavily_engine.analyze_error_for_search(error, code[:500])
-            error_analysis.search_query = search_query  # Use LLM-generated query
-            
-            search_results = tavily_engine.search_for_solution(error_analysis, max_results=5)
+                search_query = self._extract_search_query_from_response(query_response)
+                if not search_query:
+                    print("⚠️ Failed to generate search query")
+                    return None
+                    
+                print(f"📝 Generated search query: {search_query}")
+                if cancel_event is not None and cancel_event.is_set():
+                    return None
+                
+                # Step 2: Use Tavily to search for solutions
+                print("🌐 Step 2: Searching for solutions with Tavily...")
+                error_analysis.search_query = search_query  # Use LLM-generated query
+                search_results = tavily_engine.search_for_solution(error_analysis, max_results=5,
+                                                                   cache_aliases=[signature_query])
             
-            if not search_results or not search_results.get('available'):
+            if not search_results or not search_results.get('available') or search_results.get('error'):
                 print("⚠️ Tavily search failed or not available")
                 return None
                 
@@ -809,6 +1134,8 @@ class CodeGenerator:
             formatted_results = self._format_tavily_results_for_llm(search_results)
             
             print("📋 Tavily search completed, applying insights...")
+            if cancel_event is not None and cancel_event.is_set():
+                return None
             
             # Step 3: Use LLM with Tavily results to fix the code
             print("🛠️ Step 3: Applying Tavily insights to fix the code...")
@@ -821,6 +1148,7 @@ class CodeGenerator:
             )
             
             # Generate fixed code using LLM with Tavily insights
+            start = time.monotonic()
             fixed_response = self.scene_model(
                 _prepare_text_inputs(fix_prompt),
                 metadata={
@@ -828,8 +1156,12 @@ class CodeGenerator:
                     "trace_id": scene_trace_id, 
                     "tags": [topic, f"scene{scene_number}"], 
                     "session_id": session_id
-                }
+                },
+                stop_predicate=self._cancellable_stop_predicate(cancel_event, self.code_stop_predicate)
             )
+            tavily_engine.record_stage("assisted_fix", time.monotonic() - start)
+            if cancel_event is not None and cancel_event.is_set():
+                return None
             
             # Extract fixed code
             fixed_code = self._extract_code_with_retries(
@@ -837,8 +1169,11 @@ class CodeGenerator:
                 r"```python(.*)```",
                 generation_name="tavily-assisted-fix",
                 trace_id=scene_trace_id,
-                session_id=session_id
+                session_id=session_id,
+                cancel_event=cancel_event
             )
+            if fixed_code is None:
+                return None
             
             if fixed_code != code:
                 print("✅ Tavily-assisted fix completed successfully")
@@ -929,7 +1264,8 @@ class CodeGenerator:
                 
         return formatted
 
-    def visual_self_reflection(self, code: str, media_path: Union[str, Image.Image], scene_trace_id: str, topic: str, scene_number: int, session_id: str) -> str:
+    def visual_self_reflection(self, code: str, media_path: Union[str, Image.Image], scene_trace_id: str, topic: str, scene_number: int, session_id: str,
+                               implementation_plan: str = "", layout_issues: Optional[List[str]] = None) -> str:
         """Use snapshot image or mp4 video to fix code.
 
         Args:
@@ -939,19 +1275,24 @@ class CodeGenerator:
             topic (str): Topic of the scene
             scene_number (int): Scene number
             session_id (str): Session identifier
+            implementation_plan (str, optional): Scene implementation plan. Defaults to "".
+            layout_issues (List[str], optional): Findings of the layout check to address. Defaults to None.
 
         Returns:
-            Tuple[str, str]: Fixed code and response text
+            Tuple[str, str]: Fixed code (the given code if the model finds nothing to change) and response text
         """
         
         # Determine if we're dealing with video or image
         is_video = isinstance(media_path, str) and media_path.endswith('.mp4')
         
         # Load prompt template
-        prompt = get_prompt_visual_fix_error(code=code)
+        prompt = get_prompt_visual_fix_error(implementation=implementation_plan, generated_code=code)
+        if layout_issues:
+            prompt += ("\n\nAn automatic layout check of the rendered animation found these problems; "
+                       "fix them without changing anything else:\n" + "\n".join(f"- {issue}" for issue in layout_issues))
         
         # Prepare input based on media type
-        if is_video and isinstance(self.scene_model, (GeminiWrapper, VertexAIWrapper)):
+        if is_video and isinstance(unwrap_model(self.scene_model), (GeminiWrapper, VertexAIWrapper)):
             # For video with Gemini models
             messages = [
                 {"type": "text", "content": prompt},
@@ -976,9 +1317,13 @@ class CodeGenerator:
                 "trace_id": scene_trace_id,
                 "tags": [topic, f"scene{scene_number}"],
                 "session_id": session_id
-            }
+            },
+            stop_predicate=self.code_stop_predicate
         )
         
+        if "<LGTM>" in response_text:
+            return code, response_text
+
         # Extract code with retries
         fixed_code = self._extract_code_with_retries(
             response_text,
@@ -989,15 +1334,50 @@ class CodeGenerator:
         )
         return fixed_code, response_text
 
-    def store_successful_fix(self):
+    def _set_fix_metadata(self, topic: Optional[str], scene_number: Optional[int], metadata: Optional[Dict]):
+        """Remember (or forget) the pending fix of one scene until its render outcome is known.
+
+        Args:
+            topic (Optional[str]): Topic of the scene
+            scene_number (Optional[int]): Scene number
+            metadata (Optional[Dict]): Fix details, or None to drop the pending fix
         """
-        Store the last fix in memory only after successful video rendering.
+        key = (topic, scene_number)
+        with self._fix_metadata_lock:
+            if metadata is None:
+                self._pending_fixes.pop(key, None)
+            else:
+                self._pending_fixes[key] = metadata
+            self._last_fix_key = key
+
+    def _pop_fix_metadata(self, topic: Optional[str], scene_number: Optional[int]) -> Optional[Dict]:
+        """Take the pending fix of a scene; without a topic or scene number, the most recent fix is used."""
+        with self._fix_metadata_lock:
+            key = (topic, scene_number) if topic is not None or scene_number is not None else self._last_fix_key
+            if key == self._last_fix_key:
+                self._last_fix_key = None
+            return self._pending_fixes.pop(key, None)
+
+    def store_successful_fix(self, topic: Optional[str] = None, scene_number: Optional[int] = None):
+        """
+        Store the pending fix of a scene in memory only after successful video rendering.
         This method should be called after confirming that the video was rendered successfully.
+
+        Args:
+            topic (Optional[str]): Topic of the rendered scene
+            scene_number (Optional[int]): Number of the rendered scene
         """
-        if (self.use_agent_memory and self.agent_memory and 
-            hasattr(self, '_last_fix_metadata') and self._last_fix_metadata):
-            
-            fix_metadata = self._last_fix_metadata
+        fix_metadata = self._pop_fix_metadata(topic, scene_number)
+        if self.fix_cache and fix_metadata:
+            try:
+                if fix_metadata.get("cache_entry_id"):
+                    self.fix_cache.confirm(fix_metadata["cache_entry_id"])
+                    # Already known; no need to send it to remote memory again
+                    return
+                self.fix_cache.record_success(fix_metadata["error_message"], fix_metadata["original_code"], fix_metadata["fixed_code"])
+            except Exception as e:
+                print(f"⚠️ Failed to record fix in the local fix cache: {e}")
+        if self.use_agent_memory and self.agent_memory and fix_metadata:
             print(f"✅ Storing successful fix in memory: {fix_metadata['fix_method']} method")
             
             self.agent_memory.store_error_fix(
@@ -1008,18 +1388,20 @@ class CodeGenerator:
                 scene_type=fix_metadata["scene_type"],
                 fix_method=fix_metadata["fix_method"]
             )
-            
-            # Clear the metadata after storing
-            self._last_fix_metadata = None
         else:
             print("No fix metadata to store or memory not available")
 
-    def clear_fix_metadata(self):
+    def clear_fix_metadata(self, topic: Optional[str] = None, scene_number: Optional[int] = None):
         """
-        Clear the last fix metadata without storing it.
+        Clear the pending fix of a scene without storing it.
         This method should be called when video rendering fails.
+
+        Args:
+            topic (Optional[str]): Topic of the failed scene
+            scene_number (Optional[int]): Number of the failed scene
         """
-        if hasattr(self, '_last_fix_metadata'):
-            if self._last_fix_metadata:
-                print("❌ Clearing unsuccessful fix metadata (video rendering failed)")
-            self._last_fix_metadata = None
\ No newline at end of file
+        fix_metadata = self._pop_fix_metadata(topic, scene_number)
+        if fix_metadata:
+            if self.fix_cache and fix_metadata.get("cache_entry_id"):
+                self.fix_cache.record_failure(fix_metadata["cache_entry_id"])
+            print("❌ Clearing unsuccessful fix metadata (video rendering failed)")
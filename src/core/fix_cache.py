@@ -0,0 +1,167 @@
+"""
+Local, persistent cache of successful error fixes.
+
+Agent memory only stores fixes in the remote Mem0 service and feeds them back
+as prompt hints. The fix cache keys every fix that led to a successful render
+by the normalized error signature plus the source line that raised it, and
+stores the fix as a replayable line diff. When the same error recurs, even
+in another scene or topic, the diff is applied directly; the LLM is only
+asked when no cached diff applies cleanly.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from src.core.auto_fixer import error_line
+from src.utils.cache_utils import connect_wal, immediate_transaction, normalize_signature
+from src.utils.diff_utils import apply_line_diff, compute_line_diff
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fixes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    context TEXT NOT NULL,
+    hunks TEXT NOT NULL,
+    successes INTEGER NOT NULL DEFAULT 0,
+    failures INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    UNIQUE (key, hunks)
+);
+CREATE INDEX IF NOT EXISTS idx_fixes_key ON fixes (key);
+"""
+
+_EXCEPTION_LINE = re.compile(r"^\W*(\w+(?:Error|Exception|Warning)\b.*)$", re.MULTILINE)
+
+
+def normalize_error(error: str) -> str:
+    """Reduce an error to its final exception line without paths, addresses or numbers.
+
+    Args:
+        error (str): Raw error output of a failed render
+
+    Returns:
+        str: Normalized signature; quoted names are kept since they identify the problem
+    """
+    exception_lines = _EXCEPTION_LINE.findall(error)
+    line = exception_lines[-1] if exception_lines else (error.strip().splitlines() or [""])[-1]
+    return normalize_signature(line)[:300]
+
+
+def error_context(error: str, code: str) -> str:
+    """The source line the error was raised from, whitespace-normalized, or '' if unknown."""
+    line_number = error_line(error)
+    lines = code.splitlines()
+    if line_number is None or not 0 < line_number <= len(lines):
+        return ""
+    return re.sub(r"\s+", " ", lines[line_number - 1]).strip()
+
+
+def fix_key(error: str, code: str) -> Tuple[str, str, str]:
+    """Return (key, signature, context) identifying an error in a piece of code."""
+    signature = normalize_error(error)
+    context = error_context(error, code)
+    key = hashlib.sha256(f"{signature}\n{context}".encode("utf-8")).hexdigest()[:32]
+    return key, signature, context
+
+
+class FixCache:
+    """SQLite index from error signature and code context to the diff that fixed it."""
+
+    def __init__(self, db_path: str, min_successes: int = 1):
+        """
+        Args:
+            db_path (str): SQLite database file, created if missing
+            min_successes (int): Successful renders a diff needs before it is applied without the LLM
+        """
+        self.db_path = db_path
+        self.min_successes = min_successes
+        self._lock = threading.Lock()
+        self._conn = connect_wal(db_path, _SCHEMA, row_factory=True)
+        self.stats = {"hits": 0, "misses": 0, "stored": 0}
+
+    def lookup(self, code: str, error: str, validate: Optional[Callable[[str], bool]] = None) -> Optional[Tuple[int, str]]:
+        """Find a confident cached fix for ``error`` and apply it to ``code``.
+
+        Candidates are tried from most to least successful; a candidate is used
+        only if its diff applies unambiguously and the result passes ``validate``.
+
+        Args:
+            code (str): Code that failed to render
+            error (str): Error output of the failed render
+            validate (Callable[[str], bool], optional): Check run on the patched code
+
+        Returns:
+            Optional[Tuple[int, str]]: Cache entry id and patched code, or None
+        """
+        key, _, _ = fix_key(error, code)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, hunks FROM fixes WHERE key = ? AND successes >= ? AND successes > failures "
+                "ORDER BY successes - failures DESC, last_used DESC LIMIT 5",
+                (key, self.min_successes)
+            ).fetchall()
+
+        for row in rows:
+            patched = apply_line_diff(code, json.loads(row["hunks"]))
+            if patched is None or patched == code or (validate and not validate(patched)):
+                continue
+            with immediate_transaction(self._conn, self._lock) as conn:
+                conn.execute("UPDATE fixes SET last_used = ? WHERE id = ?", (time.time(), row["id"]))
+            self.stats["hits"] += 1
+            return row["id"], patched
+        self.stats["misses"] += 1
+        return None
+
+    def record_success(self, error: str, original_code: str, fixed_code: str) -> bool:
+        """Store (or reinforce) the diff that turned ``original_code`` into code that rendered.
+
+        Args:
+            error (str): Error the fix resolved
+            original_code (str): Code that failed
+            fixed_code (str): Code that rendered successfully
+
+        Returns:
+            bool: True if a diff was recorded
+        """
+        hunks = compute_line_diff(original_code, fixed_code)
+        if not hunks:
+            return False
+        key, signature, context = fix_key(error, original_code)
+        now = time.time()
+        with immediate_transaction(self._conn, self._lock) as conn:
+            conn.execute(
+                "INSERT INTO fixes (key, signature, context, hunks, successes, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, 1, ?, ?) "
+                "ON CONFLICT (key, hunks) DO UPDATE SET successes = successes + 1, last_used = excluded.last_used",
+                (key, signature, context, json.dumps(hunks, sort_keys=True), now, now)
+            )
+        self.stats["stored"] += 1
+        return True
+
+    def confirm(self, entry_id: int) -> None:
+        """Count a cached fix whose patched code rendered successfully."""
+        with immediate_transaction(self._conn, self._lock) as conn:
+            conn.execute("UPDATE fixes SET successes = successes + 1 WHERE id = ?", (entry_id,))
+
+    def record_failure(self, entry_id: int) -> None:
+        """Count a cached fix whose patched code still failed to render."""
+        with immediate_transaction(self._conn, self._lock) as conn:
+            conn.execute("UPDATE fixes SET failures = failures + 1 WHERE id = ?", (entry_id,))
+
+    def get_metrics(self) -> Dict[str, int]:
+        """Return the number of cached fixes and this process's hit/miss counts."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM fixes").fetchone()[0]
+        return {"entries": entries, **self.stats}
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,170 @@
+"""
+Failing-code windows for localized error fixing.
+
+Most Manim render errors are confined to a few lines, yet a whole-file fix
+sends the full plan, scene file and traceback and gets a whole new file back.
+A fix window holds only the lines around the traceback's failing line, widened
+so that no statement is cut in half, plus the definitions those lines depend
+on: the imports, the enclosing class and method headers, and the helpers and
+module-level names they reference. The model answers with a unified diff
+against these snippets, which keep their real file line numbers.
+"""
+
+import ast
+from dataclasses import dataclass, field
+from typing import List, Optional, Set, Tuple
+
+from src.core.auto_fixer import error_line
+
+DEFAULT_WINDOW_RADIUS = 8
+# Referenced definitions longer than this are shown by their header only
+MAX_DEFINITION_LINES = 40
+# Tracebacks are cut to their last lines; the exception and innermost frames are at the end
+MAX_TRACEBACK_LINES = 40
+
+
+@dataclass
+class FixWindow:
+    """The failing lines of a scene file and the definitions they reference (1-based, inclusive line ranges)"""
+    error_line: int
+    start: int
+    end: int
+    snippets: List[Tuple[int, int]] = field(default_factory=list)
+
+    def render(self, code: str) -> str:
+        """Render all snippets in file order, each headed by its line range."""
+        lines = code.split("\n")
+        parts = []
+        for start, end in self.snippets:
+            label = " (failing code)" if (start, end) == (self.start, self.end) else ""
+            parts.append(f"# --- lines {start}-{end}{label} ---\n" + "\n".join(lines[start - 1:end]))
+        return "\n".join(parts)
+
+
+def trim_traceback(error: str, max_lines: int = MAX_TRACEBACK_LINES) -> str:
+    """Keep the last ``max_lines`` lines of an error output."""
+    lines = error.strip().splitlines()
+    if len(lines) <= max_lines:
+        return error.strip()
+    return "\n".join(["... (traceback truncated)"] + lines[-max_lines:])
+
+
+def _statement_spans(tree: ast.Module) -> List[Tuple[int, int]]:
+    """Line spans that must not be split: simple statements and the headers of compound ones."""
+    return [_header_span(node) for node in ast.walk(tree) if isinstance(node, ast.stmt)]
+
+
+def _widen(start: int, end: int, spans: List[Tuple[int, int]]) -> Tuple[int, int]:
+    """Grow [start, end] until no statement span crosses either edge."""
+    changed = True
+    while changed:
+        changed = False
+        for span_start, span_end in spans:
+            if span_start < start <= span_end:
+                start, changed = span_start, True
+            if span_start <= end < span_end:
+                end, changed = span_end, True
+    return start, end
+
+
+def _referenced_names(tree: ast.Module, start: int, end: int) -> Set[str]:
+    """Names and ``self.`` attributes used by the nodes inside [start, end]."""
+    names = set()
+    for node in ast.walk(tree):
+        if not start <= getattr(node, "lineno", 0) <= end:
+            continue
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+        elif isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "self":
+            names.add(node.attr)
+    return names
+
+
+def _header_span(node: ast.stmt) -> Tuple[int, int]:
+    """Span of a statement's header (decorators and signature), or the whole statement if it has no body."""
+    start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+    body = getattr(node, "body", None)
+    if not isinstance(body, list) or not body:
+        return start, node.end_lineno
+    return start, max(node.lineno, body[0].lineno - 1)
+
+
+def _definition_span(node: ast.stmt) -> Tuple[int, int]:
+    """Full span of a definition, or just its header when it is too long to include."""
+    start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+    if node.end_lineno - start + 1 <= MAX_DEFINITION_LINES:
+        return start, node.end_lineno
+    return _header_span(node)
+
+
+def _defined_names(node: ast.stmt) -> Set[str]:
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return {node.name}
+    if isinstance(node, (ast.Assign, ast.AnnAssign)):
+        targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+        return {n.id for t in targets for n in ast.walk(t) if isinstance(n, ast.Name)}
+    return set()
+
+
+def _merge(spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Sort spans and merge the ones that overlap or touch."""
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def extract_fix_window(code: str, error: str, radius: int = DEFAULT_WINDOW_RADIUS) -> Optional[FixWindow]:
+    """Find the failing code window of a render error and the definitions it needs.
+
+    Args:
+        code (str): Scene code that failed to render
+        error (str): Error output containing a traceback frame in the scene file
+        radius (int): Lines kept on each side of the failing line before widening
+
+    Returns:
+        Optional[FixWindow]: The window, or None when the error does not point into the code
+            or the window would cover most of the file anyway
+    """
+    lines = code.split("\n")
+    line_number = error_line(error)
+    if line_number is None or not 0 < line_number <= len(lines):
+        return None
+
+    start, end = max(1, line_number - radius), min(len(lines), line_number + radius)
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return FixWindow(error_line=line_number, start=start, end=end, snippets=[(start, end)])
+
+    start, end = _widen(start, end, _statement_spans(tree))
+    snippets = [(start, end)]
+    referenced = _referenced_names(tree, start, end)
+
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            snippets.append((node.lineno, node.end_lineno))
+            continue
+        if node.end_lineno >= start and node.lineno <= end and isinstance(node, ast.ClassDef):
+            # Enclosing class: keep its header, and the methods the window calls through self
+            snippets.append(_header_span(node))
+            for member in node.body:
+                if member.lineno <= start and member.end_lineno >= end:
+                    snippets.append(_header_span(member))
+                elif _defined_names(member) & referenced and not (member.lineno <= end and member.end_lineno >= start):
+                    snippets.append(_definition_span(member))
+        elif node.end_lineno >= start and node.lineno <= end:
+            # Enclosing module-level function
+            snippets.append(_header_span(node))
+        elif _defined_names(node) & referenced:
+            snippets.append(_definition_span(node))
+
+    snippets = _merge(snippets)
+    shown = sum(snippet_end - snippet_start + 1 for snippet_start, snippet_end in snippets)
+    if shown >= 0.75 * len(lines):
+        return None
+    window_span = next(span for span in snippets if span[0] <= start and span[1] >= end)
+    return FixWindow(error_line=line_number, start=window_span[0], end=window_span[1], snippets=snippets)
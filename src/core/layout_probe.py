@@ -0,0 +1,210 @@
+"""
+Render-time layout probe and checker, a cheap pre-filter for visual self-reflection.
+
+Visual self-reflection sends a snapshot of every rendered scene to a
+multimodal model to find overlapping and out-of-frame objects. The probe
+records the bounding box of every visible top-level mobject after each
+``play``/``wait`` call while the scene renders; the checker then flags, with
+numpy, boxes leaving the safe area and pairs of boxes closer than the
+minimum spacing from the storyboard prompt. The multimodal call is only
+needed when the checker flags something or cannot decide.
+
+The probe is injected by running manim through this module::
+
+    LAYOUT_PROBE_OUTPUT=layout.json python -m src.core.layout_probe -qh scene.py
+"""
+
+import atexit
+import json
+import os
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+PROBE_OUTPUT_ENV = "LAYOUT_PROBE_OUTPUT"
+# Spatial constraints of the storyboard and code generation prompts
+DEFAULT_SAFE_MARGIN = 0.5
+DEFAULT_MIN_SPACING = 0.3
+# Scenes with more visible top-level mobjects than this are left to the multimodal model
+MAX_CHECKED_MOBJECTS = 40
+# Boxes covering this share of the frame in both directions are backgrounds, not layout elements
+BACKGROUND_COVERAGE = 0.9
+_EPSILON = 1e-3
+
+
+def _is_visible(mobject) -> bool:
+    """Whether a mobject without submobjects draws anything."""
+    opacities = []
+    for getter in ("get_fill_opacity", "get_stroke_opacity", "get_opacity"):
+        try:
+            opacities.append(float(np.max(getattr(mobject, getter)())))
+        except Exception:
+            continue
+    return not opacities or max(opacities) > 0.01
+
+
+def _describe(mobject) -> str:
+    """Class name plus the text of text mobjects, to identify a box in the checker's findings."""
+    text = getattr(mobject, "text", None) or getattr(mobject, "tex_string", None)
+    if isinstance(text, str) and text.strip():
+        return f"{type(mobject).__name__}({text.strip()[:30]!r})"
+    return type(mobject).__name__
+
+
+def _bounding_box(mobject) -> Optional[List[float]]:
+    """[x0, y0, x1, y1] of the visible points of a mobject's family, or None if it draws nothing."""
+    points = [m.points for m in mobject.get_family() if len(getattr(m, "points", [])) and _is_visible(m)]
+    if not points:
+        return None
+    stacked = np.vstack(points)
+    (x0, y0), (x1, y1) = stacked[:, :2].min(axis=0), stacked[:, :2].max(axis=0)
+    return [round(float(v), 4) for v in (x0, y0, x1, y1)]
+
+
+def install_probe(output_path: str) -> None:
+    """Record mobject bounding boxes after every animation and write them to ``output_path`` at exit.
+
+    Args:
+        output_path (str): JSON file receiving the frame size and one snapshot per animation boundary
+    """
+    from manim import Scene, config
+
+    record = {"frame_width": float(config.frame_width), "frame_height": float(config.frame_height),
+              "snapshots": [], "errors": []}
+
+    def snapshot(scene, after: str) -> None:
+        try:
+            mobjects = []
+            for mobject in scene.mobjects:
+                box = _bounding_box(mobject)
+                if box is not None:
+                    mobjects.append({"name": _describe(mobject), "box": box})
+            record["snapshots"].append({"after": after, "time": float(getattr(scene.renderer, "time", 0.0)),
+                                        "mobjects": mobjects})
+        except Exception as e:  # never let the probe break a render
+            record["errors"].append(f"{after}: {e}")
+
+    def wrap(method_name: str):
+        original = getattr(Scene, method_name)
+
+        def probed(self, *args, **kwargs):
+            result = original(self, *args, **kwargs)
+            snapshot(self, method_name)
+            return result
+        probed.__name__ = original.__name__
+        probed.__doc__ = original.__doc__
+        setattr(Scene, method_name, probed)
+
+    wrap("play")
+    wrap("wait")
+
+    def write() -> None:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(record, f)
+    atexit.register(write)
+
+
+def load_layout_record(path: str) -> Optional[Dict]:
+    """Read a probe record, or None if the probe did not produce one."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+@dataclass
+class LayoutReport:
+    """Outcome of a layout check: "ok", "flagged" or "undecided", with human-readable findings"""
+    verdict: str
+    issues: List[str] = field(default_factory=list)
+    snapshots: int = 0
+
+
+def check_layout(record: Optional[Dict], safe_margin: float = DEFAULT_SAFE_MARGIN,
+                 min_spacing: float = DEFAULT_MIN_SPACING,
+                 max_mobjects: int = MAX_CHECKED_MOBJECTS) -> LayoutReport:
+    """Check probe snapshots for safe-area violations and crowded or overlapping mobjects.
+
+    Boxes nested in one another (a label inside a box, a graph on its axes) are
+    treated as intentional, and full-frame backgrounds are ignored.
+
+    Args:
+        record (Optional[Dict]): Probe record from load_layout_record
+        safe_margin (float): Required distance from the frame edges, in scene units
+        min_spacing (float): Required distance between separate mobjects, in scene units
+        max_mobjects (int): Snapshots with more mobjects than this make the check undecided
+
+    Returns:
+        LayoutReport: "ok" when nothing is wrong, "flagged" with findings, or "undecided"
+            when the probe data is missing, incomplete or too crowded to judge
+    """
+    if not record or not record.get("snapshots"):
+        return LayoutReport("undecided", ["no layout snapshots were recorded"])
+    if record.get("errors"):
+        return LayoutReport("undecided", [f"layout probe failed: {record['errors'][0]}"], len(record["snapshots"]))
+
+    half_width = record["frame_width"] / 2 - safe_margin
+    half_height = record["frame_height"] / 2 - safe_margin
+    issues: Dict[tuple, str] = {}
+    undecided = []
+
+    for index, snapshot in enumerate(record["snapshots"]):
+        entries = snapshot["mobjects"]
+        if not entries:
+            continue
+        boxes = np.array([entry["box"] for entry in entries], dtype=float)
+        x0, y0, x1, y1 = boxes.T
+        layout = ((x1 - x0) < BACKGROUND_COVERAGE * record["frame_width"]) | \
+                 ((y1 - y0) < BACKGROUND_COVERAGE * record["frame_height"])
+        if layout.sum() > max_mobjects:
+            undecided.append(f"{int(layout.sum())} mobjects on screen after animation {index + 1}")
+            continue
+
+        outside = layout & ((x0 < -half_width - _EPSILON) | (x1 > half_width + _EPSILON) |
+                            (y0 < -half_height - _EPSILON) | (y1 > half_height + _EPSILON))
+        for i in np.flatnonzero(outside):
+            name = entries[i]["name"]
+            issues.setdefault(("margin", name), (
+                f"{name} extends beyond the {safe_margin}-unit safe area after animation {index + 1} "
+                f"(box x {x0[i]:.2f}..{x1[i]:.2f}, y {y0[i]:.2f}..{y1[i]:.2f})"))
+
+        # Axis gaps between every pair of boxes; negative on both axes means the boxes overlap
+        gap_x = np.maximum(x0[None, :] - x1[:, None], x0[:, None] - x1[None, :])
+        gap_y = np.maximum(y0[None, :] - y1[:, None], y0[:, None] - y1[None, :])
+        distance = np.hypot(np.clip(gap_x, 0, None), np.clip(gap_y, 0, None))
+        contains = ((x0[:, None] <= x0[None, :] + _EPSILON) & (x1[:, None] >= x1[None, :] - _EPSILON) &
+                    (y0[:, None] <= y0[None, :] + _EPSILON) & (y1[:, None] >= y1[None, :] - _EPSILON))
+        crowded = (distance < min_spacing - _EPSILON) & ~(contains | contains.T)
+        crowded &= layout[:, None] & layout[None, :]
+        for i, j in zip(*np.nonzero(np.triu(crowded, k=1))):
+            first, second = entries[i]["name"], entries[j]["name"]
+            if distance[i, j] == 0:
+                finding = f"{first} and {second} overlap after animation {index + 1}"
+            else:
+                finding = (f"{first} and {second} are {distance[i, j]:.2f} units apart after animation {index + 1} "
+                           f"(minimum {min_spacing})")
+            issues.setdefault(("spacing", first, second), finding)
+
+    if issues:
+        return LayoutReport("flagged", list(issues.values()), len(record["snapshots"]))
+    if undecided:
+        return LayoutReport("undecided", undecided, len(record["snapshots"]))
+    return LayoutReport("ok", [], len(record["snapshots"]))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the manim CLI with the probe installed when LAYOUT_PROBE_OUTPUT is set."""
+    output_path = os.environ.get(PROBE_OUTPUT_ENV)
+    if output_path:
+        install_probe(output_path)
+    from manim.__main__ import main as manim_main
+    sys.argv = ["manim"] + (sys.argv[1:] if argv is None else list(argv))
+    manim_main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Embedded agent memory backend: SQLite for storage, an in-memory numpy index for search.
+
+``AgentMemory`` sends every store and search to the remote Mem0 service, which
+adds a network round trip to each code generation and fix, and does nothing
+offline. ``LocalAgentMemory`` implements the same interface locally. Memories
+are persisted in SQLite and their error and solution text is embedded (hashed
+bag of words) into a numpy matrix held in memory, next to integer-coded
+columns for the equality filters, so a search is a mask plus one
+matrix-vector product. Optionally every stored memory is also mirrored to
+Mem0 in the background through the write-behind queue.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.core.agent_memory import AgentMemory, LookupMemo
+from src.utils.text_embedding import HASHED_EMBEDDING_DIM, hashed_embedding
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    agent_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    scene_type TEXT NOT NULL,
+    memory TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_memories_agent ON memories (agent_id, type);
+"""
+
+# Columns that searches filter on with equality, kept as integer codes next to the vectors
+_FILTER_COLUMNS = ("agent_id", "type", "topic", "scene_type")
+# Metadata fields whose text is embedded for search
+_SEARCH_FIELDS = ("error_snippet", "original_snippet", "fixed_snippet", "task_description", "code_snippet",
+                  "topic", "scene_type")
+
+
+def _embed(text: str) -> np.ndarray:
+    vector = np.asarray(hashed_embedding(text, HASHED_EMBEDDING_DIM), dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class LocalAgentMemory(AgentMemory):
+    """
+    Agent memory kept in a local SQLite file and searched in process.
+    Memory entries and search results have the same shape as Mem0's.
+    """
+
+    def __init__(self, db_path: str = "data/agent_memory.db", agent_id: str = "manimAnimationAgent",
+                 mirror_to_mem0: bool = False, write_queue_path: Optional[str] = None, lookup_ttl: float = 900.0):
+        """
+        Initialize the local agent memory.
+
+        Args:
+            db_path: SQLite file holding the memories, created if missing
+            agent_id: Unique identifier for this agent
+            mirror_to_mem0: Whether to also send every stored memory to Mem0 (needs a Mem0 API key)
+            write_queue_path: Journal of the write-behind queue used for mirroring. If None, mirroring writes inline
+            lookup_ttl: Seconds a similar-fix or preventive-example lookup is reused within the run; 0 disables
+        """
+        self.agent_id = agent_id
+        self.enabled = True
+        self.write_queue = None
+        self.lookup_memo = LookupMemo(lookup_ttl)
+        self.db_path = db_path
+        self._remote = None
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._search_stats = {"searches": 0, "search_seconds": 0.0}
+        self._load_index()
+        print(f"Local agent memory initialized for agent: {self.agent_id} ({self._size} memories in {db_path})")
+
+        if mirror_to_mem0:
+            remote = AgentMemory(agent_id=agent_id, write_queue_path=write_queue_path, lookup_ttl=0)
+            if remote.enabled:
+                self._remote = remote
+                self.write_queue = remote.write_queue
+
+    def _load_index(self) -> None:
+        """Load every memory into the in-memory index."""
+        self._rows: List[Dict] = []
+        self._codes: Dict[str, Dict[str, int]] = {column: {} for column in _FILTER_COLUMNS}
+        self._columns = {column: np.zeros(64, dtype=np.int32) for column in _FILTER_COLUMNS}
+        self._vectors = np.zeros((64, HASHED_EMBEDDING_DIM), dtype=np.float32)
+        self._size = 0
+        rows = self._conn.execute(
+            "SELECT id, agent_id, type, topic, scene_type, memory, metadata, embedding, created_at FROM memories ORDER BY id"
+        ).fetchall()
+        for row_id, agent_id, kind, topic, scene_type, memory, metadata, embedding, created_at in rows:
+            metadata = json.loads(metadata)
+            vector = np.frombuffer(embedding, dtype=np.float32)
+            if vector.shape[0] != HASHED_EMBEDDING_DIM:
+                vector = _embed(self._search_text(memory, metadata))
+            self._append(row_id, {"agent_id": agent_id, "type": kind, "topic": topic, "scene_type": scene_type},
+                         memory, metadata, vector, created_at)
+
+    def _append(self, row_id: int, columns: Dict[str, str], memory: str, metadata: Dict,
+                vector: np.ndarray, created_at: float) -> None:
+        """Add one memory to the in-memory index, growing the arrays as needed."""
+        if self._size == self._vectors.shape[0]:
+            capacity = self._size * 2
+            self._vectors = np.resize(self._vectors, (capacity, HASHED_EMBEDDING_DIM))
+            self._columns = {column: np.resize(values, capacity) for column, values in self._columns.items()}
+        for column in _FILTER_COLUMNS:
+            codes = self._codes[column]
+            self._columns[column][self._size] = codes.setdefault(columns[column], len(codes))
+        self._vectors[self._size] = vector
+        self._rows.append({"id": str(row_id), "memory": memory, "metadata": metadata, "created_at": created_at})
+        self._size += 1
+
+    @staticmethod
+    def _search_text(memory: str, metadata: Dict) -> str:
+        """Text a memory is embedded from; the templated memory sentence is only used without metadata."""
+        parts = [str(metadata[field]) for field in _SEARCH_FIELDS if metadata.get(field)]
+        return "\n".join(parts) or memory
+
+    def _add(self, messages: List[Dict], metadata: Dict) -> None:
+        """Store a memory built by AgentMemory locally, and mirror it to Mem0 if enabled."""
+        memory = "\n".join(message["content"] for message in messages)
+        vector = _embed(self._search_text(memory, metadata))
+        columns = {"agent_id": self.agent_id, "type": metadata.get("type", ""),
+                   "topic": metadata.get("topic", "general"), "scene_type": metadata.get("scene_type", "general")}
+        created_at = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO memories (agent_id, type, topic, scene_type, memory, metadata, embedding, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (columns["agent_id"], columns["type"], columns["topic"], columns["scene_type"],
+                 memory, json.dumps(metadata), vector.tobytes(), created_at)
+            )
+            self._conn.commit()
+            self._append(cursor.lastrowid, columns, memory, metadata, vector, created_at)
+        if self._remote is not None:
+            try:
+                self._remote._add(messages, metadata)
+            except Exception as e:
+                print(f"⚠️ Failed to mirror memory to Mem0: {e}")
+
+    def search(self, query: str, filters: Dict[str, str], limit: int = 5) -> List[Dict]:
+        """Rank this agent's memories matching ``filters`` by similarity to ``query``.
+
+        Args:
+            query: Text to compare against the memories' error and solution text
+            filters: Equality filters on type, topic and scene_type
+            limit: Maximum number of results
+
+        Returns:
+            List of memories with "id", "memory", "metadata", "created_at" and "score", best first
+        """
+        start = time.perf_counter()
+        vector = _embed(query)
+        with self._lock:
+            mask = np.ones(self._size, dtype=bool)
+            for column, value in {**filters, "agent_id": self.agent_id}.items():
+                code = self._codes[column].get(value)
+                if code is None:
+                    mask[:] = False
+                    break
+                mask &= self._columns[column][:self._size] == code
+            candidates = np.flatnonzero(mask)
+            scores = (self._vectors[:self._size] @ vector)[candidates]
+            if len(candidates) > limit:
+                best = np.argpartition(-scores, limit)[:limit]
+            else:
+                best = np.arange(len(candidates))
+            best = best[np.argsort(-scores[best])]
+            results = [{**self._rows[candidates[i]], "score": float(scores[i])} for i in best if scores[i] > 0]
+            self._search_stats["searches"] += 1
+            self._search_stats["search_seconds"] += time.perf_counter() - start
+        return results
+
+    @staticmethod
+    def _filters(kind: str, topic: Optional[str], scene_type: Optional[str]) -> Dict[str, str]:
+        filters = {"type": kind}
+        if topic:
+            filters["topic"] = topic[:50]
+        if scene_type:
+            filters["scene_type"] = scene_type[:50]
+        return filters
+
+    def _search_similar_fixes(self, error_message: str, code_context: str, topic: Optional[str],
+                              scene_type: Optional[str], limit: int) -> List[Dict]:
+        """Rank stored error fixes by similarity to the error and its code."""
+        return self.search(f"{error_message}\n{code_context}", self._filters("error_fix", topic, scene_type), limit)
+
+    def _search_preventive_examples(self, task_description: str, topic: Optional[str],
+                                    scene_type: Optional[str], limit: int) -> List[Tuple[str, str]]:
+        """Rank stored error fixes by similarity to the task; every stored fix led to a successful render."""
+        examples = []
+        for result in self.search(task_description, self._filters("error_fix", topic, scene_type), limit):
+            meta = result["metadata"]
+            solution = meta.get("fixed_snippet", meta.get("code_snippet", ""))
+            if solution:
+                examples.append((meta.get("error_snippet", "Unknown error"), solution))
+        return examples
+
+    def get_memory_stats(self) -> Dict:
+        """Get statistics about stored memories and local search latency."""
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT type, COUNT(*) FROM memories WHERE agent_id = ? GROUP BY type", (self.agent_id,)
+            ).fetchall())
+            searches = self._search_stats["searches"]
+            mean_search = self._search_stats["search_seconds"] / searches if searches else 0.0
+        return {
+            "enabled": True,
+            "backend": "local",
+            "total_memories": sum(counts.values()),
+            "error_fixes": counts.get("error_fix", 0),
+            "successful_generations": counts.get("successful_generation", 0),
+            "agent_id": self.agent_id,
+            "searches": searches,
+            "mean_search_us": round(mean_search * 1e6, 1),
+            "mirrored_to_mem0": self._remote is not None
+        }
+
+    def clear_memory(self, confirm: bool = False) -> bool:
+        """
+        Clear all local memories for this agent (mirrored Mem0 memories are left alone).
+
+        Args:
+            confirm: Must be True to actually clear memories
+
+        Returns:
+            bool: True if cleared successfully
+        """
+        if not confirm:
+            return False
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM memories WHERE agent_id = ?", (self.agent_id,)).rowcount
+            self._conn.commit()
+            self._load_index()
+        self.lookup_memo.invalidate()
+        print(f"Cleared {deleted} memories for agent {self.agent_id}")
+        return True
@@ -0,0 +1,248 @@
+"""
+Write-behind queue for agent memory stores.
+
+Storing a successful generation or fix in Mem0 is a blocking network write
+that used to sit on the scene's critical path. Writes are now appended to a
+local SQLite journal and acknowledged immediately; a background worker sends
+them in batches, retries failures with exponential backoff, and deletes each
+entry once Mem0 accepted it. Entries still in the journal when the process
+exits are sent by the next process that opens it. When the journal grows
+past ``max_pending`` entries, producers are slowed down until it drains.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.utils.cache_utils import connect_wal, immediate_transaction
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_writes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    claimed_by TEXT,
+    claimed_until REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pending_writes_next ON pending_writes (next_attempt);
+"""
+
+RETRY_BASE_DELAY = 2.0
+MAX_RETRY_DELAY = 300.0
+
+
+class MemoryWriteQueue:
+    """Durable write-behind queue that sends journaled payloads through ``writer`` in the background."""
+
+    def __init__(self, journal_path: str, writer: Callable[[Dict], None], batch_size: int = 10,
+                 max_pending: int = 200, max_attempts: int = 5, flush_interval: float = 0.5,
+                 backpressure_timeout: float = 30.0, max_concurrent_writes: int = 4, lease_seconds: float = 120.0):
+        """
+        Args:
+            journal_path (str): SQLite journal file, created if missing
+            writer (Callable[[Dict], None]): Sends one payload; raising marks the write as failed
+            batch_size (int): Entries claimed and sent per flush
+            max_pending (int): Journal depth above which producers are made to wait
+            max_attempts (int): Attempts before a write is dropped
+            flush_interval (float): Seconds between flushes while fewer than batch_size entries wait
+            backpressure_timeout (float): Longest a producer waits for room before enqueueing anyway
+            max_concurrent_writes (int): Writes of a batch sent in parallel
+            lease_seconds (float): How long a claimed entry is reserved for this process before another may send it
+        """
+        self.journal_path = journal_path
+        self.writer = writer
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.flush_interval = flush_interval
+        self.backpressure_timeout = backpressure_timeout
+        self.lease_seconds = lease_seconds
+        self._owner = f"{os.getpid()}-{id(self)}"
+
+        self._lock = threading.Lock()
+        self._conn = connect_wal(journal_path, _SCHEMA)
+
+        self.stats = {"queued": 0, "written": 0, "retried": 0, "dropped": 0, "backpressure_waits": 0}
+        self._stats_lock = threading.Lock()
+        self._room = threading.Condition()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._closed = False
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrent_writes, thread_name_prefix="memory-write")
+        self._worker = threading.Thread(target=self._run, name="memory-write-behind", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    @property
+    def closed(self) -> bool:
+        """Whether close() has run; a closed queue no longer accepts writes."""
+        return self._closed
+
+    def pending(self) -> int:
+        """Number of journaled writes not yet accepted by the writer."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pending_writes").fetchone()[0]
+
+    def enqueue(self, payload: Dict) -> None:
+        """Journal a write and return without waiting for it to be sent.
+
+        When the journal is deeper than ``max_pending``, waits (up to
+        ``backpressure_timeout``) for the worker to make room first.
+
+        Args:
+            payload (Dict): JSON-serializable arguments for the writer
+        """
+        if self.pending() >= self.max_pending:
+            self._count("backpressure_waits")
+            print(f"⏳ Memory write queue is {self.max_pending}+ deep, waiting for it to drain")
+            self._wakeup.set()
+            deadline = time.monotonic() + self.backpressure_timeout
+            with self._room:
+                while self.pending() >= self.max_pending and not self._stop.is_set():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._room.wait(min(remaining, 1.0))
+
+        now = time.time()
+        with immediate_transaction(self._conn, self._lock) as conn:
+            conn.execute("INSERT INTO pending_writes (payload, next_attempt, created_at) VALUES (?, ?, ?)",
+                         (json.dumps(payload), now, now))
+        self._count("queued")
+        if self.pending() >= self.batch_size:
+            self._wakeup.set()
+
+    def _claim_batch(self) -> List[Tuple[int, str, int]]:
+        """Reserve the next due, unclaimed entries for this process."""
+        now = time.time()
+        with immediate_transaction(self._conn, self._lock) as conn:
+            rows = conn.execute(
+                "SELECT id, payload, attempts FROM pending_writes WHERE next_attempt <= ? AND claimed_until < ? "
+                "ORDER BY id LIMIT ?", (now, now, self.batch_size)
+            ).fetchall()
+            conn.executemany("UPDATE pending_writes SET claimed_by = ?, claimed_until = ? WHERE id = ?",
+                             [(self._owner, now + self.lease_seconds, row[0]) for row in rows])
+        return rows
+
+    def _write_batch(self, rows: List[Tuple[int, str, int]]) -> None:
+        """Send a claimed batch, then delete the accepted entries and reschedule the failed ones."""
+        futures = [(self._pool.submit(self.writer, json.loads(payload)), row_id, attempts)
+                   for row_id, payload, attempts in rows]
+        written, failed = [], []
+        for future, row_id, attempts in futures:
+            try:
+                future.result()
+                written.append(row_id)
+            except Exception as e:
+                failed.append((row_id, attempts + 1, e))
+
+        dropped = 0
+        with immediate_transaction(self._conn, self._lock) as conn:
+            conn.executemany("DELETE FROM pending_writes WHERE id = ?", [(row_id,) for row_id in written])
+            for row_id, attempts, error in failed:
+                if attempts >= self.max_attempts:
+                    conn.execute("DELETE FROM pending_writes WHERE id = ?", (row_id,))
+                    dropped += 1
+                    print(f"❌ Dropping memory write after {attempts} attempts: {error}")
+                else:
+                    delay = min(RETRY_BASE_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+                    conn.execute("UPDATE pending_writes SET attempts = ?, next_attempt = ?, claimed_until = 0 WHERE id = ?",
+                                 (attempts, time.time() + delay, row_id))
+        self._count("written", len(written))
+        self._count("retried", len(failed) - dropped)
+        self._count("dropped", dropped)
+        with self._room:
+            self._room.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> int:
+        """Send due entries until none are left or ``timeout`` seconds have passed.
+
+        Args:
+            timeout (float, optional): Time budget in seconds; unlimited when None
+
+        Returns:
+            int: Entries still in the journal
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while deadline is None or time.monotonic() < deadline:
+            rows = self._claim_batch()
+            if not rows:
+                break
+            self._write_batch(rows)
+        return self.pending()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ Memory write-behind flush failed: {e}")
+
+    def get_metrics(self) -> Dict[str, int]:
+        """Return write counts and the current journal depth."""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["pending"] = self.pending() if not self._closed else 0
+        return stats
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop the worker, spend up to ``timeout`` seconds sending what is due, and keep the rest journaled.
+
+        Args:
+            timeout (float): Time budget for the final flush, in seconds
+        """
+        if self._closed:
+            return
+        self._stop.set()
+        self._wakeup.set()
+        self._worker.join(timeout)
+        if self._worker.is_alive():
+            # Still sending; its entries stay claimed until the lease expires
+            return
+        remaining = self.flush(timeout=timeout)
+        if remaining:
+            print(f"💾 {remaining} memory writes kept in {self.journal_path} for the next run")
+        with immediate_transaction(self._conn, self._lock) as conn:
+            # Let the next process send our unfinished entries right away
+            conn.execute("UPDATE pending_writes SET claimed_until = 0 WHERE claimed_by = ?", (self._owner,))
+        self._pool.shutdown(wait=False)
+        with self._lock:
+            self._conn.close()
+        self._closed = True
+
+
+_queues: Dict[str, MemoryWriteQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def get_memory_write_queue(journal_path: str, writer: Callable[[Dict], None], **kwargs) -> MemoryWriteQueue:
+    """Return the process-wide queue for a journal, creating it with ``writer`` on first use.
+
+    Args:
+        journal_path (str): SQLite journal file
+        writer (Callable[[Dict], None]): Sends one payload, used if the queue is created now
+        **kwargs: Further MemoryWriteQueue options, used if the queue is created now
+
+    Returns:
+        MemoryWriteQueue: Queue shared by all agent memories of this process
+    """
+    key = os.path.abspath(journal_path)
+    with _queues_lock:
+        queue = _queues.get(key)
+        if queue is None or queue.closed:
+            queue = _queues[key] = MemoryWriteQueue(journal_path, writer, **kwargs)
+        return queue
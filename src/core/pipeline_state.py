@@ -0,0 +1,427 @@
+"""
+Persistent per-topic pipeline state.
+
+Resuming used to rely on filesystem probes (outline file, plan files, any
+``.py`` under ``code/``, ``succ_rendered.txt``), which race under concurrent
+scene pipelines and are slow on large or network-mounted output trees. The
+state store records each topic's outline and each scene's stage, attempts,
+artifact paths and timings in an embedded SQLite database (WAL mode), with
+every update applied in a single transaction.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.utils.cache_utils import connect_wal, immediate_transaction
+from src.utils.utils import extract_xml
+
+# Scene stages in pipeline order; a scene's stage is the last one it completed
+SCENE_STAGES = ("pending", "planned", "coded", "rendered")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS topics (
+    file_prefix TEXT PRIMARY KEY,
+    topic TEXT NOT NULL,
+    description TEXT,
+    difficulty TEXT,
+    session_id TEXT,
+    outline_path TEXT,
+    num_scenes INTEGER NOT NULL DEFAULT 0,
+    combined_path TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scenes (
+    file_prefix TEXT NOT NULL,
+    scene_number INTEGER NOT NULL,
+    stage TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    artifacts TEXT NOT NULL DEFAULT '{}',
+    timings TEXT NOT NULL DEFAULT '{}',
+    failed_stage TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (file_prefix, scene_number)
+);
+CREATE INDEX IF NOT EXISTS idx_topics_difficulty ON topics (difficulty, status);
+CREATE INDEX IF NOT EXISTS idx_scenes_stage ON scenes (stage);
+CREATE INDEX IF NOT EXISTS idx_scenes_failed_stage ON scenes (failed_stage);
+"""
+
+
+def topic_file_prefix(topic: str) -> str:
+    """Sanitized directory prefix of a topic, as used throughout the output tree."""
+    return re.sub(r'[^a-z0-9_]+', '_', topic.lower())
+
+
+def stage_index(stage: str) -> int:
+    """Position of a stage in the pipeline, used to compare progress."""
+    return SCENE_STAGES.index(stage) if stage in SCENE_STAGES else 0
+
+
+class PipelineStateStore:
+    """Transactional SQLite store of topic and scene progress, shared by every scene pipeline in a process."""
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path (str): SQLite database file, created if missing
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = connect_wal(db_path, _SCHEMA, row_factory=True)
+
+    def record_outline(self,
+                       file_prefix: str,
+                       topic: str,
+                       outline_path: str,
+                       num_scenes: int,
+                       description: Optional[str] = None,
+                       difficulty: Optional[str] = None,
+                       session_id: Optional[str] = None) -> None:
+        """
+        Register a topic's scene outline and create a pending row for every scene.
+
+        Args:
+            file_prefix (str): Sanitized topic prefix
+            topic (str): Topic name
+            outline_path (str): Path of the saved scene outline
+            num_scenes (int): Number of scenes in the outline
+            description (Optional[str]): Topic description
+            difficulty (Optional[str]): Difficulty level of the topic
+            session_id (Optional[str]): Session the topic was generated in
+        """
+        now = time.time()
+        with immediate_transaction(self._conn, self._lock) as conn:
+            conn.execute(
+                """INSERT INTO topics (file_prefix, topic, description, difficulty, session_id, outline_path,
+                                       num_scenes, status, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, 'planning', ?, ?)
+                   ON CONFLICT(file_prefix) DO UPDATE SET
+                       topic=excluded.topic,
+                       description=COALESCE(excluded.description, description),
+                       difficulty=COALESCE(excluded.difficulty, difficulty),
+                       session_id=COALESCE(excluded.session_id, session_id),
+                       outline_path=excluded.outline_path,
+                       num_scenes=excluded.num_scenes,
+                       updated_at=excluded.updated_at""",
+                (file_prefix, topic, description, difficulty, session_id, outline_path, num_scenes, now, now)
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO scenes (file_prefix, scene_number, updated_at) VALUES (?, ?, ?)",
+                [(file_prefix, n, now) for n in range(1, num_scenes + 1)]
+            )
+            conn.execute("DELETE FROM scenes WHERE file_prefix = ? AND scene_number > ?", (file_prefix, num_scenes))
+
+    def update_scene(self,
+                     file_prefix: str,
+                     scene_number: int,
+                     stage: Optional[str] = None,
+                     artifacts: Optional[Dict[str, str]] = None,
+                     timings: Optional[Dict[str, float]] = None,
+                     attempts: Optional[int] = None,
+                     error: Optional[str] = None,
+                     failed_stage: Optional[str] = None) -> None:
+        """
+        Atomically update one scene's progress.
+
+        The stage only moves forward, artifacts are merged by name and timings are
+        accumulated per stage. Reaching a stage clears any previous failure.
+
+        Args:
+            file_prefix (str): Sanitized topic prefix
+            scene_number (int): Scene number
+            stage (Optional[str]): Stage the scene just completed
+            artifacts (Optional[Dict[str, str]]): Artifact paths by name (plan, code, video)
+            timings (Optional[Dict[str, float]]): Seconds spent, by stage
+            attempts (Optional[int]): Number of code versions tried so far
+            error (Optional[str]): Error that stopped the scene
+            failed_stage (Optional[str]): Stage the error happened in
+        """
+        now = time.time()
+        with immediate_transaction(self._conn, self._lock) as conn:
+            row = conn.execute(
+                "SELECT * FROM scenes WHERE file_prefix = ? AND scene_number = ?", (file_prefix, scene_number)
+            ).fetchone()
+            current = dict(row) if row else {"stage": "pending", "attempts": 0, "artifacts": "{}", "timings": "{}",
+                                             "failed_stage": None, "error": None}
+            merged_artifacts = json.loads(current["artifacts"])
+            merged_artifacts.update(artifacts or {})
+            merged_timings = json.loads(current["timings"])
+            for name, seconds in (timings or {}).items():
+                merged_timings[name] = merged_timings.get(name, 0.0) + seconds
+
+            new_stage = current["stage"]
+            if stage and stage_index(stage) >= stage_index(new_stage):
+                new_stage = stage
+            if error is not None:
+                current["error"], current["failed_stage"] = error, failed_stage
+            elif stage:
+                current["error"], current["failed_stage"] = None, None
+
+            conn.execute(
+                """INSERT OR REPLACE INTO scenes (file_prefix, scene_number, stage, attempts, artifacts, timings,
+                                                  failed_stage, error, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (file_prefix, scene_number, new_stage,
+                 max(current["attempts"], attempts or 0),
+                 json.dumps(merged_artifacts), json.dumps(merged_timings),
+                 current["failed_stage"], current["error"], now)
+            )
+            conn.execute("UPDATE topics SET updated_at = ? WHERE file_prefix = ?", (now, file_prefix))
+
+    def set_topic_status(self, file_prefix: str, status: str, error: Optional[str] = None,
+                         combined_path: Optional[str] = None) -> None:
+        """
+        Set a topic's overall status ("planning", "rendering", "completed", "failed").
+
+        Args:
+            file_prefix (str): Sanitized topic prefix
+            status (str): New status
+            error (Optional[str]): Failure reason
+            combined_path (Optional[str]): Path of the combined video once it exists
+        """
+        with immediate_transaction(self._conn, self._lock) as conn:
+            conn.execute(
+                """UPDATE topics SET status = ?, error = ?, combined_path = COALESCE(?, combined_path), updated_at = ?
+                   WHERE file_prefix = ?""",
+                (status, error, combined_path, time.time(), file_prefix)
+            )
+
+    def get_topics(self, file_prefixes: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Load many topics with their scenes in two queries.
+
+        Args:
+            file_prefixes (Optional[List[str]]): Topics to load, all topics when None
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Topic records (with a "scenes" dict) keyed by file prefix
+        """
+        if file_prefixes is not None and not file_prefixes:
+            return {}
+        where, params = "", []
+        if file_prefixes is not None:
+            # One JSON parameter instead of an IN (...) list, which would hit SQLite's bound-parameter limit
+            where = " WHERE file_prefix IN (SELECT value FROM json_each(?))"
+            params = [json.dumps(list(file_prefixes))]
+        with self._lock:
+            topic_rows = self._conn.execute(f"SELECT * FROM topics{where}", params).fetchall()
+            scene_rows = self._conn.execute(
+                f"SELECT * FROM scenes{where} ORDER BY file_prefix, scene_number", params
+            ).fetchall()
+        topics = {row["file_prefix"]: dict(row, scenes={}) for row in topic_rows}
+        for scene_row in scene_rows:
+            scene = dict(scene_row)
+            scene["artifacts"] = json.loads(scene["artifacts"])
+            scene["timings"] = json.loads(scene["timings"])
+            if scene["file_prefix"] in topics:
+                topics[scene["file_prefix"]]["scenes"][scene["scene_number"]] = scene
+        return topics
+
+    def get_topic(self, file_prefix: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a topic's record with its scenes keyed by scene number, or None if it is unknown.
+
+        Args:
+            file_prefix (str): Sanitized topic prefix
+
+        Returns:
+            Optional[Dict[str, Any]]: Topic columns plus a "scenes" dict
+        """
+        return self.get_topics([file_prefix]).get(file_prefix)
+
+    def get_scene(self, file_prefix: str, scene_number: int) -> Optional[Dict[str, Any]]:
+        """Return one scene's record, or None if it is unknown."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM scenes WHERE file_prefix = ? AND scene_number = ?", (file_prefix, scene_number)
+            ).fetchone()
+        if row is None:
+            return None
+        scene = dict(row)
+        scene["artifacts"] = json.loads(scene["artifacts"])
+        scene["timings"] = json.loads(scene["timings"])
+        return scene
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Aggregate progress over every recorded topic using the indexed tables only.
+
+        Returns:
+            Dict[str, Any]: "difficulty" (per-level topic and scene completion with average attempts
+                per coded scene), "stages" (scene count per stage) and "failures" (failed scenes per stage)
+        """
+        with self._lock:
+            topic_rows = self._conn.execute(
+                """SELECT COALESCE(difficulty, 'default') AS difficulty, COUNT(*) AS topics,
+                          SUM(status = 'completed') AS completed, SUM(status = 'failed') AS failed
+                   FROM topics GROUP BY 1"""
+            ).fetchall()
+            scene_rows = self._conn.execute(
+                """SELECT COALESCE(t.difficulty, 'default') AS difficulty, COUNT(*) AS scenes,
+                          SUM(s.stage = 'rendered') AS rendered,
+                          AVG(CASE WHEN s.attempts > 0 THEN s.attempts END) AS avg_attempts
+                   FROM scenes s JOIN topics t USING (file_prefix) GROUP BY 1"""
+            ).fetchall()
+            stage_rows = self._conn.execute("SELECT stage, COUNT(*) AS n FROM scenes GROUP BY stage").fetchall()
+            failure_rows = self._conn.execute(
+                "SELECT failed_stage, COUNT(*) AS n FROM scenes WHERE error IS NOT NULL GROUP BY failed_stage"
+            ).fetchall()
+
+        difficulty = {row["difficulty"]: dict(row, scenes=0, rendered=0, avg_attempts=0.0) for row in topic_rows}
+        for row in scene_rows:
+            difficulty.setdefault(row["difficulty"], {"difficulty": row["difficulty"], "topics": 0, "completed": 0, "failed": 0})
+            difficulty[row["difficulty"]].update(scenes=row["scenes"], rendered=row["rendered"] or 0,
+                                                 avg_attempts=row["avg_attempts"] or 0.0)
+        return {
+            "difficulty": difficulty,
+            "stages": {row["stage"]: row["n"] for row in stage_rows},
+            "failures": {row["failed_stage"] or "unknown": row["n"] for row in failure_rows},
+        }
+
+    def print_report(self) -> None:
+        """Print per-difficulty completion, scene stages and per-stage failures."""
+        report = self.report()
+        print("\n📈 Pipeline report:")
+        print(f"{'Difficulty':<12} {'Topics':>7} {'Done':>6} {'Failed':>7} {'Scenes':>7} {'Rendered':>9} {'Avg attempts':>13}")
+        for level, row in sorted(report["difficulty"].items()):
+            print(f"{level:<12} {row['topics']:>7} {row['completed'] or 0:>6} {row['failed'] or 0:>7} "
+                  f"{row['scenes']:>7} {row['rendered']:>9} {row['avg_attempts']:>13.2f}")
+        print("Scenes by stage: " + ", ".join(f"{stage}={report['stages'].get(stage, 0)}" for stage in SCENE_STAGES))
+        failures = ", ".join(f"{stage}={n}" for stage, n in sorted(report["failures"].items())) or "none"
+        print(f"Failed scenes by stage: {failures}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def backfill_topic(store: PipelineStateStore,
+                   output_dir: str,
+                   topic: str,
+                   description: Optional[str] = None,
+                   difficulty: Optional[str] = None,
+                   session_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Import a topic's progress from an output tree into the store.
+
+    This is the one place that still probes scene directories; it runs once per
+    topic, after which status and resume queries only touch the store.
+
+    Args:
+        store (PipelineStateStore): Store to write to
+        output_dir (str): Root output directory
+        topic (str): Topic name
+        description (Optional[str]): Topic description
+        difficulty (Optional[str]): Difficulty level of the topic
+        session_id (Optional[str]): Session the topic was generated in
+
+    Returns:
+        Optional[Dict[str, Any]]: The topic's record, or None when it has no scene outline yet
+    """
+    file_prefix = topic_file_prefix(topic)
+    topic_dir = os.path.join(output_dir, file_prefix)
+    scene_outline_path = os.path.join(topic_dir, f"{file_prefix}_scene_outline.txt")
+    try:
+        with open(scene_outline_path, "r", encoding="utf-8") as f:
+            scene_outline = f.read()
+    except OSError:
+        return None
+    num_scenes = len(re.findall(r'<SCENE_(\d+)>[^<]', extract_xml(scene_outline)))
+
+    store.record_outline(file_prefix, topic, scene_outline_path, num_scenes,
+                         description=description, difficulty=difficulty, session_id=session_id)
+    for i in range(1, num_scenes + 1):
+        scene_dir = os.path.join(topic_dir, f"scene{i}")
+        if not os.path.isdir(scene_dir):
+            continue
+        artifacts = {}
+        stage = None
+        for plan_name in ("implementation_plan.txt", f"{file_prefix}_scene{i}_implementation_plan.txt"):
+            if os.path.exists(os.path.join(scene_dir, plan_name)):
+                artifacts["plan"] = os.path.join(scene_dir, plan_name)
+                stage = "planned"
+                break
+        code_dir = os.path.join(scene_dir, "code")
+        versions = sorted(
+            (int(m.group(1)), f) for f in (os.listdir(code_dir) if os.path.isdir(code_dir) else [])
+            for m in [re.search(r'_v(\d+)\.py$', f)] if m
+        )
+        if versions:
+            artifacts["code"] = os.path.join(code_dir, versions[-1][1])
+            stage = "coded"
+        if os.path.exists(os.path.join(scene_dir, "succ_rendered.txt")):
+            stage = "rendered"
+        if stage:
+            store.update_scene(file_prefix, i, stage=stage, artifacts=artifacts,
+                               attempts=versions[-1][0] + 1 if versions else 0)
+
+    combined_path = os.path.join(topic_dir, f"{file_prefix}_combined.mp4")
+    if os.path.exists(combined_path):
+        store.set_topic_status(file_prefix, "completed", combined_path=combined_path)
+    return store.get_topic(file_prefix)
+
+
+def backfill_output_dir(store: PipelineStateStore,
+                        output_dir: str,
+                        theorems: Optional[List[Dict]] = None,
+                        difficulty: Optional[str] = None) -> int:
+    """
+    Import every topic directory of an output tree that the store does not know yet.
+
+    Args:
+        store (PipelineStateStore): Store to write to
+        output_dir (str): Root output directory
+        theorems (Optional[List[Dict]]): Dataset entries, used to recover topic names and descriptions
+        difficulty (Optional[str]): Difficulty level recorded for imported topics
+
+    Returns:
+        int: Number of topics imported
+    """
+    by_prefix = {topic_file_prefix(t['theorem']): t for t in (theorems or [])}
+    known = set(store.get_topics().keys())
+    imported = 0
+    for item in sorted(os.listdir(output_dir)) if os.path.isdir(output_dir) else []:
+        if item in known or not os.path.isdir(os.path.join(output_dir, item)):
+            continue
+        theorem = by_prefix.get(item, {})
+        if backfill_topic(store, output_dir, theorem.get('theorem', item), theorem.get('description'), difficulty):
+            imported += 1
+    return imported
+
+
+def status_from_state(topic: str, topic_state: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Build the check_theorem_status dictionary from a topic record.
+
+    Args:
+        topic (str): Topic name
+        topic_state (Optional[Dict[str, Any]]): Record from the store, None for an unstarted topic
+
+    Returns:
+        Dict[str, Any]: Outline, plan, code, render and combined-video status
+    """
+    scenes = topic_state["scenes"] if topic_state else {}
+    scene_status = [{
+        'scene_number': scene_number,
+        'has_plan': stage_index(scene['stage']) >= stage_index("planned"),
+        'has_code': stage_index(scene['stage']) >= stage_index("coded"),
+        'has_render': scene['stage'] == "rendered"
+    } for scene_number, scene in scenes.items()]
+    return {
+        'topic': topic,
+        'has_scene_outline': bool(topic_state and topic_state['outline_path']),
+        'total_scenes': topic_state['num_scenes'] if topic_state else 0,
+        'implementation_plans': sum(1 for status in scene_status if status['has_plan']),
+        'code_files': sum(1 for status in scene_status if status['has_code']),
+        'rendered_scenes': sum(1 for status in scene_status if status['has_render']),
+        'has_combined_video': bool(topic_state and topic_state['combined_path']),
+        'scene_status': scene_status
+    }
@@ -0,0 +1,240 @@
+"""
+Semantic cache of scene outlines and implementation plans.
+
+Many theorems in the datasets are closely related and API users often submit
+near-duplicate topics. The cache embeds topic + description, finds the most
+similar previously planned topic and offers its plans as a warm start:
+reused verbatim above ``reuse_threshold`` or adapted with a cheaper prompt
+above ``adapt_threshold``.
+"""
+
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from src.utils.text_embedding import HASHED_EMBEDDING_DIM, hashed_embedding
+
+try:
+    import litellm
+    HAS_LITELLM = True
+except ImportError:
+    HAS_LITELLM = False
+
+# Dimension of the hashed bag-of-words fallback embedding
+_HASHED_DIM = HASHED_EMBEDDING_DIM
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+@dataclass
+class PlanCacheMatch:
+    """A cached plan similar enough to the requested topic"""
+    key: str
+    topic: str
+    description: str
+    similarity: float
+    mode: str  # "reuse" or "adapt"
+    scene_outline: str
+    implementation_plans: Dict[int, str]
+
+
+class PlanCache:
+    """Embedding-indexed store of scene outlines and implementation plans with LRU eviction."""
+
+    def __init__(self,
+                 cache_dir: str = "data/plan_cache",
+                 embedding_model: Optional[str] = None,
+                 reuse_threshold: float = 0.97,
+                 adapt_threshold: float = 0.85,
+                 max_entries: int = 500):
+        """
+        Args:
+            cache_dir (str): Directory holding the index and cached plans
+            embedding_model (Optional[str]): LiteLLM embedding model; None uses a local hashed bag-of-words embedding
+            reuse_threshold (float): Similarity at or above which plans are reused as-is
+            adapt_threshold (float): Similarity at or above which plans are adapted instead of generated
+            max_entries (int): Maximum number of cached topics before least recently used ones are evicted
+        """
+        self.cache_dir = cache_dir
+        self.embedding_model = embedding_model if HAS_LITELLM else None
+        self.reuse_threshold = reuse_threshold
+        self.adapt_threshold = adapt_threshold
+        self.max_entries = max_entries
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.entries_dir = os.path.join(cache_dir, "entries")
+        self._lock = threading.Lock()
+        os.makedirs(self.entries_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    @property
+    def _embedding_name(self) -> str:
+        return self.embedding_model or f"hashed-bow-{_HASHED_DIM}"
+
+    def _load_index(self) -> Dict:
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+                if index.get("embedding") == self._embedding_name:
+                    return index
+                print(f"⚠️ Plan cache was built with {index.get('embedding')}, starting a new index")
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"⚠️ Could not read plan cache index: {e}")
+        return {
+            "embedding": self._embedding_name,
+            "entries": {},
+            "stats": {"lookups": 0, "reuse_hits": 0, "adapt_hits": 0, "misses": 0},
+        }
+
+    def _save_index(self) -> None:
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _hashed_embedding(self, text: str) -> List[float]:
+        return _normalize(hashed_embedding(text, _HASHED_DIM))
+
+    def _embed(self, topic: str, description: str) -> Tuple[str, List[float]]:
+        """
+        Embed a topic with the configured embedding, or the hashed one if that fails for this call.
+
+        Returns:
+            Tuple[str, List[float]]: Entry field the vector is comparable with ("embedding" or
+                "hashed_embedding") and the normalized vector
+        """
+        text = f"{topic}\n{description}"
+        if self.embedding_model:
+            try:
+                response = litellm.embedding(model=self.embedding_model, input=[text])
+                return "embedding", _normalize(list(response.data[0]["embedding"]))
+            except Exception as e:
+                print(f"⚠️ Plan cache embedding failed, falling back to hashed embedding: {e}")
+                return "hashed_embedding", self._hashed_embedding(text)
+        return "embedding", self._hashed_embedding(text)
+
+    @staticmethod
+    def _make_key(topic: str, description: str) -> str:
+        return hashlib.sha256(f"{topic}\n{description}".encode("utf-8")).hexdigest()[:16]
+
+    def lookup(self, topic: str, description: str) -> Optional[PlanCacheMatch]:
+        """
+        Find the most similar cached topic above the adapt threshold.
+
+        Args:
+            topic (str): Topic of the new video
+            description (str): Description of the new video
+
+        Returns:
+            Optional[PlanCacheMatch]: Best match, or None on a miss
+        """
+        field, embedding = self._embed(topic, description)
+        with self._lock:
+            stats = self._index["stats"]
+            stats["lookups"] += 1
+            best_key, best_similarity = None, -1.0
+            for key, entry in self._index["entries"].items():
+                if field not in entry:
+                    continue
+                similarity = sum(a * b for a, b in zip(embedding, entry[field]))
+                if similarity > best_similarity:
+                    best_key, best_similarity = key, similarity
+
+            if best_key is None or best_similarity < self.adapt_threshold:
+                stats["misses"] += 1
+                self._save_index()
+                return None
+
+            entry_path = os.path.join(self.entries_dir, f"{best_key}.json")
+            try:
+                with open(entry_path, "r", encoding="utf-8") as f:
+                    payload = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                # Index and entries got out of sync; forget the entry
+                del self._index["entries"][best_key]
+                stats["misses"] += 1
+                self._save_index()
+                return None
+
+            mode = "reuse" if best_similarity >= self.reuse_threshold else "adapt"
+            stats["reuse_hits" if mode == "reuse" else "adapt_hits"] += 1
+            entry = self._index["entries"][best_key]
+            entry["last_used"] = time.time()
+            entry["hits"] = entry.get("hits", 0) + 1
+            self._save_index()
+
+        print(f"🗂️ Plan cache {mode} hit for '{topic}': '{entry['topic']}' (similarity {best_similarity:.3f})")
+        return PlanCacheMatch(
+            key=best_key,
+            topic=entry["topic"],
+            description=entry["description"],
+            similarity=best_similarity,
+            mode=mode,
+            scene_outline=payload["scene_outline"],
+            implementation_plans={int(k): v for k, v in payload["implementation_plans"].items()},
+        )
+
+    def store(self, topic: str, description: str, scene_outline: str, implementation_plans: Dict[int, str]) -> None:
+        """
+        Add or replace the plans of a topic, evicting least recently used topics over capacity.
+
+        Args:
+            topic (str): Topic of the video
+            description (str): Description of the video
+            scene_outline (str): Scene outline
+            implementation_plans (Dict[int, str]): Implementation plan per scene number
+        """
+        if not scene_outline or not implementation_plans or any(p is None for p in implementation_plans.values()):
+            return
+        key = self._make_key(topic, description)
+        field, embedding = self._embed(topic, description)
+        with open(os.path.join(self.entries_dir, f"{key}.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "scene_outline": scene_outline,
+                "implementation_plans": {str(k): v for k, v in implementation_plans.items()},
+            }, f)
+
+        with self._lock:
+            now = time.time()
+            self._index["entries"][key] = {
+                "topic": topic,
+                "description": description,
+                field: embedding,
+                "created": now,
+                "last_used": now,
+                "hits": 0,
+            }
+            if self.embedding_model and field == "embedding":
+                # Lets lookups still match this entry when the embedding model is unavailable
+                self._index["entries"][key]["hashed_embedding"] = self._hashed_embedding(f"{topic}\n{description}")
+            entries = self._index["entries"]
+            while len(entries) > self.max_entries:
+                oldest = min(entries, key=lambda k: entries[k]["last_used"])
+                del entries[oldest]
+                try:
+                    os.remove(os.path.join(self.entries_dir, f"{oldest}.json"))
+                except OSError:
+                    pass
+            self._save_index()
+
+    def get_metrics(self) -> Dict[str, float]:
+        """
+        Return lookup counts and hit rates.
+
+        Returns:
+            Dict[str, float]: lookups, reuse_hits, adapt_hits, misses, hit_rate and entry count
+        """
+        with self._lock:
+            stats = dict(self._index["stats"])
+            stats["entries"] = len(self._index["entries"])
+        hits = stats["reuse_hits"] + stats["adapt_hits"]
+        stats["hit_rate"] = hits / stats["lookups"] if stats["lookups"] else 0.0
+        return stats
@@ -0,0 +1,192 @@
+"""
+Process-wide registry of read-only resources shared by every pipeline instance.
+
+The worker and API server build a new VideoGenerator per job, and each one
+used to glob and read the context-learning examples, plugin descriptions and
+model lists from disk again. The registry loads each resource once per
+process and reloads it only when the files it was built from change
+(by path, mtime or size). Calling ``preload_shared_resources`` at startup
+moves the loading off the first job.
+"""
+
+import glob
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+Watch = Union[Iterable[str], Callable[[], Iterable[str]]]
+
+
+def _file_signature(paths: Iterable[str]) -> Tuple:
+    """Identify the current version of a set of files by path, mtime and size."""
+    signature = []
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+class ResourceRegistry:
+    """Thread-safe cache of loaded resources, invalidated when their source files change.
+
+    Values are shared between all callers and must be treated as read-only.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Any, Tuple[Tuple, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+
+    def get(self, key: Any, loader: Callable[[], Any], watch: Watch = ()) -> Any:
+        """Return the cached resource for ``key``, loading it if missing or stale.
+
+        Args:
+            key: Hashable identifier of the resource
+            loader (Callable[[], Any]): Builds the resource from disk
+            watch: Files the resource is built from, or a callable listing them
+                (so files added to a directory are noticed too)
+
+        Returns:
+            Any: The shared resource value
+        """
+        signature = _file_signature(watch() if callable(watch) else watch)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                return entry[1]
+
+        # Load outside the lock; concurrent first loads of the same key are harmless
+        value = loader()
+        with self._lock:
+            self._entries[key] = (signature, value)
+            self.loads += 1
+        return value
+
+    def invalidate(self, key: Any = None) -> None:
+        """Drop one resource, or every resource when ``key`` is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def get_metrics(self) -> Dict[str, int]:
+        """Return cache statistics."""
+        with self._lock:
+            return {"resources": len(self._entries), "hits": self.hits, "loads": self.loads}
+
+
+_registry = ResourceRegistry()
+
+
+def get_registry() -> ResourceRegistry:
+    """Return the process-wide resource registry."""
+    return _registry
+
+
+def find_context_example_files(context_learning_path: str, pattern: str) -> List[str]:
+    """List example files matching ``pattern`` anywhere under ``context_learning_path``."""
+    files = set()
+    for root, _, _ in os.walk(context_learning_path):
+        files.update(glob.glob(os.path.join(root, pattern)))
+    return sorted(files)
+
+
+def get_context_examples(context_learning_path: str, pattern: str) -> Tuple[str, ...]:
+    """Return the context-learning examples matching ``pattern``, each prefixed with its file name.
+
+    Args:
+        context_learning_path (str): Root directory of the context-learning examples
+        pattern (str): File pattern such as '*_scene_plan.txt' or '*.py'
+
+    Returns:
+        Tuple[str, ...]: Examples in file path order
+    """
+    def load() -> Tuple[str, ...]:
+        examples = []
+        for example_file in find_context_example_files(context_learning_path, pattern):
+            with open(example_file, 'r') as f:
+                examples.append(f"# Example from {os.path.basename(example_file)}\n{f.read()}\n")
+        return tuple(examples)
+
+    return _registry.get(
+        ("context_examples", os.path.abspath(context_learning_path), pattern),
+        load,
+        watch=lambda: find_context_example_files(context_learning_path, pattern)
+    )
+
+
+def get_json_resource(path: str, default: Any = None) -> Any:
+    """Return the parsed contents of a JSON file, or ``default`` if it does not exist.
+
+    Args:
+        path (str): Path to the JSON file
+        default (Any, optional): Value returned while the file is missing. Defaults to None.
+
+    Returns:
+        Any: Parsed JSON
+    """
+    def load() -> Any:
+        if not os.path.exists(path):
+            return default
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    return _registry.get(("json", os.path.abspath(path)), load, watch=[path])
+
+
+def get_plugin_descriptions(manim_docs_path: str) -> list:
+    """Return the plugin descriptions from ``plugin_docs/plugins.json``, or an empty list."""
+    return get_json_resource(os.path.join(manim_docs_path, "plugin_docs", "plugins.json"), default=[])
+
+
+def get_banned_reasonings() -> List[str]:
+    """Return the banned reasoning patterns, built once per process."""
+    from task_generator import get_banned_reasonings as build_banned_reasonings
+    return _registry.get("banned_reasonings", build_banned_reasonings)
+
+
+# Example patterns preloaded for VideoPlanner and CodeGenerator
+CONTEXT_EXAMPLE_PATTERNS = (
+    '*_scene_plan.txt',
+    '*_scene_vision_storyboard.txt',
+    '*_technical_implementation.txt',
+    '*_scene_animation_narration.txt',
+    '*.py',
+)
+
+
+def preload_shared_resources(context_learning_path: Optional[str] = None,
+                             manim_docs_path: Optional[str] = None,
+                             allowed_models_path: Optional[str] = None) -> Dict[str, int]:
+    """Load every shared resource up front, so the first job does not pay for it.
+
+    Args:
+        context_learning_path (str, optional): Context-learning root. Defaults to Config.CONTEXT_LEARNING_PATH.
+        manim_docs_path (str, optional): Manim docs root. Defaults to Config.MANIM_DOCS_PATH.
+        allowed_models_path (str, optional): Path to allowed_models.json. Defaults to src/utils/allowed_models.json.
+
+    Returns:
+        Dict[str, int]: Registry metrics after preloading
+    """
+    from src.config.config import Config
+    context_learning_path = context_learning_path or Config.CONTEXT_LEARNING_PATH
+    manim_docs_path = manim_docs_path or Config.MANIM_DOCS_PATH
+    allowed_models_path = allowed_models_path or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "utils", "allowed_models.json")
+
+    for pattern in CONTEXT_EXAMPLE_PATTERNS:
+        get_context_examples(context_learning_path, pattern)
+    get_plugin_descriptions(manim_docs_path)
+    get_json_resource(allowed_models_path, default={})
+    get_banned_reasonings()
+
+    metrics = _registry.get_metrics()
+    print(f"📦 Preloaded {metrics['resources']} shared resources")
+    return metrics
@@ -0,0 +1,200 @@
+"""
+Process-wide scheduler for LLM and render slots.
+
+Batch runs nest topic concurrency inside scene concurrency, so without a
+global limit the number of simultaneous LLM calls and manim renders grows
+with their product. The scheduler owns one slot pool per resource; waiters
+are served by priority, favouring topics with the least remaining work so
+that the first videos finish as early as possible.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from src.config.config import Config
+
+# Priority of work whose topic has not reported its remaining work yet (served last)
+_UNKNOWN_TOPIC_PRIORITY = float("inf")
+
+
+class ResourcePool:
+    """Priority-ordered slot pool with queue-depth and utilization accounting.
+
+    Lower priority values are served first; equal priorities are served in arrival order.
+    """
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.in_use = 0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._started = time.monotonic()
+        self._last_change = self._started
+        self._busy_time = 0.0
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.max_queue_depth = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def _account(self) -> None:
+        now = time.monotonic()
+        self._busy_time += self.in_use * (now - self._last_change)
+        self._last_change = now
+
+    async def acquire(self, priority: float = 0) -> None:
+        """
+        Wait for a free slot.
+
+        Args:
+            priority (float): Lower values are served first
+        """
+        start = time.monotonic()
+        if self.in_use < self.capacity and self.queue_depth == 0:
+            self._account()
+            self.in_use += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # The slot was handed over just before cancellation; pass it on
+                    self.release()
+                raise
+        self.acquired += 1
+        self.total_wait += time.monotonic() - start
+
+    def release(self) -> None:
+        """Hand the slot to the highest-priority waiter, or free it."""
+        self._account()
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_use -= 1
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Snapshot of the pool's load.
+
+        Returns:
+            Dict[str, float]: capacity, in_use, queue_depth, max_queue_depth, acquired, avg_wait and utilization
+        """
+        self._account()
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        return {
+            "capacity": self.capacity,
+            "in_use": self.in_use,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "acquired": self.acquired,
+            "avg_wait": self.total_wait / self.acquired if self.acquired else 0.0,
+            "utilization": self._busy_time / (self.capacity * elapsed),
+        }
+
+
+class GlobalScheduler:
+    """Global LLM and render slot pools shared by all topics in the process."""
+
+    def __init__(self, max_llm_concurrency: int, max_render_concurrency: int):
+        """
+        Args:
+            max_llm_concurrency (int): Maximum simultaneous LLM-bound steps across all topics
+            max_render_concurrency (int): Maximum simultaneous manim renders across all topics
+        """
+        self.pools = {
+            "llm": ResourcePool("llm", max_llm_concurrency),
+            "render": ResourcePool("render", max_render_concurrency),
+        }
+        self._remaining_work: Dict[str, int] = {}
+
+    def set_remaining_work(self, topic: str, remaining: int) -> None:
+        """
+        Record how many steps a topic still needs (e.g. scenes left to plan plus scenes left to render).
+
+        Args:
+            topic (str): Topic name
+            remaining (int): Outstanding steps
+        """
+        self._remaining_work[topic] = max(0, remaining)
+
+    def complete_work(self, topic: str, steps: int = 1) -> None:
+        """Mark steps of a topic as done, raising its priority."""
+        if topic in self._remaining_work:
+            self._remaining_work[topic] = max(0, self._remaining_work[topic] - steps)
+
+    def finish_topic(self, topic: str) -> None:
+        """Forget a finished (or failed) topic."""
+        self._remaining_work.pop(topic, None)
+
+    def priority(self, topic: Optional[str]) -> float:
+        """Topics closest to completion get the lowest (most urgent) priority value."""
+        return self._remaining_work.get(topic, _UNKNOWN_TOPIC_PRIORITY)
+
+    @asynccontextmanager
+    async def slot(self, resource: str, topic: Optional[str] = None):
+        """
+        Hold one slot of a resource for the duration of the block.
+
+        Args:
+            resource (str): "llm" or "render"
+            topic (Optional[str]): Topic the work belongs to, used for prioritisation
+        """
+        pool = self.pools[resource]
+        await pool.acquire(self.priority(topic))
+        try:
+            yield
+        finally:
+            pool.release()
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """Return per-resource queue depth and utilization statistics."""
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+    def print_report(self) -> None:
+        """Print per-resource queue depth and utilization."""
+        print("\n⏱️ Scheduler resource usage:")
+        for name, stats in self.report().items():
+            print(f"  {name:<7} capacity={stats['capacity']:<3} acquired={stats['acquired']:<5} "
+                  f"utilization={stats['utilization']:.0%} avg_wait={stats['avg_wait']:.2f}s "
+                  f"max_queue={stats['max_queue_depth']} queued_now={stats['queue_depth']}")
+
+
+_scheduler: Optional[GlobalScheduler] = None
+
+
+def configure_scheduler(max_llm_concurrency: Optional[int] = None, max_render_concurrency: Optional[int] = None) -> GlobalScheduler:
+    """
+    Create the process-wide scheduler with the given limits.
+
+    Args:
+        max_llm_concurrency (Optional[int]): Global LLM slot count, defaults to Config.MAX_LLM_CONCURRENCY
+        max_render_concurrency (Optional[int]): Global render slot count, defaults to Config.MAX_RENDER_CONCURRENCY
+
+    Returns:
+        GlobalScheduler: The configured scheduler
+    """
+    global _scheduler
+    _scheduler = GlobalScheduler(
+        Config.MAX_LLM_CONCURRENCY if max_llm_concurrency is None else max_llm_concurrency,
+        Config.MAX_RENDER_CONCURRENCY if max_render_concurrency is None else max_render_concurrency
+    )
+    return _scheduler
+
+
+def get_scheduler() -> GlobalScheduler:
+    """Return the process-wide scheduler, creating it with default limits on first use."""
+    if _scheduler is None:
+        return configure_scheduler()
+    return _scheduler
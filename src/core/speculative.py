@@ -0,0 +1,231 @@
+"""
+Speculative best-of-N code generation.
+
+The serial generate -> render -> fix loop puts every failed first attempt on
+the critical path of a scene. In speculative mode several candidate
+implementations are generated concurrently (with varied temperature and
+prompt emphasis), pre-flighted and validation-rendered in parallel, and the
+first candidate that renders wins while the others are cancelled.
+
+How many candidates to spend on a scene is decided from measured first-try
+success rates per difficulty level: easy datasets that usually render on the
+first try get a single candidate, hard ones get more.
+"""
+
+import ast
+import asyncio
+import copy
+import json
+import math
+import os
+import re
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from mllm_tools.single_flight import unwrap_model
+
+DEFAULT_DIFFICULTY = "default"
+
+# (temperature offset, prompt hint) per candidate; candidate 0 is the unmodified request
+CANDIDATE_VARIANTS = [
+    (0.0, None),
+    (0.2, "Candidate note: prefer the simplest Manim constructs that satisfy the plan; "
+          "avoid rarely used APIs, plugins and custom updaters."),
+    (0.1, "Candidate note: be defensive about layout; keep every mobject inside the frame "
+          "and use explicit positioning helpers instead of hard-coded coordinates."),
+    (0.3, "Candidate note: favour robustness over visual flourish; only use Manim Community "
+          "APIs you are certain exist in the installed version."),
+]
+
+
+def infer_difficulty(source: Optional[str]) -> str:
+    """
+    Derive a difficulty level from a dataset path or label such as ``data/thb_hard/math.json``.
+
+    Args:
+        source (Optional[str]): Dataset path or explicit difficulty label
+
+    Returns:
+        str: "easy", "medium", "hard" or the default level
+    """
+    if not source:
+        return DEFAULT_DIFFICULTY
+    match = re.search(r"(easy|medium|hard)", source.lower())
+    return match.group(1) if match else DEFAULT_DIFFICULTY
+
+
+def preflight_code(code: str) -> Optional[str]:
+    """
+    Cheap checks run before spending a render slot on a candidate.
+
+    Args:
+        code (str): Generated Manim code
+
+    Returns:
+        Optional[str]: Error message, or None when the candidate is worth rendering
+    """
+    if not code or not code.strip():
+        return "Empty code"
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return f"SyntaxError: {e.msg} (line {e.lineno})"
+    has_scene = any(
+        isinstance(node, ast.ClassDef) and any("Scene" in ast.unparse(base) for base in node.bases)
+        for node in ast.walk(tree)
+    )
+    if not has_scene:
+        return "No Scene subclass found in generated code"
+    return None
+
+
+def make_candidate_model(model, temperature_offset: float):
+    """
+    Copy a model wrapper with a shifted sampling temperature.
+
+    Wrappers that bake the temperature into their client at construction time
+    (Gemini, Vertex AI) keep their original temperature; the prompt hint is what
+    differentiates their candidates.
+
+    Args:
+        model: Model wrapper, optionally behind a coalescing proxy
+        temperature_offset (float): Amount added to the wrapper's temperature
+
+    Returns:
+        Model wrapper to use for the candidate
+    """
+    if not temperature_offset:
+        return model
+    variant = copy.copy(unwrap_model(model))
+    temperature = getattr(variant, "temperature", None)
+    if temperature is not None:
+        variant.temperature = min(1.0, temperature + temperature_offset)
+    return variant
+
+
+class SpeculationPolicy:
+    """Tracks first-try render success per difficulty level and sizes speculative batches."""
+
+    def __init__(self,
+                 stats_path: str = os.path.join("data", "speculation_stats.json"),
+                 max_candidates: int = 3,
+                 target_success: float = 0.9,
+                 min_samples: int = 5):
+        """
+        Args:
+            stats_path (str): JSON file the success statistics are persisted to
+            max_candidates (int): Upper bound on candidates per scene
+            target_success (float): Desired probability that at least one candidate renders
+            min_samples (int): Attempts needed at a difficulty level before trusting its success rate
+        """
+        self.stats_path = stats_path
+        self.max_candidates = max(1, min(max_candidates, len(CANDIDATE_VARIANTS)))
+        self.target_success = target_success
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._stats = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, int]]:
+        if os.path.exists(self.stats_path):
+            try:
+                with open(self.stats_path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"⚠️ Could not read speculation stats: {e}")
+        return {}
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.stats_path) or ".", exist_ok=True)
+        tmp_path = self.stats_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._stats, f, indent=2)
+        os.replace(tmp_path, self.stats_path)
+
+    def success_rate(self, difficulty: str) -> float:
+        """Laplace-smoothed first-try success rate of a difficulty level."""
+        with self._lock:
+            stats = self._stats.get(difficulty, {})
+            attempts, successes = stats.get("attempts", 0), stats.get("successes", 0)
+        return (successes + 1) / (attempts + 2)
+
+    def num_candidates(self, difficulty: str) -> int:
+        """
+        Smallest number of candidates whose combined success chance reaches the target.
+
+        Args:
+            difficulty (str): Difficulty level of the topic
+
+        Returns:
+            int: Candidates to generate, between 1 and max_candidates
+        """
+        with self._lock:
+            attempts = self._stats.get(difficulty, {}).get("attempts", 0)
+        if attempts < self.min_samples:
+            return self.max_candidates
+        rate = self.success_rate(difficulty)
+        if rate >= self.target_success:
+            return 1
+        needed = math.ceil(math.log(1 - self.target_success) / math.log(1 - rate))
+        return max(1, min(self.max_candidates, needed))
+
+    def record(self, difficulty: str, success: bool) -> None:
+        """
+        Record the outcome of one first-try render.
+
+        Args:
+            difficulty (str): Difficulty level of the topic
+            success (bool): Whether the candidate rendered without errors
+        """
+        with self._lock:
+            stats = self._stats.setdefault(difficulty, {"attempts": 0, "successes": 0})
+            stats["attempts"] += 1
+            stats["successes"] += int(success)
+            self._save()
+
+    def get_metrics(self) -> Dict[str, Dict[str, float]]:
+        """Return attempts, successes, smoothed success rate and chosen batch size per difficulty."""
+        with self._lock:
+            levels = {level: dict(stats) for level, stats in self._stats.items()}
+        for level, stats in levels.items():
+            stats["success_rate"] = self.success_rate(level)
+            stats["candidates"] = self.num_candidates(level)
+        return levels
+
+
+async def race_candidates(
+        candidates: List[Callable[[], Awaitable[Tuple[str, Optional[str]]]]]
+) -> Tuple[Optional[int], Dict[int, Tuple[str, Optional[str]]]]:
+    """
+    Run candidate coroutines concurrently and stop at the first success.
+
+    Each candidate returns ``(code, error)`` where ``error`` is None on success.
+    Once one succeeds, every candidate still running is cancelled.
+
+    Args:
+        candidates: Zero-argument coroutine functions, one per candidate
+
+    Returns:
+        Tuple of the winning candidate index (None if all failed) and the results of
+        every candidate that finished, keyed by index
+    """
+    tasks = {asyncio.ensure_future(candidate()): index for index, candidate in enumerate(candidates)}
+    results: Dict[int, Tuple[str, Optional[str]]] = {}
+    winner = None
+    pending = set(tasks)
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=lambda t: tasks[t]):
+                index = tasks[task]
+                try:
+                    results[index] = task.result()
+                except Exception as e:
+                    results[index] = ("", f"Candidate failed: {e}")
+                if winner is None and results[index][1] is None:
+                    winner = index
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    return winner, results
@@ -3,10 +3,12 @@ import re
 import json
 import glob
 import math
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Tuple
 import uuid
 import asyncio
+from contextlib import nullcontext
 
+from mllm_tools.single_flight import unwrap_model
 from mllm_tools.utils import _prepare_text_inputs
 from src.utils.utils import extract_xml, extract_xml_tag
 from task_generator import (
@@ -18,10 +20,15 @@ from task_generator import (
     get_prompt_context_learning_vision_storyboard,
     get_prompt_context_learning_technical_implementation,
     get_prompt_context_learning_animation_narration,
-    get_prompt_context_learning_code
+    get_prompt_context_learning_code,
+    get_prompt_adapt_plan
 )
 from src.rag.rag_integration import RAGIntegration
 from src.config.config import Config
+from src.core.resource_registry import get_context_examples
+
+# A complete scene block of the outline; the number in the closing tag must match the opening one
+_SCENE_BLOCK_PATTERN = re.compile(r'<SCENE_(\d+)>(.*?)</SCENE_\1>', re.DOTALL)
 
 class VideoPlanner:
     """A class for planning and generating video content.
@@ -42,12 +49,14 @@ class VideoPlanner:
         manim_docs_path (str): Path to Manim docs. Defaults to "data/rag/manim_docs"
         embedding_model (str): Name of embedding model. Defaults to "text-embedding-ada-002"
         use_langfuse (bool): Whether to use Langfuse logging. Defaults to True
+        scheduler: Optional GlobalScheduler limiting concurrent LLM calls across topics
     """
 
-    def __init__(self, planner_model, helper_model=None, output_dir="output", print_response=True, use_context_learning=None, context_learning_path="data/context_learning", use_rag=None, session_id=None, chroma_db_path="data/rag/chroma_db", manim_docs_path="data/rag/manim_docs", embedding_model="text-embedding-ada-002", use_langfuse=True):
+    def __init__(self, planner_model, helper_model=None, output_dir="output", print_response=True, use_context_learning=None, context_learning_path="data/context_learning", use_rag=None, session_id=None, chroma_db_path="data/rag/chroma_db", manim_docs_path="data/rag/manim_docs", embedding_model="text-embedding-ada-002", use_langfuse=True, scheduler=None):
         self.planner_model = planner_model
         self.helper_model = helper_model if helper_model is not None else planner_model
         self.output_dir = output_dir
+        self.scheduler = scheduler
         self.print_response = print_response
         # Resolve feature toggles
         self.use_context_learning = Config.USE_CONTEXT_LEARNING if use_context_learning is None else use_context_learning
@@ -88,8 +97,6 @@ class VideoPlanner:
         Returns:
             str: Formatted string containing the loaded examples, or None if no examples found
         """
-        examples = []
-        
         # Define file patterns for different types
         file_patterns = {
             'scene_plan': '*_scene_plan.txt',
@@ -103,15 +110,8 @@ class VideoPlanner:
         if not pattern:
             return None
 
-        # Search in subdirectories of context_learning_path
-        for root, _, _ in os.walk(self.context_learning_path):
-            for example_file in glob.glob(os.path.join(root, pattern)):
-                with open(example_file, 'r') as f:
-                    content = f.read()
-                    if example_type == 'code':
-                        examples.append(f"# Example from {os.path.basename(example_file)}\n{content}\n")
-                    else:
-                        examples.append(f"# Example from {os.path.basename(example_file)}\n{content}\n")
+        # Search in subdirectories of context_learning_path, read once per process
+        examples = list(get_context_examples(self.context_learning_path, pattern))
 
         # Format examples using appropriate template
         if examples:
@@ -142,19 +142,15 @@ class VideoPlanner:
             return template(examples="\n".join(examples))
         return None
 
-    def generate_scene_outline(self,
-                            topic: str,
-                            description: str,
-                            session_id: str) -> str:
-        """Generate a scene outline based on the topic and description.
+    def _build_scene_outline_prompt(self, topic: str, description: str) -> str:
+        """Detect relevant plugins and build the scene outline prompt.
 
         Args:
             topic (str): The topic of the video
             description (str): Description of the video content
-            session_id (str): Session identifier
 
         Returns:
-            str: Generated scene outline
+            str: Scene outline prompt
         """
         # Detect relevant plugins upfront if RAG is enabled
         if self.use_rag:
@@ -166,21 +162,18 @@ class VideoPlanner:
         
         if self.use_context_learning and self.scene_plan_examples:
             prompt += f"\n\nHere are some example scene plans for reference:\n{self.scene_plan_examples}"
+        return prompt
 
-        # Generate plan using planner model
-        try:
-            response_text = self.planner_model(
-                _prepare_text_inputs(prompt),
-                metadata={"generation_name": "scene_outline", "tags": [topic, "scene-outline"], "session_id": session_id}
-            )
-            if response_text is None:
-                raise ValueError("Planner model returned None for scene outline generation")
-        except Exception as e:
-            print(f"Error in planner_model call for scene outline: {e}")
-            print(f"Planner model type: {type(self.planner_model)}")
-            print(f"Planner model: {self.planner_model}")
-            raise
-        
+    def _save_scene_outline(self, topic: str, response_text: str) -> str:
+        """Extract the scene outline from a planner response and save it.
+
+        Args:
+            topic (str): The topic of the video
+            response_text (str): Raw planner response
+
+        Returns:
+            str: Extracted scene outline
+        """
         # Extract scene outline <SCENE_OUTLINE> ... </SCENE_OUTLINE>
         scene_outline = extract_xml_tag(response_text, "SCENE_OUTLINE")
         if not scene_outline:
@@ -204,6 +197,135 @@ class VideoPlanner:
 
         return scene_outline
 
+    def generate_scene_outline(self,
+                            topic: str,
+                            description: str,
+                            session_id: str) -> str:
+        """Generate a scene outline based on the topic and description.
+
+        Args:
+            topic (str): The topic of the video
+            description (str): Description of the video content
+            session_id (str): Session identifier
+
+        Returns:
+            str: Generated scene outline
+        """
+        prompt = self._build_scene_outline_prompt(topic, description)
+
+        # Generate plan using planner model
+        try:
+            response_text = self.planner_model(
+                _prepare_text_inputs(prompt),
+                metadata={"generation_name": "scene_outline", "tags": [topic, "scene-outline"], "session_id": session_id}
+            )
+            if response_text is None:
+                raise ValueError("Planner model returned None for scene outline generation")
+        except Exception as e:
+            print(f"Error in planner_model call for scene outline: {e}")
+            print(f"Planner model type: {type(self.planner_model)}")
+            print(f"Planner model: {self.planner_model}")
+            raise
+        
+        return self._save_scene_outline(topic, response_text)
+
+    async def stream_scene_outline(self,
+                                   topic: str,
+                                   description: str,
+                                   session_id: str) -> AsyncIterator[Tuple[Optional[int], str]]:
+        """Generate a scene outline while yielding each scene as soon as its closing tag is streamed.
+
+        Yields ``(scene_number, scene_text)`` for every ``<SCENE_k>...</SCENE_k>`` block in the
+        order the model closes them. The final item is ``(None, scene_outline)`` carrying the
+        complete, saved outline, exactly as returned by generate_scene_outline.
+
+        Args:
+            topic (str): The topic of the video
+            description (str): Description of the video content
+            session_id (str): Session identifier
+
+        Yields:
+            Tuple[Optional[int], str]: Scene number and scene block, then None and the full outline
+        """
+        prompt = await asyncio.to_thread(self._build_scene_outline_prompt, topic, description)
+        loop = asyncio.get_running_loop()
+        scenes: asyncio.Queue = asyncio.Queue()
+        emitted = set()
+        scan_from = 0
+        done = object()
+
+        def observe(text: str) -> bool:
+            # Runs in the model's worker thread on every streamed chunk; never asks the stream to stop
+            nonlocal scan_from
+            for match in _SCENE_BLOCK_PATTERN.finditer(text, scan_from):
+                scan_from = match.end()
+                scene_number = int(match.group(1))
+                if scene_number not in emitted:
+                    emitted.add(scene_number)
+                    loop.call_soon_threadsafe(scenes.put_nowait, (scene_number, match.group(2)))
+            return False
+
+        # Bypass request coalescing: a coalesced follower would never see its own chunks
+        call = asyncio.ensure_future(asyncio.to_thread(
+            unwrap_model(self.planner_model),
+            _prepare_text_inputs(prompt),
+            metadata={"generation_name": "scene_outline", "tags": [topic, "scene-outline"], "session_id": session_id},
+            stop_predicate=observe
+        ))
+        call.add_done_callback(lambda _: scenes.put_nowait(done))
+        while True:
+            item = await scenes.get()
+            if item is done:
+                break
+            yield item
+
+        response_text = await call
+        if response_text is None:
+            raise ValueError("Planner model returned None for scene outline generation")
+        scene_outline = self._save_scene_outline(topic, response_text)
+        # Wrappers that cannot stream only report the text at the end
+        for match in _SCENE_BLOCK_PATTERN.finditer(scene_outline):
+            if int(match.group(1)) not in emitted:
+                emitted.add(int(match.group(1)))
+                yield int(match.group(1)), match.group(2)
+        yield None, scene_outline
+
+    def _llm_slot(self, topic: str):
+        """Global LLM slot for a planning call, or a no-op when no scheduler is configured."""
+        return self.scheduler.slot("llm", topic) if self.scheduler else nullcontext()
+
+    async def _retrieve_stage_docs(self, generate_queries, scene_trace_id: str, topic: str, scene_number: int, session_id: str, **stage_inputs) -> str:
+        """Generate RAG queries for a planning stage and retrieve the matching documentation.
+
+        Args:
+            generate_queries: RAGIntegration query generator for the stage
+            scene_trace_id (str): Unique trace ID for this scene
+            topic (str): The topic of the video
+            scene_number (int): Scene number
+            session_id (str): Session identifier
+            **stage_inputs: Stage-specific inputs of the query generator (scene plan or storyboard)
+
+        Returns:
+            str: Retrieved documentation
+        """
+        async with self._llm_slot(topic):
+            rag_queries = await asyncio.to_thread(
+                generate_queries,
+                scene_trace_id=scene_trace_id,
+                topic=topic,
+                scene_number=scene_number,
+                session_id=session_id,
+                relevant_plugins=self.relevant_plugins or [],  # Use self.relevant_plugins directly
+                **stage_inputs
+            )
+        return await asyncio.to_thread(
+            self.rag_integration.get_relevant_docs,
+            rag_queries=rag_queries,
+            scene_trace_id=scene_trace_id,
+            topic=topic,
+            scene_number=scene_number
+        )
+
     async def _generate_scene_implementation_single(self, topic: str, description: str, scene_outline_i: str, i: int, file_prefix: str, session_id: str, scene_trace_id: str) -> str:
         """Generate implementation plan for a single scene.
 
@@ -245,31 +367,25 @@ class VideoPlanner:
             # relevant_plugins = self.relevant_plugins # Removed redundant variable
             # print(f"Using detected plugins: {relevant_plugins}") # Removed redundant print
 
-            # Generate RAG queries
-            rag_queries = self.rag_integration._generate_rag_queries_storyboard(
-                scene_plan=scene_outline_i,
+            retrieved_docs = await self._retrieve_stage_docs(
+                self.rag_integration._generate_rag_queries_storyboard,
                 scene_trace_id=scene_trace_id,
                 topic=topic,
                 scene_number=i,
                 session_id=session_id,
-                relevant_plugins=self.relevant_plugins or [] # Use self.relevant_plugins directly
-            )
-
-            retrieved_docs = self.rag_integration.get_relevant_docs(
-                rag_queries=rag_queries,
-                scene_trace_id=scene_trace_id,
-                topic=topic,
-                scene_number=i
+                scene_plan=scene_outline_i
             )
             
             # Add documentation to prompt
             prompt_vision_storyboard += f"\n\n{retrieved_docs}"
 
         try:
-            vision_storyboard_plan = self.planner_model(
-                _prepare_text_inputs(prompt_vision_storyboard),
-                metadata={"generation_name": "scene_vision_storyboard", "trace_id": scene_trace_id, "tags": [topic, f"scene{i}"], "session_id": session_id}
-            )
+            async with self._llm_slot(topic):
+                vision_storyboard_plan = await asyncio.to_thread(
+                    self.planner_model,
+                    _prepare_text_inputs(prompt_vision_storyboard),
+                    metadata={"generation_name": "scene_vision_storyboard", "trace_id": scene_trace_id, "tags": [topic, f"scene{i}"], "session_id": session_id}
+                )
             if vision_storyboard_plan is None:
                 raise ValueError(f"Planner model returned None for scene {i} vision storyboard generation")
         except Exception as e:
@@ -287,6 +403,27 @@ class VideoPlanner:
             f.write(vision_storyboard_plan)
         print(f"Scene {i} Vision and Storyboard Plan saved to {storyboard_plan_path}")
 
+        # Retrieval for both remaining stages only needs the storyboard, so start it now and let the
+        # narration retrieval run while the technical plan is being generated
+        technical_docs_task = narration_docs_task = None
+        if self.rag_integration:
+            technical_docs_task = asyncio.create_task(self._retrieve_stage_docs(
+                self.rag_integration._generate_rag_queries_technical,
+                scene_trace_id=scene_trace_id,
+                topic=topic,
+                scene_number=i,
+                session_id=session_id,
+                storyboard=vision_storyboard_plan
+            ))
+            narration_docs_task = asyncio.create_task(self._retrieve_stage_docs(
+                self.rag_integration._generate_rag_queries_narration,
+                scene_trace_id=scene_trace_id,
+                topic=topic,
+                scene_number=i,
+                session_id=session_id,
+                storyboard=vision_storyboard_plan
+            ))
+
         # ===== Step 2: Generate Technical Implementation Plan =====
         # =========================================================
         prompt_technical_implementation = get_prompt_scene_technical_implementation(i, topic, description, scene_outline_i, vision_storyboard_plan, self.relevant_plugins or [])
@@ -295,41 +432,26 @@ class VideoPlanner:
         if self.use_context_learning and self.technical_implementation_examples:
             prompt_technical_implementation += f"\n\nHere are some example technical implementations:\n{self.technical_implementation_examples}"
 
-        if self.rag_integration:
-            # Use the already detected plugins instead of detecting again
-            # relevant_plugins = self.relevant_plugins # Removed redundant variable
-            # print(f"Using detected plugins: {relevant_plugins}") # Removed redundant print
-
-            # Generate RAG queries
-            rag_queries = self.rag_integration._generate_rag_queries_technical(
-                storyboard=vision_storyboard_plan,
-                scene_trace_id=scene_trace_id,
-                topic=topic,
-                scene_number=i,
-                session_id=session_id,
-                relevant_plugins=self.relevant_plugins or [] # Use self.relevant_plugins directly
-            )
-
-            retrieved_docs = self.rag_integration.get_relevant_docs(
-                rag_queries=rag_queries,
-                scene_trace_id=scene_trace_id,
-                topic=topic,
-                scene_number=i
-            )
+        if technical_docs_task:
+            retrieved_docs = await technical_docs_task
 
             # Add documentation to prompt
             prompt_technical_implementation += f"\n\n{retrieved_docs}"
 
         try:
-            technical_implementation_plan = self.planner_model(
-                _prepare_text_inputs(prompt_technical_implementation),
-                metadata={"generation_name": "scene_technical_implementation", "trace_id": scene_trace_id, "tags": [topic, f"scene{i}"], "session_id": session_id}
-            )
+            async with self._llm_slot(topic):
+                technical_implementation_plan = await asyncio.to_thread(
+                    self.planner_model,
+                    _prepare_text_inputs(prompt_technical_implementation),
+                    metadata={"generation_name": "scene_technical_implementation", "trace_id": scene_trace_id, "tags": [topic, f"scene{i}"], "session_id": session_id}
+                )
             if technical_implementation_plan is None:
                 raise ValueError(f"Planner model returned None for scene {i} technical implementation generation")
         except Exception as e:
             print(f"Error in planner_model call for scene {i} technical implementation: {e}")
             print(f"Planner model type: {type(self.planner_model)}")
+            if narration_docs_task:
+                narration_docs_task.cancel()
             raise
         # extract technical implementation plan <SCENE_TECHNICAL_IMPLEMENTATION_PLAN> ... </SCENE_TECHNICAL_IMPLEMENTATION_PLAN>
         technical_match = re.search(r'(<SCENE_TECHNICAL_IMPLEMENTATION_PLAN>.*?</SCENE_TECHNICAL_IMPLEMENTATION_PLAN>)', technical_implementation_plan, re.DOTALL)
@@ -349,28 +471,17 @@ class VideoPlanner:
         if self.use_context_learning and self.animation_narration_examples:
             prompt_animation_narration += f"\n\nHere are some example animation and narration plans:\n{self.animation_narration_examples}"
         
-        if self.rag_integration:
-            rag_queries = self.rag_integration._generate_rag_queries_narration(
-                storyboard=vision_storyboard_plan,
-                scene_trace_id=scene_trace_id,
-                topic=topic,
-                scene_number=i,
-                session_id=session_id,
-                relevant_plugins=self.relevant_plugins or [] # Use self.relevant_plugins directly
-            )
-            retrieved_docs = self.rag_integration.get_relevant_docs(
-                rag_queries=rag_queries,
-                scene_trace_id=scene_trace_id,
-                topic=topic,
-                scene_number=i
-            )
+        if narration_docs_task:
+            retrieved_docs = await narration_docs_task
             prompt_animation_narration += f"\n\n{retrieved_docs}"
 
         try:
-            animation_narration_plan = self.planner_model(
-                _prepare_text_inputs(prompt_animation_narration),
-                metadata={"generation_name": "scene_animation_narration", "trace_id": scene_trace_id, "tags": [topic, f"scene{i}"], "session_id": session_id}
-            )
+            async with self._llm_slot(topic):
+                animation_narration_plan = await asyncio.to_thread(
+                    self.planner_model,
+                    _prepare_text_inputs(prompt_animation_narration),
+                    metadata={"generation_name": "scene_animation_narration", "trace_id": scene_trace_id, "tags": [topic, f"scene{i}"], "session_id": session_id}
+                )
             if animation_narration_plan is None:
                 raise ValueError(f"Planner model returned None for scene {i} animation narration generation")
         except Exception as e:
@@ -389,9 +500,33 @@ class VideoPlanner:
 
         # ===== Step 4: Save Implementation Plan =====
         # ==========================================
-        # save the overall implementation plan to file
+        self.save_implementation_plan(file_prefix, i, implementation_plan)
+
+        return implementation_plan
+
+    def implementation_plan_path(self, file_prefix: str, i: int) -> str:
+        """Path the overall implementation plan of a scene is saved to.
+
+        Args:
+            file_prefix (str): Prefix for output files
+            i (int): Scene number
+
+        Returns:
+            str: Plan file path
+        """
         file_prefix = re.sub(r'[^a-z0-9_]+', '_', file_prefix)
-        plan_path = os.path.join(self.output_dir, file_prefix, f"scene{i}", "implementation_plan.txt")
+        return os.path.join(self.output_dir, file_prefix, f"scene{i}", "implementation_plan.txt")
+
+    def save_implementation_plan(self, file_prefix: str, i: int, implementation_plan: str) -> None:
+        """Save the overall implementation plan of a scene.
+
+        Args:
+            file_prefix (str): Prefix for output files
+            i (int): Scene number
+            implementation_plan (str): Combined implementation plan
+        """
+        plan_path = self.implementation_plan_path(file_prefix, i)
+        os.makedirs(os.path.dirname(plan_path), exist_ok=True)
 
         # Save the scene implementation to a file
         with open(plan_path, 'w', encoding='utf-8') as f:
@@ -399,6 +534,50 @@ class VideoPlanner:
             f.write(implementation_plan)
         print(f"Scene {i} Implementation Plan saved to {plan_path}")
 
+    def adapt_scene_outline(self, topic: str, description: str, cached_match, session_id: str) -> str:
+        """Adapt the scene outline of a similar cached topic instead of planning from scratch.
+
+        Args:
+            topic (str): The topic of the video
+            description (str): Description of the video content
+            cached_match: PlanCacheMatch holding the reference topic and its outline
+            session_id (str): Session identifier
+
+        Returns:
+            str: Adapted scene outline
+        """
+        prompt = get_prompt_adapt_plan(topic, description, cached_match.topic, cached_match.description,
+                                       cached_match.scene_outline, "scene outline")
+        response_text = self.planner_model(
+            _prepare_text_inputs(prompt),
+            metadata={"generation_name": "scene_outline_adapt", "tags": [topic, "scene-outline"], "session_id": session_id}
+        )
+        return extract_xml_tag(response_text, "SCENE_OUTLINE") or response_text
+
+    async def adapt_scene_implementation(self, topic: str, description: str, cached_match, i: int, file_prefix: str, session_id: str, scene_trace_id: str) -> str:
+        """Adapt a cached implementation plan with a single call instead of the three planning stages.
+
+        Args:
+            topic (str): The topic of the video
+            description (str): Description of the video content
+            cached_match: PlanCacheMatch holding the reference topic and its plans
+            i (int): Scene number
+            file_prefix (str): Prefix for output files
+            session_id (str): Session identifier
+            scene_trace_id (str): Unique trace ID for this scene
+
+        Returns:
+            str: Adapted implementation plan for the scene
+        """
+        prompt = get_prompt_adapt_plan(topic, description, cached_match.topic, cached_match.description,
+                                       cached_match.implementation_plans[i], f"scene {i} implementation plan")
+        async with self._llm_slot(topic):
+            implementation_plan = await asyncio.to_thread(
+                self.planner_model,
+                _prepare_text_inputs(prompt),
+                metadata={"generation_name": "scene_implementation_adapt", "trace_id": scene_trace_id, "tags": [topic, f"scene{i}"], "session_id": session_id}
+            )
+        self.save_implementation_plan(file_prefix, i, implementation_plan)
         return implementation_plan
 
     async def generate_scene_implementation(self,
@@ -3,7 +3,7 @@ import re
 import subprocess
 import asyncio
 from PIL import Image
-from typing import Optional, List
+from typing import Optional, List, Dict
 import traceback
 import sys
 
@@ -16,25 +16,35 @@ try:
 except ImportError:
     VertexAIWrapper = None
 from mllm_tools.gemini import GeminiWrapper
+from src.config.config import Config
+from src.core.layout_probe import PROBE_OUTPUT_ENV, check_layout, load_layout_record
 
 class VideoRenderer:
     """Class for rendering and combining Manim animation videos."""
 
-    def __init__(self, output_dir="output", print_response=False, use_visual_fix_code=False):
+    def __init__(self, output_dir="output", print_response=False, use_visual_fix_code=False, use_layout_probe=None):
         """Initialize the VideoRenderer.
 
         Args:
             output_dir (str, optional): Directory for output files. Defaults to "output".
             print_response (bool, optional): Whether to print responses. Defaults to False.
             use_visual_fix_code (bool, optional): Whether to use visual fix code. Defaults to False.
+            use_layout_probe (bool, optional): Whether to record mobject layouts while rendering and skip
+                visual self-reflection when they pass the layout check. Defaults to None.
         """
         self.output_dir = output_dir
         self.print_response = print_response
         self.use_visual_fix_code = use_visual_fix_code
+        self.use_layout_probe = Config.USE_LAYOUT_PROBE if use_layout_probe is None else use_layout_probe
+        self.layout_stats = {"ok": 0, "flagged": 0, "undecided": 0, "visual_fixes": 0}
 
-    async def render_scene(self, code: str, file_prefix: str, curr_scene: int, curr_version: int, code_dir: str, media_dir: str, max_retries: int = 3, use_visual_fix_code=False, visual_self_reflection_func=None, banned_reasonings=None, scene_trace_id=None, topic=None, session_id=None, on_success_callback=None):
+    async def render_scene(self, code: str, file_prefix: str, curr_scene: int, curr_version: int, code_dir: str, media_dir: str, max_retries: int = 3, use_visual_fix_code=False):
         """Render a single Manim scene with the given code.
 
+        Only the render and, with the layout probe, the layout check run here, so a caller
+        holding a render slot is not held up by visual self-reflection. A rendered scene is
+        marked done with :meth:`mark_scene_rendered`, after any visual fix.
+
         Args:
             code (str): Python code to render
             file_prefix (str): Prefix for output files  
@@ -43,45 +53,29 @@ class VideoRenderer:
             code_dir (str): Directory to save code files
             media_dir (str): Directory for Manim media output
             max_retries (int, optional): Maximum retry attempts. Defaults to 3.
-            use_visual_fix_code (bool, optional): Use visual error fixing. Defaults to False.
-            visual_self_reflection_func: Function for visual reflection
-            banned_reasonings: List of banned reasoning patterns
-            scene_trace_id: Trace ID for this scene
-            topic: Video topic
-            session_id: Session ID
-            on_success_callback: Async callback function to call on successful render
+            use_visual_fix_code (bool, optional): Whether a visual fix may follow, which decides
+                whether the layout is recorded and checked. Defaults to False.
 
         Returns:
-            tuple: (code, error_message) where error_message is None on success
+            tuple: (code, error_message, visual_review) where error_message is None on success and
+                visual_review is None when no visual self-reflection is needed, otherwise the layout
+                findings to pass to it (empty when the layout check was not conclusive)
         """
         retries = 0
         file_path = os.path.join(code_dir, f"{file_prefix}_scene{curr_scene}_v{curr_version}.py")
-        scene_dir = os.path.join(self.output_dir, file_prefix, f"scene{curr_scene}")
         
         # Save code to file
         with open(file_path, "w", encoding='utf-8') as f:
             f.write(code)
 
-        # Render the scene
+        # Render the scene, recording mobject layouts when they can spare a visual self-reflection call
+        layout_path = None
+        if use_visual_fix_code and self.use_layout_probe:
+            layout_path = os.path.join(code_dir, f"{file_prefix}_scene{curr_scene}_v{curr_version}_layout.json")
         try:
-            project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-            # Use 'manim' command directly since it's in the virtual environment
-            manim_command = "manim"
-            process_env = os.environ.copy()
-            if 'PYTHONPATH' in process_env:
-                process_env['PYTHONPATH'] = f"{project_root}{os.pathsep}{process_env['PYTHONPATH']}"
-            else:
-                process_env['PYTHONPATH'] = project_root
-            result = subprocess.run(
-                [manim_command, "-qh", file_path, "--media_dir", media_dir],
-                capture_output=True,
-                text=True,
-                env=process_env
-            )
-            
-            if result.returncode != 0:
-                raise Exception(result.stderr)
-                
+            render_error = await self._run_manim_render(file_path, media_dir, layout_path)
+            if render_error is not None:
+                raise Exception(render_error)
         except Exception as e:
             print(f"Error: {e}")
             print(f"Retrying {retries+1} of {max_retries}...")
@@ -89,10 +83,24 @@ class VideoRenderer:
             with open(os.path.join(code_dir, f"{file_prefix}_scene{curr_scene}_v{curr_version}_error.log"), "a") as f:
                 f.write(f"\nError in attempt {retries}:\n{str(e)}\n")
             retries += 1
-            return code, str(e) # Indicate failure and return error message
+            return code, str(e), None # Indicate failure and return error message
         
         print(f"Successfully rendered {file_path}")
-        with open(os.path.join(self.output_dir, file_prefix, f"scene{curr_scene}", "succ_rendered.txt"), "w") as f:
+
+        visual_review = self._layout_review(curr_scene, layout_path) if use_visual_fix_code else None
+        return code, None, visual_review # Indicate success
+
+    async def mark_scene_rendered(self, file_prefix: str, curr_scene: int, file_path: str, on_success_callback=None):
+        """Mark a scene as successfully rendered and hand its final video to the success callback.
+
+        Args:
+            file_prefix (str): Prefix for output files
+            curr_scene (int): Current scene number
+            file_path (str): Path to the rendered scene code file
+            on_success_callback: Async callback function to call on successful render
+        """
+        scene_dir = os.path.join(self.output_dir, file_prefix, f"scene{curr_scene}")
+        with open(os.path.join(scene_dir, "succ_rendered.txt"), "w") as f:
             f.write("")
 
         # Call the success callback if provided (for uploading scene videos)
@@ -102,7 +110,168 @@ class VideoRenderer:
             except Exception as e:
                 print(f"⚠️ Scene upload callback failed: {e}")
 
-        return code, None # Indicate success
+    async def _run_manim_render(self, file_path: str, media_dir: str, layout_path: Optional[str] = None) -> Optional[str]:
+        """Render a scene file at high quality, through the layout probe when ``layout_path`` is given.
+
+        Args:
+            file_path (str): Path to the scene code file
+            media_dir (str): Directory for Manim media output
+            layout_path (str, optional): JSON file receiving the probe's layout snapshots
+
+        Returns:
+            Optional[str]: Error output, or None on success
+        """
+        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+        process_env = os.environ.copy()
+        process_env['PYTHONPATH'] = os.pathsep.join(filter(None, [project_root, process_env.get('PYTHONPATH')]))
+        if layout_path:
+            process_env[PROBE_OUTPUT_ENV] = layout_path
+            command = [sys.executable, "-m", "src.core.layout_probe"]
+        else:
+            # Use 'manim' command directly since it's in the virtual environment
+            command = ["manim"]
+        # Run manim without blocking the event loop so other scenes keep planning and generating code
+        process = await asyncio.create_subprocess_exec(
+            *command, "-qh", file_path, "--media_dir", media_dir,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=process_env
+        )
+        _, stderr = await process.communicate()
+        if process.returncode != 0:
+            return stderr.decode("utf-8", errors="replace")
+        return None
+
+    def _layout_review(self, curr_scene: int, layout_path: Optional[str]) -> Optional[List[str]]:
+        """Decide from the layout probe's snapshots whether a rendered scene needs visual self-reflection.
+
+        Args:
+            curr_scene (int): Current scene number
+            layout_path (Optional[str]): Layout probe output, None when the probe was not used
+
+        Returns:
+            Optional[List[str]]: None when the layout check passed, otherwise the findings to pass
+                along as hints (empty when the probe was not used or was not conclusive)
+        """
+        if not layout_path:
+            return []
+        report = check_layout(load_layout_record(layout_path),
+                              safe_margin=Config.LAYOUT_SAFE_MARGIN, min_spacing=Config.LAYOUT_MIN_SPACING)
+        self.layout_stats[report.verdict] += 1
+        if report.verdict == "ok":
+            print(f"📐 Scene {curr_scene}: layout check passed at {report.snapshots} animation boundaries, skipping visual self-reflection")
+            return None
+        print(f"📐 Scene {curr_scene}: layout check {report.verdict}: {'; '.join(report.issues[:3])}")
+        return list(report.issues) if report.verdict == "flagged" else []
+
+    async def visual_review(self, code: str, curr_scene: int, curr_version: int, layout_issues: List[str],
+                            visual_self_reflection_func, banned_reasonings, scene_trace_id, topic, session_id,
+                            implementation_plan) -> Optional[str]:
+        """Ask the multimodal model for a visual fix of a rendered scene.
+
+        Only the snapshot and the model call run here; the caller renders the proposed fix
+        with :meth:`apply_visual_fix`, so each step can hold its own scheduler slot.
+
+        Args:
+            code (str): Code of the rendered scene
+            curr_scene (int): Current scene number
+            curr_version (int): Current version number
+            layout_issues (List[str]): Findings of the layout check, passed along as hints
+            visual_self_reflection_func: Function for visual reflection
+            banned_reasonings: Reasonings that disqualify a visual fix
+            scene_trace_id: Trace ID for this scene
+            topic: Video topic
+            session_id: Session ID
+            implementation_plan: Scene implementation plan
+
+        Returns:
+            Optional[str]: Code of the visual fix, or None when there is nothing to apply
+        """
+        try:
+            snapshot_path = await asyncio.to_thread(self.create_snapshot_scene, topic, curr_scene, curr_version, "path")
+            new_code, response_text = await asyncio.to_thread(
+                visual_self_reflection_func,
+                code=code,
+                media_path=snapshot_path,
+                scene_trace_id=scene_trace_id,
+                topic=topic,
+                scene_number=curr_scene,
+                session_id=session_id,
+                implementation_plan=implementation_plan or "",
+                layout_issues=layout_issues or None
+            )
+        except Exception as e:
+            print(f"⚠️ Visual self-reflection failed for scene {curr_scene}: {e}")
+            return None
+
+        if not new_code or new_code.strip() == code.strip():
+            return None
+        if banned_reasonings and any(reason.strip() and reason.strip() in response_text for reason in banned_reasonings):
+            print(f"⚠️ Visual fix for scene {curr_scene} rejected: response contains a banned reasoning")
+            return None
+        return new_code
+
+    async def apply_visual_fix(self, code: str, new_code: str, file_path: str, curr_scene: int, media_dir: str) -> str:
+        """Render a visual fix, keeping it only if it renders; otherwise the original code file is restored.
+
+        Args:
+            code (str): Code of the rendered scene
+            new_code (str): Code of the visual fix
+            file_path (str): Path to the scene code file
+            curr_scene (int): Current scene number
+            media_dir (str): Directory for Manim media output
+
+        Returns:
+            str: Code of the rendered video
+        """
+        with open(file_path, "w", encoding='utf-8') as f:
+            f.write(new_code)
+        render_error = await self._run_manim_render(file_path, media_dir)
+        if render_error is not None:
+            print(f"⚠️ Visual fix for scene {curr_scene} failed to render, keeping the original video")
+            with open(file_path, "w", encoding='utf-8') as f:
+                f.write(code)
+            return code
+        self.layout_stats["visual_fixes"] += 1
+        print(f"🎨 Applied visual fix to scene {curr_scene}")
+        return new_code
+
+    def get_layout_metrics(self) -> Dict[str, int]:
+        """Return layout check verdict counts and the number of visual fixes applied."""
+        return dict(self.layout_stats)
+
+    async def validate_scene(self, file_path: str, media_dir: str) -> Optional[str]:
+        """Validation-render a scene file without writing video output.
+
+        Runs ``manim --dry_run`` so construct() executes and runtime errors surface,
+        while skipping encoding. The subprocess is killed if the caller is cancelled.
+
+        Args:
+            file_path (str): Path to the scene code file
+            media_dir (str): Directory for any Manim media output
+
+        Returns:
+            Optional[str]: Error output, or None when the scene runs cleanly
+        """
+        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+        process_env = os.environ.copy()
+        process_env['PYTHONPATH'] = os.pathsep.join(filter(None, [project_root, process_env.get('PYTHONPATH')]))
+        process = await asyncio.create_subprocess_exec(
+            "manim", "-ql", "--dry_run", file_path, "--media_dir", media_dir,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=process_env
+        )
+        try:
+            _, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+        if process.returncode != 0:
+            return stderr.decode("utf-8", errors="replace")
+        return None
 
     def run_manim_process(self,
                           topic: str):
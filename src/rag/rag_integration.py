@@ -12,6 +12,7 @@ from task_generator import (
     get_prompt_rag_query_generation_narration,
     get_prompt_rag_query_generation_code
 )
+from src.core.resource_registry import get_plugin_descriptions
 try:
     from src.rag.vector_store import RAGVectorStore
     HAS_RAG = True
@@ -122,8 +123,8 @@ class RAGIntegration:
                 "plugins.json"
             )
             if os.path.exists(plugin_config_path):
-                with open(plugin_config_path, "r") as f:
-                    return json.load(f)
+                # Shared across instances and reloaded only when the file changes
+                return get_plugin_descriptions(self.manim_docs_path)
             else:
                 print(f"Plugin descriptions file not found at {plugin_config_path}")
                 return []
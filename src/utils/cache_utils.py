@@ -0,0 +1,67 @@
+"""
+Shared plumbing of the on-disk SQLite caches and journals.
+
+The fix cache, the Tavily cache, the memory write journal and the pipeline
+state store each keep one WAL-mode connection shared by the threads of a
+process, serialize writes with an IMMEDIATE transaction so concurrent
+processes on the same file queue up instead of failing mid-transaction, and
+key cached entries by text with paths, addresses and numbers normalized away.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+
+def normalize_signature(text: str) -> str:
+    """Replace paths, hex addresses and numbers with placeholders and collapse whitespace.
+
+    Word order and case are kept; callers decide whether they matter.
+
+    Args:
+        text (str): Error line or search query
+
+    Returns:
+        str: Normalized text
+    """
+    text = re.sub(r"(/[\w.\-]+)+", "<PATH>", text)
+    text = re.sub(r"0x[0-9a-fA-F]+", "<ADDR>", text)
+    text = re.sub(r"\d+", "N", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def connect_wal(db_path: str, schema: str, row_factory: bool = False) -> sqlite3.Connection:
+    """Open a SQLite database in WAL mode for use from several threads, creating it and its schema if missing.
+
+    Args:
+        db_path (str): Database file
+        schema (str): ``CREATE ... IF NOT EXISTS`` script run on every open
+        row_factory (bool): Return rows as ``sqlite3.Row``. Defaults to False.
+
+    Returns:
+        sqlite3.Connection: Autocommit connection; group writes with :func:`immediate_transaction`
+    """
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+    if row_factory:
+        conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(schema)
+    return conn
+
+
+@contextmanager
+def immediate_transaction(conn: sqlite3.Connection, lock: threading.Lock) -> Iterator[sqlite3.Connection]:
+    """Run a block as one IMMEDIATE transaction under ``lock``, rolling back on error."""
+    with lock:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
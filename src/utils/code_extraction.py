@@ -0,0 +1,210 @@
+"""
+Local extraction of Python code from model responses.
+
+A single ```python regex fails on unclosed fences (truncated or early-stopped
+streams), several code blocks, stray fence lines and prose that slipped into
+the block, and every such failure used to cost a full re-query of the scene
+model. This module scans all fenced blocks, prefers the one defining a Scene
+subclass, repairs the common defects and validates the result with ``ast``,
+so a re-query is only needed when no block can be recovered.
+"""
+
+import ast
+import keyword
+import re
+import textwrap
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+PYTHON_FENCE_LANGUAGES = {"python", "py", "python3", ""}
+# Syntax errors fixed by commenting out prose lines before giving up on a block
+MAX_PROSE_REPAIRS = 5
+# Trailing lines that may be dropped from a truncated block
+MAX_TRUNCATED_LINES = 30
+
+_OPENING_FENCE = re.compile(r"^`{3,}\s*([\w+\-]*)\s*$")
+_CLOSING_FENCE = re.compile(r"^`{3,}\s*$")
+_STRAY_FENCE = re.compile(r"^`{3,}\s*(python|py|python3)?\s*$")
+_SCENE_CLASS = re.compile(r"^\s*class\s+\w+\s*\([^)]*Scene[^)]*\)\s*:", re.MULTILINE)
+_PROSE_LINE = re.compile(r"^[A-Za-z][\w'’]*(?:[ ,]+[\w'’\-]+){2,}[.:!?]?$")
+_CODE_START = re.compile(r"^(from\s+\w|import\s+\w|class\s+\w|def\s+\w|@\w)")
+_CLOSING_CODE_TAG = re.compile(r"</(CODE|FULL_CORRECTED_CODE)>")
+
+
+@dataclass
+class ExtractedCode:
+    """Code recovered from a response and the repairs that were needed"""
+    code: str
+    repairs: List[str] = field(default_factory=list)
+
+    @property
+    def has_scene(self) -> bool:
+        return _SCENE_CLASS.search(self.code) is not None
+
+
+def fenced_blocks(text: str) -> List[Tuple[str, str, bool]]:
+    """Split a response into fenced blocks.
+
+    Args:
+        text (str): Model response
+
+    Returns:
+        List[Tuple[str, str, bool]]: (language, body, closed) per block; the last block
+            is unclosed when the response ends inside it
+    """
+    blocks = []
+    language, body = None, []
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if language is None:
+            match = _OPENING_FENCE.match(stripped)
+            if match:
+                language, body = match.group(1).lower(), []
+        elif _CLOSING_FENCE.match(stripped):
+            blocks.append((language, "\n".join(body), True))
+            language = None
+        else:
+            body.append(line)
+    if language is not None:
+        blocks.append((language, "\n".join(body), False))
+    return blocks
+
+
+def scene_code_closed(text: str) -> bool:
+    """Stop predicate for streamed code responses: True once the scene code is complete.
+
+    A closed block only counts if it defines a Scene subclass, so snippets in
+    the model's notes before the code do not end the stream early.
+
+    Args:
+        text (str): Text generated so far
+
+    Returns:
+        bool: Whether a closed Python block defining a Scene subclass, or a closing
+            </CODE> or </FULL_CORRECTED_CODE> tag, is present in the text
+    """
+    if _CLOSING_CODE_TAG.search(text):
+        return True
+    if "```" not in text:
+        return False
+    return any(closed and language in PYTHON_FENCE_LANGUAGES and _SCENE_CLASS.search(body)
+               for language, body, closed in fenced_blocks(text))
+
+
+def _looks_like_prose(line: str) -> bool:
+    """Whether a line is an English sentence rather than code."""
+    stripped = line.strip()
+    if not _PROSE_LINE.match(stripped):
+        return False
+    first_word = re.split(r"[ ,]", stripped, maxsplit=1)[0]
+    return not keyword.iskeyword(first_word) and first_word not in {"print", "self"}
+
+
+def _parses(code: str) -> Optional[SyntaxError]:
+    try:
+        ast.parse(code)
+        return None
+    except SyntaxError as e:
+        return e
+    except ValueError as e:  # e.g. null bytes
+        return SyntaxError(str(e))
+
+
+def repair_code(code: str, truncated: bool = False) -> Optional[ExtractedCode]:
+    """Make a code block parse, or give up.
+
+    Stray fence lines are removed, prose lines reported by the parser are
+    commented out (keeping line numbers), and the ending of a block whose
+    fence was never closed is cut back to the last point where the code parses.
+
+    Args:
+        code (str): Body of a code block
+        truncated (bool): Whether the block's fence was never closed
+
+    Returns:
+        Optional[ExtractedCode]: Parseable code with the repairs applied, or None
+    """
+    repairs = []
+    lines = code.split("\n")
+    kept = [line for line in lines if not _STRAY_FENCE.match(line.strip())]
+    if len(kept) != len(lines):
+        repairs.append("stray_fence_lines")
+    lines = textwrap.dedent("\n".join(kept)).strip("\n").split("\n")
+
+    error = _parses("\n".join(lines))
+    for _ in range(MAX_PROSE_REPAIRS):
+        if error is None:
+            break
+        index = (error.lineno or 0) - 1
+        if not 0 <= index < len(lines) or not _looks_like_prose(lines[index]):
+            break
+        indent = lines[index][:len(lines[index]) - len(lines[index].lstrip())]
+        lines[index] = f"{indent}# {lines[index].strip()}"
+        if "prose_commented" not in repairs:
+            repairs.append("prose_commented")
+        error = _parses("\n".join(lines))
+
+    # Only a block whose fence never closed was cut off; a closed block that fails to parse is broken code
+    if error is not None and truncated:
+        for cut in range(1, min(MAX_TRUNCATED_LINES, len(lines) - 1) + 1):
+            candidate = lines[:-cut]
+            if _parses("\n".join(candidate)) is None:
+                lines, error = candidate, None
+                repairs.append("truncated_ending")
+                break
+
+    if error is not None:
+        return None
+    code = "\n".join(lines).strip()
+    return ExtractedCode(code=code, repairs=repairs) if code else None
+
+
+def _unfenced_code(text: str) -> Optional[str]:
+    """Code written without fences: from the first import/class/def line to the next tag line."""
+    lines = text.split("\n")
+    start = next((i for i, line in enumerate(lines) if _CODE_START.match(line)), None)
+    if start is None:
+        return None
+    end = next((i for i in range(start, len(lines)) if re.match(r"^\s*</?[A-Z_]+>\s*$", lines[i])), len(lines))
+    return "\n".join(lines[start:end])
+
+
+def extract_python_code(text: str) -> Optional[ExtractedCode]:
+    """Recover the scene code from a model response without another model call.
+
+    Every Python (or untagged) fenced block is repaired and validated; a block
+    defining a Scene subclass wins over other blocks, then blocks needing fewer
+    repairs, then longer ones. Blocks that only work together are tried joined.
+
+    Args:
+        text (str): Model response
+
+    Returns:
+        Optional[ExtractedCode]: Best recovered code, or None if nothing parses
+    """
+    if not text:
+        return None
+    blocks = [(body, closed) for language, body, closed in fenced_blocks(text) if language in PYTHON_FENCE_LANGUAGES]
+
+    candidates = []
+    for body, closed in blocks:
+        extracted = repair_code(body, truncated=not closed)
+        if extracted is not None:
+            if len(blocks) > 1:
+                extracted.repairs.append("multiple_blocks")
+            candidates.append(extracted)
+    if len(blocks) > 1 and not any(c.has_scene for c in candidates):
+        joined = repair_code("\n\n".join(textwrap.dedent(body) for body, _ in blocks), truncated=not blocks[-1][1])
+        if joined is not None:
+            joined.repairs.append("joined_blocks")
+            candidates.append(joined)
+    if not blocks:
+        unfenced = _unfenced_code(text)
+        extracted = repair_code(unfenced) if unfenced else None
+        if extracted is not None:
+            extracted.repairs.append("no_fence")
+            candidates.append(extracted)
+
+    if not candidates:
+        return None
+    return max(candidates, key=lambda c: (c.has_scene, -len(c.repairs), len(c.code)))
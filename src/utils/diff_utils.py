@@ -0,0 +1,204 @@
+"""
+Line-based code diffs that can be replayed on similar, but not identical, code.
+
+A diff is stored as hunks of ``before``/``after`` lines with a few lines of
+surrounding context. Applying it to other code locates every ``before`` block
+by its stripped lines, dropping context lines until the block matches exactly
+one place, so a fix learned in one scene carries over to another scene whose
+code is indented or laid out differently around the fix.
+
+Unified diffs written by a model are parsed into the same hunks, with the
+line number of the ``@@`` header kept as a hint to pick between several
+matching places.
+"""
+
+import difflib
+import re
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_CONTEXT_LINES = 2
+
+_HUNK_HEADER = re.compile(r"^@@\s*(?:-(\d+)(?:,\d+)?\s+\+\d+(?:,\d+)?)?\s*@@")
+
+
+def compute_line_diff(original: str, fixed: str, context: int = DEFAULT_CONTEXT_LINES) -> List[Dict[str, List[str]]]:
+    """Compute the hunks turning ``original`` into ``fixed``.
+
+    Args:
+        original (str): Code before the fix
+        fixed (str): Code after the fix
+        context (int): Unchanged lines kept around each change to anchor it
+
+    Returns:
+        List[Dict[str, List[str]]]: Hunks with "before" and "after" line lists
+    """
+    original_lines = original.splitlines()
+    fixed_lines = fixed.splitlines()
+    matcher = difflib.SequenceMatcher(None, original_lines, fixed_lines, autojunk=False)
+    hunks = []
+    for group in matcher.get_grouped_opcodes(context):
+        if all(tag == "equal" for tag, *_ in group):
+            continue
+        i1, j1 = group[0][1], group[0][3]
+        i2, j2 = group[-1][2], group[-1][4]
+        hunks.append({"before": original_lines[i1:i2], "after": fixed_lines[j1:j2]})
+    return hunks
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip(" "))
+
+
+def _reindent(lines: List[str], delta: int) -> List[str]:
+    """Shift non-blank lines right (positive delta) or left (negative delta) by ``delta`` spaces."""
+    if delta == 0:
+        return list(lines)
+    shifted = []
+    for line in lines:
+        if not line.strip():
+            shifted.append(line)
+        elif delta > 0:
+            shifted.append(" " * delta + line)
+        else:
+            shifted.append(line[min(-delta, _indent(line)):])
+    return shifted
+
+
+def _find_block(lines: List[str], block: List[str]) -> List[int]:
+    """Start indices where ``block`` occurs in ``lines``, comparing stripped lines."""
+    stripped = [line.strip() for line in lines]
+    target = [line.strip() for line in block]
+    size = len(target)
+    return [i for i in range(len(lines) - size + 1) if stripped[i:i + size] == target]
+
+
+def _context_sizes(before: List[str], after: List[str]) -> Tuple[int, int]:
+    """Number of unchanged context lines at the start and end of a hunk."""
+    leading = 0
+    while leading < min(len(before), len(after)) and before[leading] == after[leading]:
+        leading += 1
+    trailing = 0
+    while (trailing < min(len(before), len(after)) - leading
+           and before[len(before) - 1 - trailing] == after[len(after) - 1 - trailing]):
+        trailing += 1
+    return leading, trailing
+
+
+def _place_hunk(lines: List[str], before: List[str], after: List[str],
+                hint: Optional[int] = None) -> Optional[Tuple[int, List[str], List[str]]]:
+    """Find the unique position of a hunk, using as much of its context as still matches.
+
+    With a ``hint`` (0-based line index), several matches are resolved to the nearest one.
+    """
+    if not any(line.strip() for line in before):
+        # Pure insertion, only placeable by line number
+        return (hint, [], after) if hint is not None and 0 <= hint <= len(lines) else None
+    leading, trailing = _context_sizes(before, after)
+    for keep in range(max(leading, trailing), -1, -1):
+        drop_start, drop_end = leading - min(keep, leading), trailing - min(keep, trailing)
+        trimmed_before = before[drop_start:len(before) - drop_end]
+        trimmed_after = after[drop_start:len(after) - drop_end]
+        if not any(line.strip() for line in trimmed_before):
+            break
+        starts = _find_block(lines, trimmed_before)
+        if len(starts) == 1:
+            return starts[0], trimmed_before, trimmed_after
+        if len(starts) > 1 and hint is not None:
+            nearest = min(starts, key=lambda start: abs(start - drop_start - hint))
+            return nearest, trimmed_before, trimmed_after
+        if len(starts) > 1:
+            # Less context can only match more places
+            break
+    return None
+
+
+def apply_line_diff(code: str, hunks: List[Dict[str, List[str]]]) -> Optional[str]:
+    """Replay ``hunks`` on ``code``.
+
+    Every hunk must match exactly one place (with its full context, or with
+    fewer context lines when the surroundings differ), and hunks must not
+    overlap; otherwise the diff is not applied at all. Hunks carrying a
+    1-based "start" line resolve several matches to the one nearest it.
+
+    Args:
+        code (str): Code to patch
+        hunks (List[Dict[str, List[str]]]): Hunks from compute_line_diff or parse_unified_diff
+
+    Returns:
+        Optional[str]: Patched code, or None when the diff does not apply unambiguously
+    """
+    if not hunks:
+        return None
+    lines = code.splitlines()
+    placements = []
+    for hunk in hunks:
+        start = hunk.get("start")
+        placement = _place_hunk(lines, hunk["before"], hunk["after"], start - 1 if start is not None else None)
+        if placement is None:
+            return None
+        placements.append(placement)
+
+    placements.sort(key=lambda p: p[0])
+    for (start, before, _), (next_start, _, _) in zip(placements, placements[1:]):
+        if start + len(before) > next_start:
+            return None
+
+    for start, before, after in reversed(placements):
+        # Carry the target's indentation over to the replacement lines
+        anchor = next((i for i, line in enumerate(before) if line.strip()), None)
+        delta = _indent(lines[start + anchor]) - _indent(before[anchor]) if anchor is not None else 0
+        lines[start:start + len(before)] = _reindent(after, delta)
+
+    patched = "\n".join(lines)
+    return patched + "\n" if code.endswith("\n") else patched
+
+
+def parse_unified_diff(diff_text: str) -> List[Dict]:
+    """Parse a unified diff into hunks for apply_line_diff.
+
+    File headers and "\\ No newline" markers are skipped, and blank lines are
+    read as blank context lines since models often drop their leading space.
+    Hunk headers without line numbers ("@@ ... @@") are accepted.
+
+    Args:
+        diff_text (str): Unified diff for a single file
+
+    Returns:
+        List[Dict]: Hunks with "before", "after" and the 1-based "start" line (or None)
+    """
+    hunks = []
+    current = None
+    for line in diff_text.splitlines():
+        header = _HUNK_HEADER.match(line)
+        if header:
+            start = int(header.group(1)) if header.group(1) else None
+            # "-N,0" inserts after line N
+            if start is not None and re.match(r"^@@\s*-\d+,0\b", line):
+                start += 1
+            current = {"before": [], "after": [], "start": start}
+            hunks.append(current)
+        elif current is None or line.startswith(("--- ", "+++ ", "\\")):
+            continue
+        elif line.startswith("+"):
+            current["after"].append(line[1:])
+        elif line.startswith("-"):
+            current["before"].append(line[1:])
+        elif line.startswith(" ") or not line.strip():
+            current["before"].append(line[1:])
+            current["after"].append(line[1:])
+        else:
+            current = None
+    return [hunk for hunk in hunks if hunk["before"] != hunk["after"]]
+
+
+def apply_unified_diff(code: str, diff_text: str) -> Optional[str]:
+    """Apply a model-written unified diff, tolerating stale line numbers and indentation.
+
+    Args:
+        code (str): Code to patch
+        diff_text (str): Unified diff against ``code``
+
+    Returns:
+        Optional[str]: Patched code, or None when the diff is empty or does not apply
+    """
+    return apply_line_diff(code, parse_unified_diff(diff_text))
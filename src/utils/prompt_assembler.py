@@ -0,0 +1,141 @@
+"""
+Token-budgeted assembly of prompt context.
+
+Code generation prompts collect context from many places (cheatsheet, code
+rules, context-learning examples, agent-memory examples, RAG and memvid
+results). The assembler keeps the total prompt under a per-model token
+budget by ranking these sections by priority and trimming or dropping the
+least important ones.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import List, Optional
+
+try:
+    from litellm import token_counter
+    HAS_LITELLM = True
+except ImportError:
+    HAS_LITELLM = False
+
+# Input-token budget per model family; latency grows steeply well before the context window is full
+MODEL_TOKEN_BUDGETS = {
+    "gemini": 60000,
+    "gpt-4o": 40000,
+    "gpt": 30000,
+    "claude": 60000,
+    "o1": 40000,
+    "o3": 40000,
+    "o4": 40000,
+}
+DEFAULT_TOKEN_BUDGET = 30000
+
+# Section priorities, lower is more important
+PRIORITY_REQUIRED = 0
+PRIORITY_MEMORY = 1
+PRIORITY_RAG = 2
+PRIORITY_CHEATSHEET = 3
+PRIORITY_MEMVID = 4
+PRIORITY_EXAMPLES = 5
+
+# Sections shorter than this after trimming are dropped instead of kept as a stub
+_MIN_TRIMMED_TOKENS = 200
+
+
+@dataclass
+class ContextSection:
+    """A piece of prompt context with its importance"""
+    name: str
+    text: str
+    priority: int
+    trimmable: bool = True
+
+
+def get_token_budget(model_name: str) -> int:
+    """
+    Look up the input-token budget for a model.
+
+    Args:
+        model_name (str): Model name, with or without provider prefix
+
+    Returns:
+        int: Token budget (PROMPT_TOKEN_BUDGET overrides the per-model default)
+    """
+    if os.getenv("PROMPT_TOKEN_BUDGET"):
+        return int(os.getenv("PROMPT_TOKEN_BUDGET"))
+    base_name = model_name.split("/")[-1].lower()
+    for prefix, budget in MODEL_TOKEN_BUDGETS.items():
+        if base_name.startswith(prefix):
+            return budget
+    return DEFAULT_TOKEN_BUDGET
+
+
+class PromptAssembler:
+    """Fits prioritised context sections into a model's token budget."""
+
+    def __init__(self, model_name: str, token_budget: Optional[int] = None, verbose: bool = True):
+        """
+        Args:
+            model_name (str): Model the prompt is sent to, used for tokenisation and the default budget
+            token_budget (Optional[int]): Explicit budget overriding the per-model default
+            verbose (bool): Print what was trimmed or dropped
+        """
+        self.model_name = model_name
+        self.token_budget = token_budget or get_token_budget(model_name)
+        self.verbose = verbose
+
+    def count_tokens(self, text: str) -> int:
+        """Count tokens with the model's tokenizer, falling back to a 4-characters-per-token estimate."""
+        if not text:
+            return 0
+        if HAS_LITELLM:
+            try:
+                return token_counter(model=self.model_name, text=text)
+            except Exception:
+                pass
+        return len(text) // 4 + 1
+
+    def _trim(self, text: str, max_tokens: int) -> str:
+        """Cut text down to roughly max_tokens, preferring to end on a line boundary."""
+        ratio = max_tokens / max(self.count_tokens(text), 1)
+        trimmed = text[:int(len(text) * ratio)]
+        cut = trimmed.rfind("\n")
+        if cut > len(trimmed) // 2:
+            trimmed = trimmed[:cut]
+        return trimmed + "\n# ... (truncated to fit the prompt budget)"
+
+    def fit(self, base_prompt: str, sections: List[ContextSection]) -> List[str]:
+        """
+        Select and trim context sections so base prompt plus context fits the budget.
+
+        Sections are considered in priority order; the first one that does not fit is
+        trimmed if allowed and everything less important is dropped.
+
+        Args:
+            base_prompt (str): The prompt without any additional context
+            sections (List[ContextSection]): Candidate context sections
+
+        Returns:
+            List[str]: Texts of the kept sections, in their original order
+        """
+        remaining = self.token_budget - self.count_tokens(base_prompt)
+        kept = {}
+        dropped = []
+        for index, section in sorted(enumerate(sections), key=lambda item: (item[1].priority, item[0])):
+            if not section.text:
+                continue
+            tokens = self.count_tokens(section.text)
+            if tokens <= remaining or not section.trimmable:
+                kept[index] = section.text
+                remaining -= tokens
+            elif remaining >= _MIN_TRIMMED_TOKENS:
+                kept[index] = self._trim(section.text, remaining)
+                if self.verbose:
+                    print(f"✂️ Trimmed prompt section '{section.name}' from {tokens} to ~{remaining} tokens")
+                remaining = 0
+            else:
+                dropped.append(section.name)
+
+        if dropped and self.verbose:
+            print(f"✂️ Dropped prompt sections over the {self.token_budget}-token budget: {', '.join(dropped)}")
+        return [kept[i] for i in sorted(kept)]
@@ -0,0 +1,154 @@
+"""
+Persistent cache for Tavily searches and page extractions.
+
+The same Manim errors recur across scenes and topics, and each occurrence
+used to pay for a Tavily search plus an extraction of the top URLs. Search
+responses are cached by normalized query (case, whitespace, file paths and
+numbers ignored; word order kept) and extracted page content by URL, each
+with its own TTL, in a SQLite file shared by concurrent workers.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from src.utils.cache_utils import connect_wal, immediate_transaction, normalize_signature
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS searches (
+    key TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS extractions (
+    url TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query without paths, addresses or numbers, keeping its word order.
+
+    Args:
+        query (str): Search query as sent to Tavily
+
+    Returns:
+        str: Normalized query; word order is kept since "expected int, got str" and
+            "expected str, got int" are different errors
+    """
+    return normalize_signature(query).lower()
+
+
+class TavilyCache:
+    """SQLite cache of Tavily search responses by normalized query and extracted content by URL."""
+
+    def __init__(self, db_path: str, search_ttl: float = 7 * 24 * 3600, extract_ttl: float = 30 * 24 * 3600):
+        """
+        Args:
+            db_path (str): SQLite database file, created if missing
+            search_ttl (float): Seconds a search response is reused
+            extract_ttl (float): Seconds extracted page content is reused
+        """
+        self.db_path = db_path
+        self.search_ttl = search_ttl
+        self.extract_ttl = extract_ttl
+        self._lock = threading.Lock()
+        self._conn = connect_wal(db_path, _SCHEMA)
+        self.stats = {"search_hits": 0, "search_misses": 0, "extract_hits": 0, "extract_misses": 0}
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += amount
+
+    @staticmethod
+    def _query_key(query: str) -> str:
+        return hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()[:32]
+
+    def get_search(self, query: str) -> Optional[Dict]:
+        """Return the cached search response for ``query``, or None if missing or expired."""
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM searches WHERE key = ? AND created_at > ?",
+                                     (self._query_key(query), time.time() - self.search_ttl)).fetchone()
+        self._count("search_hits" if row else "search_misses")
+        return json.loads(row[0]) if row else None
+
+    def has_search(self, query: str) -> bool:
+        """Whether an unexpired search response is cached for ``query``, without counting a hit or miss."""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM searches WHERE key = ? AND created_at > ?",
+                                     (self._query_key(query), time.time() - self.search_ttl)).fetchone()
+        return row is not None
+
+    def put_search(self, queries: Iterable[str], response: Dict) -> None:
+        """Cache a search response under one or more queries.
+
+        Args:
+            queries (Iterable[str]): Queries the response answers, e.g. the query sent and the error's own query
+            response (Dict): Raw Tavily search response
+        """
+        now = time.time()
+        payload = json.dumps(response)
+        with immediate_transaction(self._conn, self._lock) as conn:
+            conn.executemany("INSERT OR REPLACE INTO searches (key, query, response, created_at) VALUES (?, ?, ?, ?)",
+                             [(self._query_key(query), query, payload, now) for query in set(queries) if query])
+
+    def get_extractions(self, urls: List[str]) -> Dict[str, str]:
+        """Return the cached, unexpired content of those ``urls`` that have it."""
+        if not urls:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT url, content FROM extractions WHERE url IN ({','.join('?' * len(urls))}) AND created_at > ?",
+                (*urls, time.time() - self.extract_ttl)
+            ).fetchall()
+        found = dict(rows)
+        self._count("extract_hits", len(found))
+        self._count("extract_misses", len(set(urls)) - len(found))
+        return found
+
+    def put_extractions(self, contents: Dict[str, str]) -> None:
+        """Cache extracted page content by URL."""
+        now = time.time()
+        with immediate_transaction(self._conn, self._lock) as conn:
+            conn.executemany("INSERT OR REPLACE INTO extractions (url, content, created_at) VALUES (?, ?, ?)",
+                             [(url, content, now) for url, content in contents.items()])
+
+    def purge_expired(self) -> int:
+        """Delete expired entries and return how many were removed."""
+        now = time.time()
+        with immediate_transaction(self._conn, self._lock) as conn:
+            removed = conn.execute("DELETE FROM searches WHERE created_at <= ?", (now - self.search_ttl,)).rowcount
+            removed += conn.execute("DELETE FROM extractions WHERE created_at <= ?", (now - self.extract_ttl,)).rowcount
+        return removed
+
+    def get_metrics(self) -> Dict[str, int]:
+        """Return hit and miss counts for searches and extractions."""
+        with self._lock:
+            return dict(self.stats)
+
+
+_caches: Dict[str, TavilyCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_tavily_cache(db_path: str, **kwargs) -> TavilyCache:
+    """Return the process-wide cache for a database file, creating it on first use.
+
+    Args:
+        db_path (str): SQLite database file
+        **kwargs: Further TavilyCache options, used if the cache is created now
+
+    Returns:
+        TavilyCache: Cache shared by all search engines of this process
+    """
+    key = os.path.abspath(db_path)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = TavilyCache(db_path, **kwargs)
+            _caches[key].purge_expired()
+        return _caches[key]
@@ -10,9 +10,13 @@ Author: manimAnimationAgent
 
 import os
 import re
+import threading
+import time
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 
+from src.utils.tavily_cache import TavilyCache
+
 try:
     from tavily import TavilyClient
     TAVILY_AVAILABLE = True
@@ -38,16 +42,20 @@ class TavilyErrorSearchEngine:
     2. Search for solutions using Tavily and provide structured results
     """
     
-    def __init__(self, api_key: Optional[str] = None, verbose: bool = False):
+    def __init__(self, api_key: Optional[str] = None, verbose: bool = False, cache: Optional[TavilyCache] = None):
         """
         Initialize the Tavily Error Search Engine.
         
         Args:
             api_key: Tavily API key. If None, will try to get from TAVILY_API_KEY env var
             verbose: Whether to print detailed logs
+            cache: Persistent cache of search responses and extracted pages. If None, nothing is cached
         """
         self.verbose = verbose
         self.client = None
+        self.cache = cache
+        self._stats_lock = threading.Lock()
+        self.stage_stats: Dict[str, Dict[str, float]] = {}
         
         if not TAVILY_AVAILABLE:
             if self.verbose:
@@ -75,6 +83,60 @@ class TavilyErrorSearchEngine:
         """Check if Tavily is available and properly configured"""
         return TAVILY_AVAILABLE and self.client is not None
 
+    def record_stage(self, stage: str, seconds: float, cached: bool = False) -> None:
+        """
+        Record the latency of one stage of an error resolution.
+        
+        Args:
+            stage: Stage name, e.g. "search" or "extract"
+            seconds: Time the stage took
+            cached: Whether the stage was served from the cache
+        """
+        with self._stats_lock:
+            stats = self.stage_stats.setdefault(stage, {"calls": 0, "cache_hits": 0, "seconds": 0.0})
+            stats["calls"] += 1
+            stats["cache_hits"] += int(cached)
+            stats["seconds"] += seconds
+
+    def get_stage_metrics(self) -> Dict[str, Dict[str, float]]:
+        """Return call counts, cache hits and mean latency per stage."""
+        with self._stats_lock:
+            return {
+                stage: {"calls": stats["calls"], "cache_hits": stats["cache_hits"],
+                        "mean_seconds": round(stats["seconds"] / stats["calls"], 3) if stats["calls"] else 0.0}
+                for stage, stats in self.stage_stats.items()
+            }
+
+    def has_cached_solution(self, error_analysis: ErrorAnalysis) -> bool:
+        """Whether search results for the analysis' query are cached, so a Tavily fix needs no search call."""
+        return self.cache is not None and self.cache.has_search(error_analysis.search_query)
+
+    def cached_solution(self, error_analysis: ErrorAnalysis, extract_content: bool = True) -> Optional[Dict]:
+        """
+        Return search results for the analysis' query from the cache only, without any API call
+        for the search. Uncached page content is still extracted when a client is available.
+        
+        Args:
+            error_analysis: ErrorAnalysis object from analyze_error_for_search
+            extract_content: Whether to add extracted page content to the solutions
+            
+        Returns:
+            Search results as returned by search_for_solution, or None on a cache miss
+        """
+        if self.cache is None:
+            return None
+        start = time.monotonic()
+        response = self.cache.get_search(error_analysis.search_query)
+        if response is None:
+            return None
+        self.record_stage("search", time.monotonic() - start, cached=True)
+        processed_results = self._process_search_results(response, error_analysis)
+        if extract_content and processed_results.get("solutions"):
+            processed_results = self._extract_full_content(processed_results, max_extractions=3)
+        if self.verbose:
+            print(f"♻️ Reused cached Tavily results for: {error_analysis.search_query}")
+        return processed_results
+
     def analyze_error_for_search(self, traceback: str, code_context: str = "") -> ErrorAnalysis:
         """
         Step 1: Analyze the full traceback and generate a concise search query using Gemini.
@@ -116,7 +178,8 @@ class TavilyErrorSearchEngine:
             
         return analysis
 
-    def search_for_solution(self, error_analysis: ErrorAnalysis, max_results: int = 5, extract_content: bool = True) -> Dict:
+    def search_for_solution(self, error_analysis: ErrorAnalysis, max_results: int = 5, extract_content: bool = True,
+                            cache_aliases: Optional[List[str]] = None) -> Dict:
         """
         Step 2: Use Tavily to search for solutions based on the error analysis.
         
@@ -124,10 +187,15 @@ class TavilyErrorSearchEngine:
             error_analysis: ErrorAnalysis object from analyze_error_for_search
             max_results: Maximum number of search results to return
             extract_content: Whether to extract full page content from URLs using Tavily Extract
+            cache_aliases: Further queries to cache the response under, e.g. the query derived from the traceback
             
         Returns:
             Dictionary containing search results and extracted solutions
         """
+        cached = self.cached_solution(error_analysis, extract_content=extract_content)
+        if cached is not None:
+            return cached
+            
         if not self.is_available():
             return {
                 "available": False,
@@ -140,6 +208,7 @@ class TavilyErrorSearchEngine:
                 print(f"🔍 Searching Tavily for: {error_analysis.search_query}")
                 
             # Perform the search with documentation priority
+            start = time.monotonic()
             response = self.client.search(
                 query=error_analysis.search_query,
                 search_depth="advanced",
@@ -153,6 +222,9 @@ class TavilyErrorSearchEngine:
                     # Removed reddit/discord to focus on authoritative sources
                 ]
             )
+            self.record_stage("search", time.monotonic() - start)
+            if self.cache is not None and response.get("results"):
+                self.cache.put_search([error_analysis.search_query] + list(cache_aliases or []), response)
             
             # Process and structure the results
             processed_results = self._process_search_results(response, error_analysis)
@@ -335,7 +407,7 @@ class TavilyErrorSearchEngine:
         Returns:
             Updated search results with extracted content from top 3 prioritized URLs
         """
-        if not self.is_available() or not search_results.get("solutions"):
+        if not search_results.get("solutions"):
             return search_results
             
         # Get top URLs based on relevance score and source type priority
@@ -349,6 +421,32 @@ class TavilyErrorSearchEngine:
                 print("⚠️ No valid URLs found for content extraction")
             return search_results
         
+        # Reuse content extracted for earlier errors and only extract the remaining URLs
+        extraction_results = {}
+        if self.cache is not None:
+            start = time.monotonic()
+            extraction_results = self.cache.get_extractions(urls_to_extract)
+            if extraction_results:
+                self.record_stage("extract", time.monotonic() - start, cached=True)
+            urls_to_extract = [url for url in urls_to_extract if url not in extraction_results]
+        
+        if urls_to_extract and self.is_available():
+            extraction_results.update(self._extract_urls(urls_to_extract))
+            
+        # Add extracted content back to solutions
+        for solution in solutions:
+            url = solution["url"]
+            if url in extraction_results:
+                solution["extracted_content"] = extraction_results[url]
+                if self.verbose:
+                    content_length = len(extraction_results[url])
+                    print(f"✅ Extracted {content_length} characters from {solution['source_type']}: {solution['title'][:50]}...")
+        
+        return search_results
+
+    def _extract_urls(self, urls_to_extract: List[str]) -> Dict[str, str]:
+        """Extract and clean page content with Tavily Extract, caching it by URL. Returns {url: content}."""
+        extraction_results = {}
         try:
             if self.verbose:
                 print(f"📄 Extracting content from TOP {len(urls_to_extract)} URLs (max 3)...")
@@ -356,15 +454,16 @@ class TavilyErrorSearchEngine:
                     print(f"   {i}. {url}")
                 
             # Use Tavily Extract API to get full page content
+            start = time.monotonic()
             extract_response = self.client.extract(
                 urls=urls_to_extract,
                 include_images=False,  # Focus on text content for error resolution
                 extract_depth="basic",  # Basic extraction is sufficient for most cases
                 format="markdown"  # Markdown format for better LLM processing
             )
+            self.record_stage("extract", time.monotonic() - start)
             
             # Process extraction results
-            extraction_results = {}
             for result in extract_response.get("results", []):
                 url = result.get("url", "")
                 raw_content = result.get("raw_content", "")
@@ -372,15 +471,8 @@ class TavilyErrorSearchEngine:
                     # Clean and truncate content for LLM processing
                     cleaned_content = self._clean_extracted_content(raw_content)
                     extraction_results[url] = cleaned_content
-            
-            # Add extracted content back to solutions
-            for solution in solutions:
-                url = solution["url"]
-                if url in extraction_results:
-                    solution["extracted_content"] = extraction_results[url]
-                    if self.verbose:
-                        content_length = len(extraction_results[url])
-                        print(f"✅ Extracted {content_length} characters from {solution['source_type']}: {solution['title'][:50]}...")
+            if self.cache is not None and extraction_results:
+                self.cache.put_extractions(extraction_results)
             
             # Handle failed extractions
             failed_results = extract_response.get("failed_results", [])
@@ -391,7 +483,7 @@ class TavilyErrorSearchEngine:
             if self.verbose:
                 print(f"⚠️ Content extraction failed: {e}")
         
-        return search_results
+        return extraction_results
 
     def _prioritize_urls_for_extraction(self, solutions: List[Dict], max_extractions: int) -> List[Dict]:
         """Prioritize which URLs to extract content from based on source type and relevance"""
@@ -659,7 +751,8 @@ class TavilyErrorSearchEngine:
 
 
 # Helper function for easy integration
-def search_error_solution(traceback: str, code_context: str = "", api_key: Optional[str] = None, extract_content: bool = True) -> Dict:
+def search_error_solution(traceback: str, code_context: str = "", api_key: Optional[str] = None, extract_content: bool = True,
+                          cache: Optional[TavilyCache] = None) -> Dict:
     """
     Convenient function to search for error solutions using Tavily with content extraction.
     
@@ -668,9 +761,10 @@ def search_error_solution(traceback: str, code_context: str = "", api_key: Optio
         code_context: Additional code context
         api_key: Tavily API key (optional)
         extract_content: Whether to extract full page content from URLs (default: True)
+        cache: Persistent cache of search responses and extracted pages (optional)
         
     Returns:
         Dictionary with error analysis, solution suggestions, and extracted content
     """
-    engine = TavilyErrorSearchEngine(api_key=api_key, verbose=True)
+    engine = TavilyErrorSearchEngine(api_key=api_key, verbose=True, cache=cache)
     return engine.get_error_resolution_suggestions(traceback, code_context, extract_content=extract_content) 
\ No newline at end of file
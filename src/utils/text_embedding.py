@@ -0,0 +1,30 @@
+"""
+Local text embedding that needs no model or network.
+
+Tokens are hashed into a fixed number of buckets (a hashed bag of words).
+It is far weaker than a learned embedding, but fast, deterministic and good
+enough to rank texts that share identifiers and error wording.
+"""
+
+import hashlib
+import re
+from typing import List
+
+HASHED_EMBEDDING_DIM = 512
+
+
+def hashed_embedding(text: str, dim: int = HASHED_EMBEDDING_DIM) -> List[float]:
+    """Count the lowercase alphanumeric tokens of ``text`` into ``dim`` hashed buckets (not normalized).
+
+    Args:
+        text (str): Text to embed
+        dim (int): Number of buckets
+
+    Returns:
+        List[float]: Token counts per bucket
+    """
+    vector = [0.0] * dim
+    for token in re.findall(r"[a-z0-9]+", text.lower()):
+        bucket = int(hashlib.md5(token.encode("utf-8")).hexdigest(), 16) % dim
+        vector[bucket] += 1.0
+    return vector
@@ -1,6 +1,7 @@
 from .prompts_raw import (
     _prompt_code_generation,
     _prompt_fix_error,
+    _prompt_fix_error_diff,
     _prompt_visual_fix_error,
     _prompt_scene_plan,
     _prompt_scene_vision_storyboard,
@@ -23,7 +24,8 @@ from .prompts_raw import (
     _prompt_rag_query_generation_narration,
     _prompt_rag_query_generation_fix_error,
     _prompt_tavily_search_query_generation,
-    _prompt_tavily_assisted_fix_error
+    _prompt_tavily_assisted_fix_error,
+    _prompt_adapt_plan
 )
 from typing import Union, List
   
@@ -142,6 +144,28 @@ def get_prompt_fix_error(implementation_plan: str, manim_code: str, error: str,
                 prompt += f"\n" + "\n".join(additional_context[1:])
     return prompt
 
+def get_prompt_fix_error_diff(code_window: str, error: str, additional_context: Union[str, List[str]] = None) -> str:
+    """
+    Generate a prompt asking for a unified diff that fixes an error in a window of the manim code.
+
+    Args:
+        code_window (str): The failing lines and the definitions they reference, headed by their line ranges.
+        error (str): The (trimmed) error message encountered.
+        additional_context (Union[str, List[str]], optional): Memory, RAG or documentation context.
+
+    Returns:
+        str: The formatted prompt for a localized fix.
+    """
+    prompt = _prompt_fix_error_diff.format(
+        code_window=code_window,
+        error_message=error
+    )
+    if additional_context:
+        if isinstance(additional_context, list):
+            additional_context = "\n".join(additional_context)
+        prompt += f"\nAdditional context: {additional_context}"
+    return prompt
+
 def get_prompt_visual_fix_error(implementation: str, generated_code: str) -> str:
     prompt = _prompt_visual_fix_error.format(
         implementation=implementation,
@@ -340,4 +364,30 @@ def get_prompt_tavily_assisted_fix_error(implementation_plan: str, manim_code: s
         tavily_search_results=tavily_search_results,
         search_query=search_query
     )
-    return prompt
\ No newline at end of file
+    return prompt
+
+def get_prompt_adapt_plan(topic: str, description: str, reference_topic: str, reference_description: str,
+                          reference_plan: str, plan_kind: str) -> str:
+    """
+    Generate a prompt to adapt a cached plan of a related topic instead of planning from scratch.
+
+    Args:
+        topic (str): The topic of the video.
+        description (str): A brief description of the video content.
+        reference_topic (str): Topic the cached plan was written for.
+        reference_description (str): Description of the reference topic.
+        reference_plan (str): The cached scene outline or scene implementation plan.
+        plan_kind (str): What the plan is, e.g. "scene outline" or "scene 2 implementation plan".
+
+    Returns:
+        str: The formatted prompt for plan adaptation.
+    """
+    prompt = _prompt_adapt_plan.format(
+        topic=topic,
+        description=description,
+        reference_topic=reference_topic,
+        reference_description=reference_description,
+        reference_plan=reference_plan,
+        plan_kind=plan_kind
+    )
+    return prompt
@@ -2009,3 +2009,57 @@ Search-Informed Solution: [How the search results inform the fix]
 4. Prioritize solutions from authoritative sources (official docs, maintainers)
 5. If search results are insufficient, clearly state limitations"""
 
+_prompt_adapt_plan = """You are an expert in educational video production and Manim animation. A plan was already written for a closely related topic. Instead of planning from scratch, adapt that plan to the new topic.
+
+New Topic: {topic}
+New Description: {description}
+
+Reference Topic: {reference_topic}
+Reference Description: {reference_description}
+
+Reference {plan_kind}:
+{reference_plan}
+
+**Instructions:**
+1. Keep the structure, pacing, XML tags and level of detail of the reference {plan_kind}.
+2. Replace every topic-specific element (definitions, formulas, examples, object names, narration) so that it is correct and complete for the new topic.
+3. Remove parts that do not apply to the new topic and add what the new topic needs; do not leave any content that only makes sense for the reference topic.
+4. Respect all constraints stated in the reference plan (spatial constraints, safe area margins, minimum spacing, relative positioning).
+
+Output only the adapted {plan_kind}, using exactly the same outer XML tags as the reference."""
+
+_prompt_fix_error_diff = """You are an expert Manim developer specializing in debugging and error resolution. A Manim scene file failed to render. Below are only the parts of the file relevant to the error: the failing code and the imports, class and method headers, and definitions it references. Each snippet is headed by its line range in the file.
+
+Relevant Code:
+```python
+{code_window}
+```
+
+Error Message:
+{error_message}
+
+Requirements:
+1. Fix the reported error with the smallest change that resolves it.
+2. Only change lines shown above. Do not rewrite or reformat unrelated code.
+3. If external assets (e.g., images, audio, video) cause the error, remove them.
+4. **If voiceover is present in the code, keep it.**
+5. Follow the current Manim Community Edition API.
+
+You MUST only output the following format. Use a standard unified diff against the file with the line numbers from the snippet headers, at least 2 unchanged context lines around every change, and exact copies of the original lines (including indentation) for context and removed lines. Do NOT output the snippet header comments or the full file.
+
+<ANALYSIS>
+[One or two sentences: root cause and fix]
+</ANALYSIS>
+<PATCH>
+```diff
+--- a/scene.py
++++ b/scene.py
+@@ -start,count +start,count @@
+ unchanged context line
+-removed line
++added line
+ unchanged context line
+```
+</PATCH>
+"""
+
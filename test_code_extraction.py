@@ -0,0 +1,100 @@
+"""
+Test script for local code extraction.
+
+Feeds model responses that used to trigger extraction re-queries (several
+blocks, unclosed fences, prose and stray fences inside the block, missing
+fences) and checks that valid scene code is recovered locally, and that
+the streaming stop predicate waits for the scene code.
+"""
+
+from src.utils.code_extraction import extract_python_code, scene_code_closed
+
+SCENE = '''from manim import *
+
+class Demo(Scene):
+    def construct(self):
+        circle = Circle()
+        self.play(Create(circle))
+        self.wait()'''
+
+
+def test_multiple_and_partial_fences():
+    """The Scene block should win over other blocks, and a truncated block should be cut back."""
+    print("Testing multiple and unclosed fences...")
+    multiple = f"Install it first:\n```bash\npip install manim\n```\nHelper:\n```python\nx = 1\n```\nScene:\n```python\n{SCENE}\n```\nDone."
+    truncated = f"<FULL_CORRECTED_CODE>\n```python\n{SCENE}\n        self.play(FadeOut(circle, shift=UP"
+
+    picked = extract_python_code(multiple)
+    cut = extract_python_code(truncated)
+
+    ok = (picked is not None and picked.code == SCENE
+          and cut is not None and cut.code == SCENE and "truncated_ending" in cut.repairs)
+    assert ok, f"Unexpected extraction: picked={picked}, cut={cut}"
+    print("✅ Scene block chosen and truncated ending repaired")
+
+
+def test_closed_block_with_broken_ending_rejected():
+    """A closed block with a syntax error on its last line is broken code, not a truncated stream."""
+    print("Testing closed block with a broken last line...")
+    broken = f"```python\n{SCENE}\n        self.play(FadeOut(circle, shift=UP)\n```"
+
+    extracted = extract_python_code(broken)
+
+    assert extracted is None, f"Broken closed block should be rejected, got {extracted}"
+    print("✅ Closed block with a syntax error left for a re-query instead of losing its ending")
+
+
+def test_prose_and_stray_fences():
+    """Prose lines are commented out, stray fence lines dropped, unfenced code recovered."""
+    print("Testing prose, stray fences and missing fences...")
+    prose = SCENE.replace("        self.wait()", "        Here is the corrected animation:\n        self.wait()")
+    messy = extract_python_code(f"```python\n{prose}\n```python\n```")
+    unfenced = extract_python_code(f"<THINKING>\nFixed it.\n</THINKING>\n{SCENE}\n</FULL_CORRECTED_CODE>")
+    nothing = extract_python_code("I could not fix this error, sorry.")
+
+    ok = (messy is not None and "# Here is the corrected animation:" in messy.code
+          and {"prose_commented", "stray_fence_lines"} <= set(messy.repairs)
+          and unfenced is not None and unfenced.code == SCENE
+          and nothing is None)
+    assert ok, f"Unexpected extraction: messy={messy}, unfenced={unfenced}, nothing={nothing}"
+    print("✅ Prose and stray fences repaired, unfenced code found, re-query left for hopeless responses")
+
+
+def test_stream_stops_after_scene_code():
+    """A snippet in the notes before the code must not end the stream."""
+    print("Testing the streaming stop predicate...")
+    response = (f"<THINKING>\nLocation: line 5\nChange:\n```python\ncircle = Circle()\n```\n</THINKING>\n"
+                f"<FULL_CORRECTED_CODE>\n```python\n{SCENE}\n```\n</FULL_CORRECTED_CODE>")
+    lines = response.split("\n")
+    stopped_at = next("\n".join(lines[:i]) for i in range(1, len(lines) + 1) if scene_code_closed("\n".join(lines[:i])))
+    extracted = extract_python_code(stopped_at)
+    tagged = scene_code_closed("<CODE>\nfrom manim import *\n</CODE>")
+
+    assert SCENE in stopped_at and extracted is not None and extracted.code == SCENE and tagged, \
+        f"Stream stopped too early: {stopped_at!r}"
+    print("✅ Stream ran past the note snippet and stopped after the scene code")
+
+
+if __name__ == "__main__":
+    print("🚀 Starting Code Extraction Tests...")
+    print("=" * 50)
+
+    results = {}
+    for name, test in [
+        ("Fences", test_multiple_and_partial_fences),
+        ("Broken closed block", test_closed_block_with_broken_ending_rejected),
+        ("Repairs", test_prose_and_stray_fences),
+        ("Stop predicate", test_stream_stops_after_scene_code),
+    ]:
+        try:
+            test()
+            results[name] = True
+        except AssertionError as e:
+            print(f"❌ {e}")
+            results[name] = False
+
+    print("\n" + "=" * 50)
+    print("🏁 Test Results Summary:")
+    for name, passed in results.items():
+        print(f"{name}: {'✅ PASSED' if passed else '❌ FAILED'}")
+    raise SystemExit(0 if all(results.values()) else 1)
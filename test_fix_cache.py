@@ -0,0 +1,92 @@
+"""
+Test script for the local fix cache.
+
+Records a successful fix in one scene, then checks that the same error in a
+differently indented scene is fixed by replaying the stored diff, and that
+a diff that keeps failing stops being applied.
+"""
+
+import os
+import tempfile
+
+from src.core.fix_cache import FixCache
+from src.utils.diff_utils import apply_line_diff, compute_line_diff
+
+SCENE_ONE = '''from manim import *
+
+class SceneOne(Scene):
+    def construct(self):
+        axes = Axes()
+        graph = axes.get_graph(lambda x: x ** 2)
+        self.play(Create(graph))
+'''
+
+SCENE_ONE_FIXED = SCENE_ONE.replace("axes.get_graph(", "axes.plot(")
+
+SCENE_TWO = '''from manim import *
+
+class SceneTwo(Scene):
+    def construct(self):
+        if True:
+            axes = Axes()
+            graph = axes.get_graph(lambda x: x ** 2)
+            self.play(Create(graph))
+        self.wait()
+'''
+
+ERROR_ONE = "scene_scene1_v0.py:6 in construct\nAttributeError: 'Axes' object has no attribute 'get_graph'"
+ERROR_TWO = "other_scene2_v3.py:7 in construct\nAttributeError: 'Axes' object has no attribute 'get_graph'"
+
+
+def test_diff_replays_on_reindented_code():
+    """A stored diff should apply to other code regardless of indentation, and refuse ambiguous targets."""
+    print("Testing diff replay...")
+    hunks = compute_line_diff(SCENE_ONE, SCENE_ONE_FIXED)
+    patched = apply_line_diff(SCENE_TWO, hunks)
+    ambiguous = apply_line_diff(SCENE_TWO + SCENE_TWO, hunks)
+
+    ok = patched is not None and "            graph = axes.plot(lambda x: x ** 2)" in patched and ambiguous is None
+    assert ok, f"Unexpected replay result:\n{patched}\nambiguous={ambiguous is not None}"
+    print("✅ Diff replayed with the target's indentation and refused when ambiguous")
+
+
+def test_cache_hit_and_failure_tracking():
+    """The same error in another scene should hit; repeated failures should disable the entry."""
+    print("Testing fix cache lookups...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = FixCache(os.path.join(tmp, "fix_cache.db"))
+        miss = cache.lookup(SCENE_ONE, ERROR_ONE)
+        cache.record_success(ERROR_ONE, SCENE_ONE, SCENE_ONE_FIXED)
+
+        hit = FixCache(os.path.join(tmp, "fix_cache.db")).lookup(SCENE_TWO, ERROR_TWO)
+        rejected = cache.lookup(SCENE_TWO, ERROR_TWO, validate=lambda code: False)
+        cache.record_failure(hit[0])
+        after_failure = cache.lookup(SCENE_TWO, ERROR_TWO)
+        cache.close()
+
+    ok = miss is None and hit is not None and "axes.plot(" in hit[1] and rejected is None and after_failure is None
+    assert ok, f"Unexpected lookups: miss={miss}, hit={hit}, rejected={rejected}, after_failure={after_failure}"
+    print("✅ Recurring error fixed from the cache; validation and failures respected")
+
+
+if __name__ == "__main__":
+    print("🚀 Starting Fix Cache Tests...")
+    print("=" * 50)
+
+    results = {}
+    for name, test in [
+        ("Diff replay", test_diff_replays_on_reindented_code),
+        ("Fix cache", test_cache_hit_and_failure_tracking),
+    ]:
+        try:
+            test()
+            results[name] = True
+        except AssertionError as e:
+            print(f"❌ {e}")
+            results[name] = False
+
+    print("\n" + "=" * 50)
+    print("🏁 Test Results Summary:")
+    for name, passed in results.items():
+        print(f"{name}: {'✅ PASSED' if passed else '❌ FAILED'}")
+    raise SystemExit(0 if all(results.values()) else 1)
@@ -0,0 +1,106 @@
+"""
+Test script for the embedded local agent memory backend.
+
+Stores error fixes in a temporary SQLite file and checks that searches rank
+them by similarity and respect the agent, topic and scene type filters, that
+memories survive a restart, that clearing works, and that a search over a
+few thousand memories stays well under a millisecond.
+"""
+
+import os
+import tempfile
+import time
+
+from src.core.local_agent_memory import LocalAgentMemory
+
+
+def _store_fixes(memory):
+    memory.store_error_fix("NameError: name 'Circel' is not defined", "c = Circel()", "c = Circle()",
+                           topic="geometry", scene_type="shapes")
+    memory.store_error_fix("TypeError: MathTex.__init__() got an unexpected keyword argument 'size'",
+                           "MathTex('x', size=2)", "MathTex('x').scale(2)", topic="algebra", scene_type="formula")
+    memory.store_error_fix("ValueError: latex error converting to dvi", "Tex(r'\\frac{1}')", "Tex(r'\\frac{1}{2}')",
+                           topic="algebra", scene_type="formula")
+
+
+def test_search_and_filters():
+    """Searches should rank by similarity and only return memories matching the filters."""
+    print("Testing search ranking and filters...")
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = LocalAgentMemory(os.path.join(tmp, "memory.db"), agent_id="agent-a")
+        _store_fixes(memory)
+        other = LocalAgentMemory(os.path.join(tmp, "memory.db"), agent_id="agent-b")
+
+        ranked = memory.search_similar_fixes("TypeError: unexpected keyword argument 'size'", "MathTex('y', size=3)")
+        filtered = memory.search_similar_fixes("error in the formula", "Circel()", topic="algebra")
+        examples = memory.get_preventive_examples("latex fraction formula", topic="algebra", scene_type="formula")
+        foreign = other.search_similar_fixes("NameError: Circel", "c = Circel()")
+
+    ok = (ranked and "size" in ranked[0]["metadata"]["error_snippet"]
+          and filtered and all(fix["metadata"]["topic"] == "algebra" for fix in filtered)
+          and examples and examples[0][1] == "Tex(r'\\frac{1}{2}')"
+          and foreign == [])
+    assert ok, f"Unexpected results: ranked={ranked}, filtered={filtered}, examples={examples}, foreign={foreign}"
+    print("✅ Results ranked by similarity and restricted to the agent, topic and scene type")
+
+
+def test_persistence_and_clear():
+    """Memories should be reloaded from SQLite and removed by clear_memory."""
+    print("Testing persistence and clearing...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "memory.db")
+        _store_fixes(LocalAgentMemory(path))
+        reopened = LocalAgentMemory(path)
+        stats = reopened.get_memory_stats()
+        found = reopened.search_similar_fixes("NameError: name 'Circel' is not defined", "")
+        refused = reopened.clear_memory()
+        cleared = reopened.clear_memory(confirm=True)
+        after = LocalAgentMemory(path).get_memory_stats()
+
+    ok = (stats["error_fixes"] == 3 and found and found[0]["metadata"]["fixed_snippet"] == "c = Circle()"
+          and not refused and cleared and after["total_memories"] == 0)
+    assert ok, f"Unexpected state: stats={stats}, found={found}, after={after}"
+    print("✅ Memories survive a restart and are removed by clear_memory")
+
+
+def test_search_latency():
+    """A search over a few thousand memories should take microseconds, not a network round trip."""
+    print("Testing search latency...")
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = LocalAgentMemory(os.path.join(tmp, "memory.db"))
+        for i in range(2000):
+            memory.store_error_fix(f"AttributeError: object has no attribute 'method_{i}'", f"obj.method_{i}()",
+                                   f"obj.fixed_{i}()", topic=f"topic_{i % 20}", scene_type="graph")
+        memory.search("AttributeError method_42", {"type": "error_fix"}, limit=3)
+        start = time.perf_counter()
+        for _ in range(100):
+            results = memory.search("AttributeError: object has no attribute 'method_42'", {"type": "error_fix"}, limit=3)
+        mean_us = (time.perf_counter() - start) / 100 * 1e6
+
+    # Only latency is checked here: with 2000 numeric identifiers some share a hash bucket with "42"
+    assert len(results) == 3 and mean_us < 1000, f"Slow or wrong search: {mean_us:.0f}µs, top={results[:1]}"
+    print(f"✅ Mean search over 2000 memories: {mean_us:.0f}µs")
+
+
+if __name__ == "__main__":
+    print("🚀 Starting Local Agent Memory Tests...")
+    print("=" * 50)
+
+    results = {}
+    for name, test in [
+        ("Search and filters", test_search_and_filters),
+        ("Persistence and clear", test_persistence_and_clear),
+        ("Search latency", test_search_latency),
+    ]:
+        try:
+            test()
+            results[name] = True
+        except AssertionError as e:
+            print(f"❌ {e}")
+            results[name] = False
+
+    print("\n" + "=" * 50)
+    print("🏁 Test Results Summary:")
+    for name, passed in results.items():
+        print(f"{name}: {'✅ PASSED' if passed else '❌ FAILED'}")
+    raise SystemExit(0 if all(results.values()) else 1)
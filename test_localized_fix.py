@@ -0,0 +1,100 @@
+"""
+Test script for localized error fixing.
+
+Checks that the failing code window follows the traceback line without
+cutting statements, brings along the definitions it references, and that
+model-written unified diffs apply despite stale line numbers or lost
+indentation, with ambiguous matches resolved by the hunk's line number.
+"""
+
+from src.core.fix_window import extract_fix_window
+from src.utils.diff_utils import apply_unified_diff
+
+FILLER = "\n".join(f"        step_{i} = {i}" for i in range(30))
+
+SCENE = f'''from manim import *
+import numpy as np
+
+RADIUS = 2
+
+
+def helper(x):
+    return x * 2
+
+
+class Scene1(Scene):
+    def make_title(self, text):
+        return Text(text)
+
+    def construct(self):
+        title = self.make_title("Hi")
+        self.play(Write(title))
+        circle = Circle(radius=RADIUS,
+                        colour=BLUE)
+        value = helper(3)
+{FILLER}
+        self.play(Create(circle))
+'''
+
+ERROR = 'File "/tmp/media/topic_scene1_v0.py", line 19, in construct\nTypeError: unexpected keyword argument \'colour\''
+
+
+def test_window_and_definitions():
+    """The window should widen to whole statements and include imports, headers and referenced helpers."""
+    print("Testing fix window extraction...")
+    window = extract_fix_window(SCENE, ERROR, radius=1)
+    rendered = window.render(SCENE) if window else ""
+
+    ok = (window is not None and window.start <= 18 and window.end >= 20
+          and "import numpy as np" in rendered and "RADIUS = 2" in rendered
+          and "def helper(x):" in rendered and "class Scene1(Scene):" in rendered
+          and "step_25" not in rendered
+          and extract_fix_window(SCENE, "ZeroDivisionError: division by zero") is None)
+    assert ok, f"Unexpected window: {window}\n{rendered}"
+    print("✅ Window covers the failing statement and the definitions it uses")
+
+
+def test_unified_diff_application():
+    """Diffs should apply with stale line numbers and dedented context, and refuse unknown context."""
+    print("Testing unified diff application...")
+    diff = '''--- a/scene.py
++++ b/scene.py
+@@ -30,3 +30,3 @@
+ circle = Circle(radius=RADIUS,
+-                colour=BLUE)
++                color=BLUE)
+ value = helper(3)
+'''
+    patched = apply_unified_diff(SCENE, diff)
+
+    repeated = "a = 1\nb = 2\n\na = 1\nb = 2\n"
+    nearest = apply_unified_diff(repeated, "@@ -4,2 +4,2 @@\n a = 1\n-b = 2\n+b = 3\n")
+    unknown = apply_unified_diff(SCENE, "@@ -1,1 +1,1 @@\n-not in the file\n+x = 1\n")
+
+    ok = (patched is not None and "                        color=BLUE)" in patched and "colour" not in patched
+          and nearest == "a = 1\nb = 2\n\na = 1\nb = 3\n" and unknown is None)
+    assert ok, f"Unexpected patches:\n{patched}\nnearest={nearest!r}, unknown={unknown!r}"
+    print("✅ Diffs applied with the file's indentation, nearest match chosen, unknown context refused")
+
+
+if __name__ == "__main__":
+    print("🚀 Starting Localized Fix Tests...")
+    print("=" * 50)
+
+    results = {}
+    for name, test in [
+        ("Fix window", test_window_and_definitions),
+        ("Unified diff", test_unified_diff_application),
+    ]:
+        try:
+            test()
+            results[name] = True
+        except AssertionError as e:
+            print(f"❌ {e}")
+            results[name] = False
+
+    print("\n" + "=" * 50)
+    print("🏁 Test Results Summary:")
+    for name, passed in results.items():
+        print(f"{name}: {'✅ PASSED' if passed else '❌ FAILED'}")
+    raise SystemExit(0 if all(results.values()) else 1)
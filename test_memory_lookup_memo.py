@@ -0,0 +1,134 @@
+"""
+Test script for the per-run memo of agent memory lookups.
+
+Counts backend calls to check that repeated preventive-example and
+similar-fix lookups reach the backend once, that concurrent identical
+lookups share one call, that entries expire after the TTL, that failures
+are not memoized, that storing a new fix invalidates the memo, and that
+lookups made while stores are still queued for the backend are not memoized.
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+from src.core.agent_memory import LookupMemo
+from src.core.local_agent_memory import LocalAgentMemory
+
+
+def test_repeated_and_concurrent_lookups():
+    """Identical lookups, sequential or concurrent, should run the backend once."""
+    print("Testing repeated and concurrent lookups...")
+    memo = LookupMemo(ttl=60)
+    calls = []
+
+    def backend():
+        calls.append(1)
+        time.sleep(0.1)
+        return [("error", "fix")]
+
+    threads = [threading.Thread(target=memo.get_or_compute, args=(("examples", "algebra"), backend)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    again = memo.get_or_compute(("examples", "algebra"), backend)
+    again.append(("mutated", "by caller"))
+    other = memo.get_or_compute(("examples", "geometry"), backend)
+    cached = memo.get_or_compute(("examples", "algebra"), backend)
+
+    assert len(calls) == 2 and cached == [("error", "fix")] and other == [("error", "fix")], \
+        f"Unexpected backend calls: calls={len(calls)}, cached={cached}, metrics={memo.get_metrics()}"
+    print("✅ Each distinct lookup reached the backend once")
+
+
+def test_expiry_and_failures():
+    """Entries should expire after the TTL and failed lookups should be retried."""
+    print("Testing expiry and failures...")
+    memo = LookupMemo(ttl=0.1)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ConnectionError("backend down")
+        return ["fix"]
+
+    try:
+        memo.get_or_compute(("fixes",), flaky)
+        raised = False
+    except ConnectionError:
+        raised = True
+    memo.get_or_compute(("fixes",), flaky)
+    memo.get_or_compute(("fixes",), flaky)
+    time.sleep(0.15)
+    memo.get_or_compute(("fixes",), flaky)
+
+    assert raised and len(calls) == 3, f"Unexpected calls: raised={raised}, calls={len(calls)}"
+    print("✅ Failures not memoized, entries expire after the TTL")
+
+
+def test_store_invalidates():
+    """Storing a fix should make the next lookup see it."""
+    print("Testing invalidation on store...")
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = LocalAgentMemory(os.path.join(tmp, "memory.db"))
+        before = memory.search_similar_fixes("NameError: name 'Circel' is not defined", "c = Circel()")
+        memory.store_error_fix("NameError: name 'Circel' is not defined", "c = Circel()", "c = Circle()")
+        after = memory.search_similar_fixes("NameError: name 'Circel' is not defined", "c = Circel()")
+        repeated = memory.search_similar_fixes("NameError: name 'Circel' is not defined", "c = Circel()")
+        metrics = memory.lookup_memo.get_metrics()
+
+    assert (before == [] and len(after) == 1 and repeated == after
+            and metrics["hits"] == 1 and metrics["misses"] == 2 and metrics["invalidations"] == 1), \
+        f"Stale lookup: before={before}, after={after}, metrics={metrics}"
+    print("✅ Storing a fix invalidated the memoized lookup")
+
+
+def test_lookups_not_memoized_while_writes_queued():
+    """Lookups started while stores wait in the write-behind queue should not be reused."""
+    print("Testing lookups with queued writes...")
+    queued = [1]
+    memo = LookupMemo(ttl=60, backend_lagging=lambda: bool(queued))
+    backend = {"fixes": []}
+    calls = []
+
+    def lookup():
+        calls.append(1)
+        return list(backend["fixes"])
+
+    stale = memo.get_or_compute(("fixes",), lookup)
+    backend["fixes"].append("queued fix")  # the background writer sends the stored fix
+    queued.clear()
+    fresh = memo.get_or_compute(("fixes",), lookup)
+    cached = memo.get_or_compute(("fixes",), lookup)
+
+    assert stale == [] and fresh == cached == ["queued fix"] and len(calls) == 2, \
+        f"Stale lookup memoized: stale={stale}, fresh={fresh}, cached={cached}, calls={len(calls)}"
+    print("✅ Lookups made while writes were queued were not memoized")
+
+
+if __name__ == "__main__":
+    print("🚀 Starting Memory Lookup Memo Tests...")
+    print("=" * 50)
+
+    results = {}
+    for name, test in [
+        ("Repeated lookups", test_repeated_and_concurrent_lookups),
+        ("Expiry and failures", test_expiry_and_failures),
+        ("Invalidation on store", test_store_invalidates),
+        ("Queued writes", test_lookups_not_memoized_while_writes_queued),
+    ]:
+        try:
+            test()
+            results[name] = True
+        except AssertionError as e:
+            print(f"❌ {e}")
+            results[name] = False
+
+    print("\n" + "=" * 50)
+    print("🏁 Test Results Summary:")
+    for name, passed in results.items():
+        print(f"{name}: {'✅ PASSED' if passed else '❌ FAILED'}")
+    raise SystemExit(0 if all(results.values()) else 1)
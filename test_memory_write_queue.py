@@ -0,0 +1,130 @@
+"""
+Test script for the agent memory write-behind queue.
+
+Uses a fake writer in place of Mem0 to check that enqueueing returns
+immediately and writes are delivered in the background, that failed writes
+are retried and eventually dropped, that unsent writes survive in the
+journal for the next queue, and that a deep queue slows producers down.
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+from src.core import memory_write_queue
+from src.core.memory_write_queue import MemoryWriteQueue
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_background_delivery_and_retry():
+    """Writes should be delivered off the caller's thread; failures retried, then dropped."""
+    print("Testing background delivery and retries...")
+    memory_write_queue.RETRY_BASE_DELAY = 0.05
+    delivered, attempts = [], {}
+
+    def writer(payload):
+        attempts[payload["n"]] = attempts.get(payload["n"], 0) + 1
+        if payload["n"] == 1 and attempts[1] < 2:
+            raise ConnectionError("temporary outage")
+        if payload["n"] == 2:
+            raise ConnectionError("permanent outage")
+        time.sleep(0.05)
+        delivered.append(payload["n"])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = MemoryWriteQueue(os.path.join(tmp, "journal.db"), writer, flush_interval=0.05, max_attempts=3)
+        start = time.monotonic()
+        for n in range(5):
+            queue.enqueue({"n": n})
+        enqueue_seconds = time.monotonic() - start
+        drained = _wait_for(lambda: queue.pending() == 0)
+        metrics = queue.get_metrics()
+        queue.close()
+
+    ok = (drained and enqueue_seconds < 0.2 and sorted(delivered) == [0, 1, 3, 4]
+          and attempts[2] == 3 and metrics["written"] == 4 and metrics["dropped"] == 1)
+    assert ok, (f"Unexpected delivery: drained={drained}, enqueue={enqueue_seconds:.2f}s, "
+                f"delivered={delivered}, attempts={attempts}, metrics={metrics}")
+    print("✅ Writes delivered in the background, transient failures retried, hopeless ones dropped")
+
+
+def test_journal_survives_restart():
+    """Writes not sent before close should be delivered by the next queue on the same journal."""
+    print("Testing journal survival...")
+    delivered = []
+
+    def failing_writer(payload):
+        raise ConnectionError("offline")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "journal.db")
+        offline = MemoryWriteQueue(path, failing_writer, flush_interval=60)
+        offline.enqueue({"n": 1})
+        offline.enqueue({"n": 2})
+        offline._stop.set()  # simulate the process dying before the worker ran
+        offline.close(timeout=0)
+        online = MemoryWriteQueue(path, lambda payload: delivered.append(payload["n"]), flush_interval=0.05)
+        drained = _wait_for(lambda: online.pending() == 0)
+        online.close()
+
+    assert drained and delivered == [1, 2], f"Journaled writes lost: drained={drained}, delivered={delivered}"
+    print("✅ Journaled writes delivered after a restart")
+
+
+def test_backpressure():
+    """A producer should wait while the queue is deeper than max_pending."""
+    print("Testing backpressure...")
+    release = threading.Event()
+
+    def slow_writer(payload):
+        release.wait(5)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = MemoryWriteQueue(os.path.join(tmp, "journal.db"), slow_writer, max_pending=2,
+                                 flush_interval=0.05, backpressure_timeout=0.3)
+        queue.enqueue({"n": 1})
+        queue.enqueue({"n": 2})
+        start = time.monotonic()
+        queue.enqueue({"n": 3})
+        waited = time.monotonic() - start
+        metrics = queue.get_metrics()
+        release.set()
+        _wait_for(lambda: queue.pending() == 0)
+        queue.close()
+
+    assert waited >= 0.25 and metrics["backpressure_waits"] == 1 and metrics["queued"] == 3, \
+        f"No backpressure: waited={waited:.2f}s, metrics={metrics}"
+    print("✅ Producer slowed down while the queue was full, write still journaled")
+
+
+if __name__ == "__main__":
+    print("🚀 Starting Memory Write Queue Tests...")
+    print("=" * 50)
+
+    results = {}
+    for name, test in [
+        ("Background delivery", test_background_delivery_and_retry),
+        ("Journal survival", test_journal_survives_restart),
+        ("Backpressure", test_backpressure),
+    ]:
+        try:
+            test()
+            results[name] = True
+        except AssertionError as e:
+            print(f"❌ {e}")
+            results[name] = False
+
+    print("\n" + "=" * 50)
+    print("🏁 Test Results Summary:")
+    for name, passed in results.items():
+        print(f"{name}: {'✅ PASSED' if passed else '❌ FAILED'}")
+    raise SystemExit(0 if all(results.values()) else 1)
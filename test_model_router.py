@@ -0,0 +1,114 @@
+"""
+Test script for latency-aware model routing.
+
+Uses fake models and a fake clock to check that auxiliary stages go to their
+configured tier, shift to a faster tier while their model breaches the
+latency SLO, and retry on the faster tier when a call fails, whether it
+raises or returns an error response.
+"""
+
+from mllm_tools.errors import ModelErrorResponse
+from mllm_tools.router import ModelRouter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeModel:
+    """Model that takes a fixed amount of fake time per call."""
+
+    def __init__(self, name, clock, latency, fail=False, error_text=False):
+        self.model_name = name
+        self.clock = clock
+        self.latency = latency
+        self.fail = fail
+        self.error_text = error_text
+        self.calls = 0
+
+    def __call__(self, messages, metadata=None, **kwargs):
+        self.calls += 1
+        self.clock.now += self.latency
+        if self.fail:
+            raise RuntimeError("provider error")
+        if self.error_text:
+            # Like LiteLLMWrapper, which catches provider errors and returns their text
+            return ModelErrorResponse("litellm.RateLimitError: quota exceeded")
+        return self.model_name
+
+
+def test_routes_and_shifts_on_slo_breach():
+    """A stage should move from the fast tier to the lite tier once fast breaches the SLO."""
+    print("Testing routing and SLO shifting...")
+    clock = FakeClock()
+    heavy, fast, lite = FakeModel("heavy", clock, 30), FakeModel("fast", clock, 20), FakeModel("lite", clock, 1)
+    router = ModelRouter({"heavy": heavy, "fast": fast, "lite": lite}, slo_seconds=10, probe_every=5, clock=clock)
+
+    unrouted = router([], {"generation_name": "code_generation"})
+    first = router([], {"generation_name": "rag_query_generation_code"})
+    shifted = [router([], {"generation_name": "rag_query_generation_code"}) for _ in range(5)]
+
+    ok = (unrouted == "heavy" and first == "fast" and shifted[:4] == ["lite"] * 4 and shifted[4] == "fast"
+          and router.model_name == "heavy")
+    assert ok, f"Unexpected routing: unrouted={unrouted}, first={first}, shifted={shifted}"
+    print("✅ Stage routed to fast, shifted to lite after the SLO breach, and probed fast again")
+
+
+def test_failed_call_falls_back():
+    """A failing routed call should be retried once on the next faster tier."""
+    print("Testing failure fallback...")
+    clock = FakeClock()
+    heavy, fast, lite = FakeModel("heavy", clock, 1), FakeModel("fast", clock, 1, fail=True), FakeModel("lite", clock, 1)
+    router = ModelRouter({"heavy": heavy, "fast": fast, "lite": lite}, clock=clock)
+
+    result = router([], {"generation_name": "detect-relevant-plugins"})
+    metrics = router.get_metrics()
+
+    assert result == "lite" and metrics["models"]["fast"]["failure_rate"] > 0, \
+        f"Expected fallback to lite, got {result}, metrics={metrics}"
+    print("✅ Failed call retried on the lite tier and recorded as a failure")
+
+
+def test_error_response_falls_back_and_shifts():
+    """A tier returning error text should count as failing, fall back, and be shifted away from."""
+    print("Testing error responses...")
+    clock = FakeClock()
+    heavy, lite = FakeModel("heavy", clock, 1), FakeModel("lite", clock, 1)
+    fast = FakeModel("fast", clock, 1, error_text=True)
+    router = ModelRouter({"heavy": heavy, "fast": fast, "lite": lite}, probe_every=100, clock=clock)
+
+    results = [router([], {"generation_name": "detect-relevant-plugins"}) for _ in range(4)]
+    metrics = router.get_metrics()
+
+    assert (results == ["lite"] * 4 and fast.calls < 4
+            and metrics["models"]["fast"]["failure_rate"] > router.max_failure_rate), \
+        f"Expected lite answers and fast shifted away from, got {results}, fast calls={fast.calls}, metrics={metrics}"
+    print("✅ Error text never reached the caller, fast tier recorded as failing and skipped")
+
+
+if __name__ == "__main__":
+    print("🚀 Starting Model Router Tests...")
+    print("=" * 50)
+
+    results = {}
+    for name, test in [
+        ("Routing", test_routes_and_shifts_on_slo_breach),
+        ("Fallback", test_failed_call_falls_back),
+        ("Error responses", test_error_response_falls_back_and_shifts),
+    ]:
+        try:
+            test()
+            results[name] = True
+        except AssertionError as e:
+            print(f"❌ {e}")
+            results[name] = False
+
+    print("\n" + "=" * 50)
+    print("🏁 Test Results Summary:")
+    for name, passed in results.items():
+        print(f"{name}: {'✅ PASSED' if passed else '❌ FAILED'}")
+    raise SystemExit(0 if all(results.values()) else 1)
@@ -0,0 +1,107 @@
+"""
+Test script for the persistent pipeline state store.
+
+Records a topic's progress from several threads at once and checks that a
+fresh store opened on the same database sees exactly where to resume.
+"""
+
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from src.core.pipeline_state import PipelineStateStore, backfill_output_dir
+
+
+def test_concurrent_updates_and_resume():
+    """Concurrent scene updates should all land and survive reopening the database."""
+    print("Testing concurrent scene updates...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "pipeline_state.db")
+        store = PipelineStateStore(db_path)
+        store.record_outline("pythagoras", "Pythagoras", "outline.txt", 4, difficulty="easy")
+
+        def run_scene(scene_number):
+            store.update_scene("pythagoras", scene_number, stage="planned", artifacts={"plan": f"plan{scene_number}.txt"},
+                               timings={"plan": 1.0})
+            store.update_scene("pythagoras", scene_number, stage="coded", attempts=1, timings={"code": 2.0})
+            if scene_number % 2:
+                store.update_scene("pythagoras", scene_number, stage="rendered", timings={"render": 3.0})
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(run_scene, range(1, 5)))
+        store.close()
+
+        topic = PipelineStateStore(db_path).get_topic("pythagoras")
+
+    stages = {n: scene["stage"] for n, scene in topic["scenes"].items()}
+    expected = {1: "rendered", 2: "coded", 3: "rendered", 4: "coded"}
+    assert stages == expected, f"Expected {expected}, got {stages}"
+    assert topic["scenes"][1]["artifacts"] == {"plan": "plan1.txt"}, f"Unexpected artifacts: {topic['scenes'][1]}"
+    print("✅ All scene updates were recorded and reloaded")
+
+
+def test_stage_never_moves_backwards():
+    """A late 'coded' update must not undo a rendered scene, and success clears failures."""
+    print("Testing stage ordering...")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = PipelineStateStore(os.path.join(tmp, "pipeline_state.db"))
+        store.record_outline("topic", "Topic", "outline.txt", 1)
+        store.update_scene("topic", 1, error="boom", failed_stage="render")
+        store.update_scene("topic", 1, stage="rendered")
+        store.update_scene("topic", 1, stage="coded")
+        scene = store.get_scene("topic", 1)
+        store.close()
+
+    assert scene["stage"] == "rendered" and scene["error"] is None, f"Unexpected scene state: {scene}"
+    print("✅ Stages only move forward")
+
+
+def test_backfill_and_report():
+    """A legacy output tree should be imported once and then answer aggregate queries."""
+    print("Testing backfill and report...")
+    with tempfile.TemporaryDirectory() as tmp:
+        topic_dir = os.path.join(tmp, "pythagoras")
+        os.makedirs(os.path.join(topic_dir, "scene1", "code"))
+        os.makedirs(os.path.join(topic_dir, "scene2"))
+        with open(os.path.join(topic_dir, "pythagoras_scene_outline.txt"), "w") as f:
+            f.write("<SCENE_1>Intro</SCENE_1>\n<SCENE_2>Proof</SCENE_2>")
+        for name in ("scene1/implementation_plan.txt", "scene1/code/pythagoras_scene1_v2.py",
+                     "scene1/succ_rendered.txt", "scene2/implementation_plan.txt"):
+            open(os.path.join(topic_dir, name), "w").close()
+
+        store = PipelineStateStore(os.path.join(tmp, "pipeline_state.db"))
+        first = backfill_output_dir(store, tmp, [{"theorem": "Pythagoras", "description": "a^2+b^2=c^2"}], "easy")
+        second = backfill_output_dir(store, tmp)
+        store.update_scene("pythagoras", 2, error="boom", failed_stage="code")
+        report = store.report()
+        store.close()
+
+    easy = report["difficulty"].get("easy", {})
+    ok = (first == 1 and second == 0 and easy.get("scenes") == 2 and easy.get("rendered") == 1
+          and easy.get("avg_attempts") == 3 and report["failures"] == {"code": 1})
+    assert ok, f"Unexpected backfill/report result: imported={first},{second} report={report}"
+    print("✅ Legacy tree imported once and report aggregates match")
+
+
+if __name__ == "__main__":
+    print("🚀 Starting Pipeline State Tests...")
+    print("=" * 50)
+
+    results = {}
+    for name, test in [
+        ("Concurrent updates", test_concurrent_updates_and_resume),
+        ("Stage ordering", test_stage_never_moves_backwards),
+        ("Backfill and report", test_backfill_and_report),
+    ]:
+        try:
+            test()
+            results[name] = True
+        except AssertionError as e:
+            print(f"❌ {e}")
+            results[name] = False
+
+    print("\n" + "=" * 50)
+    print("🏁 Test Results Summary:")
+    for name, passed in results.items():
+        print(f"{name}: {'✅ PASSED' if passed else '❌ FAILED'}")
+    raise SystemExit(0 if all(results.values()) else 1)
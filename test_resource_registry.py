@@ -0,0 +1,83 @@
+"""
+Test script for the process-wide resource registry.
+
+Checks that shared resources are read from disk once and reloaded only when
+one of their files is modified, added or removed.
+"""
+
+import json
+import os
+import tempfile
+
+from src.core.resource_registry import ResourceRegistry, get_context_examples, get_json_resource, get_registry
+
+
+def test_loaded_once_until_file_changes():
+    """A resource should be served from memory until its file's mtime or size changes."""
+    print("Testing mtime invalidation...")
+    registry = ResourceRegistry()
+    loads = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "models.json")
+        with open(path, "w") as f:
+            json.dump({"allowed_models": ["a"]}, f)
+
+        def load():
+            loads.append(1)
+            with open(path) as f:
+                return json.load(f)
+
+        first = registry.get("models", load, watch=[path])
+        registry.get("models", load, watch=[path])
+        with open(path, "w") as f:
+            json.dump({"allowed_models": ["a", "b"]}, f)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        second = registry.get("models", load, watch=[path])
+
+    assert len(loads) == 2 and first["allowed_models"] == ["a"] and second["allowed_models"] == ["a", "b"], \
+        f"Expected two loads with updated content, got loads={len(loads)}, {first}, {second}"
+    print("✅ Resource reloaded only after its file changed")
+
+
+def test_context_examples_notice_new_files():
+    """Adding an example file should invalidate the cached examples."""
+    print("Testing context example discovery...")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "topic"))
+        with open(os.path.join(tmp, "topic", "a_scene_plan.txt"), "w") as f:
+            f.write("plan a")
+        before = get_context_examples(tmp, "*_scene_plan.txt")
+        cached = get_context_examples(tmp, "*_scene_plan.txt")
+        with open(os.path.join(tmp, "b_scene_plan.txt"), "w") as f:
+            f.write("plan b")
+        after = get_context_examples(tmp, "*_scene_plan.txt")
+        missing = get_json_resource(os.path.join(tmp, "missing.json"), default=[])
+
+    ok = len(before) == 1 and cached is before and len(after) == 2 and missing == []
+    assert ok, f"Unexpected examples: before={before}, after={after}, metrics={get_registry().get_metrics()}"
+    print("✅ Examples cached and refreshed when a new file appears")
+
+
+if __name__ == "__main__":
+    print("🚀 Starting Resource Registry Tests...")
+    print("=" * 50)
+
+    results = {}
+    for name, test in [
+        ("Mtime invalidation", test_loaded_once_until_file_changes),
+        ("Example discovery", test_context_examples_notice_new_files),
+    ]:
+        try:
+            test()
+            results[name] = True
+        except AssertionError as e:
+            print(f"❌ {e}")
+            results[name] = False
+
+    print("\n" + "=" * 50)
+    print("🏁 Test Results Summary:")
+    for name, passed in results.items():
+        print(f"{name}: {'✅ PASSED' if passed else '❌ FAILED'}")
+    raise SystemExit(0 if all(results.values()) else 1)
@@ -0,0 +1,127 @@
+"""
+Test script for in-flight request coalescing.
+
+Fires identical requests concurrently at a slow fake model and checks that
+only one provider call is made while every caller gets the result, that
+sampled or streamed requests are not merged, and that sampled helper stages
+are coalesced through the pipeline's routed helper model.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mllm_tools.router import ModelRouter
+from mllm_tools.single_flight import SingleFlight, CoalescingModelWrapper, with_coalescing
+
+
+class SlowFakeModel:
+    """Stands in for a model wrapper; counts how often it is really called."""
+
+    def __init__(self, temperature=0.0):
+        self.model_name = "fake/model"
+        self.temperature = temperature
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, messages, metadata=None, stop_predicate=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(0.3)
+        return "answer to " + messages[0]["content"]
+
+
+def test_identical_requests_share_one_call():
+    """Identical concurrent requests should trigger a single model call."""
+    print("Testing identical concurrent requests...")
+    model = SlowFakeModel()
+    wrapped = CoalescingModelWrapper(model, SingleFlight())
+    messages = [{"type": "text", "content": "detect plugins"}]
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        results = list(pool.map(lambda i: wrapped(messages, metadata={"trace_id": str(i)}), range(5)))
+
+    assert model.calls == 1 and len(set(results)) == 1, \
+        f"Expected 1 call and 1 distinct result, got {model.calls} calls and {set(results)}"
+    print("✅ 5 callers shared 1 model call")
+
+
+def test_different_requests_are_not_merged():
+    """Different prompts must each reach the model."""
+    print("Testing distinct concurrent requests...")
+    model = SlowFakeModel()
+    wrapped = CoalescingModelWrapper(model, SingleFlight())
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = list(pool.map(lambda i: wrapped([{"type": "text", "content": f"prompt {i}"}]), range(3)))
+
+    assert model.calls == 3 and len(set(results)) == 3, f"Expected 3 calls, got {model.calls}"
+    print("✅ Distinct prompts were sent separately")
+
+
+def test_sampled_and_streamed_requests_are_not_merged():
+    """Requests with temperature above 0 or a stop predicate must each reach the model."""
+    print("Testing sampled and streamed requests...")
+    messages = [{"type": "text", "content": "write the scene"}]
+    sampled = SlowFakeModel(temperature=0.7)
+    wrapped = CoalescingModelWrapper(sampled, SingleFlight())
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        list(pool.map(lambda i: wrapped(messages), range(3)))
+
+    streamed = SlowFakeModel()
+    wrapped = CoalescingModelWrapper(streamed, SingleFlight())
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        list(pool.map(lambda i: wrapped(messages, stop_predicate=lambda text: False), range(3)))
+
+    assert sampled.calls == 3 and streamed.calls == 3, \
+        f"Expected 3 calls each, got {sampled.calls} sampled and {streamed.calls} streamed"
+    print("✅ Sampled and streamed requests were sent separately")
+
+
+def test_sampled_helper_stages_coalesced_in_pipeline():
+    """Helper stages should share one call through the routed helper model even at temperature 0.7."""
+    print("Testing sampled helper stages...")
+    fast, lite = SlowFakeModel(temperature=0.7), SlowFakeModel(temperature=0.7)
+    # Built like VideoGenerator's helper model: routed tiers behind the coalescing proxy
+    helper = with_coalescing(ModelRouter({"fast": fast, "lite": lite}), SingleFlight())
+    messages = [{"type": "text", "content": "which plugins fit this topic?"}]
+
+    def call(stage):
+        return lambda i: helper(messages, metadata={"generation_name": stage, "trace_id": str(i)})
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        plugins = list(pool.map(call("detect-relevant-plugins"), range(2)))
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        list(pool.map(call("rag_query_generation_code"), range(2)))
+    helper_calls = fast.calls + lite.calls
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        list(pool.map(call("code_generation"), range(2)))
+
+    assert helper_calls == 2 and fast.calls + lite.calls == 4 and len(set(plugins)) == 1, \
+        f"Expected 1 provider call per helper stage and 2 for code generation, got {helper_calls} then {fast.calls + lite.calls}"
+    print("✅ Concurrent helper calls reached the provider once, sampled code generation was not merged")
+
+
+if __name__ == "__main__":
+    print("🚀 Starting Single-Flight Tests...")
+    print("=" * 50)
+
+    results = {}
+    for name, test in [
+        ("Coalescing", test_identical_requests_share_one_call),
+        ("Isolation", test_different_requests_are_not_merged),
+        ("Sampling and streaming", test_sampled_and_streamed_requests_are_not_merged),
+        ("Helper stages", test_sampled_helper_stages_coalesced_in_pipeline),
+    ]:
+        try:
+            test()
+            results[name] = True
+        except AssertionError as e:
+            print(f"❌ {e}")
+            results[name] = False
+
+    print("\n" + "=" * 50)
+    print("🏁 Test Results Summary:")
+    for name, passed in results.items():
+        print(f"{name}: {'✅ PASSED' if passed else '❌ FAILED'}")
+    raise SystemExit(0 if all(results.values()) else 1)
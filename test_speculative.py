@@ -0,0 +1,86 @@
+"""
+Test script for speculative best-of-N code generation.
+
+Checks that candidate racing keeps the first success and cancels the rest,
+and that the policy spends more candidates on difficulty levels that rarely
+render on the first try.
+"""
+
+import asyncio
+import os
+import tempfile
+
+from src.core.speculative import SpeculationPolicy, race_candidates, preflight_code
+
+
+def test_first_success_wins_and_rest_cancelled():
+    """The fastest successful candidate should win and slower ones be cancelled."""
+    print("Testing candidate racing...")
+    cancelled = []
+
+    def candidate(index, delay, error):
+        async def run():
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(index)
+                raise
+            return f"code {index}", error
+        return run
+
+    candidates = [candidate(0, 0.05, "boom"), candidate(1, 0.1, None), candidate(2, 1.0, None)]
+    winner, results = asyncio.run(race_candidates(candidates))
+
+    assert winner == 1 and cancelled == [2] and 2 not in results, \
+        f"Expected candidate 1 to win and 2 to be cancelled, got winner={winner}, cancelled={cancelled}"
+    print("✅ Candidate 1 won, candidate 2 was cancelled")
+
+
+def test_policy_adapts_to_success_rate():
+    """Easy levels should converge to one candidate, hard levels to the maximum."""
+    print("Testing speculation policy...")
+    with tempfile.TemporaryDirectory() as tmp:
+        policy = SpeculationPolicy(os.path.join(tmp, "stats.json"), max_candidates=3, target_success=0.9, min_samples=5)
+        unseen = policy.num_candidates("easy")
+        for _ in range(20):
+            policy.record("easy", True)
+            policy.record("hard", False)
+        reloaded = SpeculationPolicy(os.path.join(tmp, "stats.json"), max_candidates=3, target_success=0.9, min_samples=5)
+        easy, hard = reloaded.num_candidates("easy"), reloaded.num_candidates("hard")
+
+    assert (unseen, easy, hard) == (3, 1, 3), f"Expected 3/1/3 candidates, got unseen={unseen}, easy={easy}, hard={hard}"
+    print("✅ Policy explores unseen levels and adapts to recorded success rates")
+
+
+def test_preflight_rejects_broken_code():
+    """Syntax errors and code without a Scene should not reach a render slot."""
+    print("Testing preflight checks...")
+    good = "from manim import *\nclass Demo(Scene):\n    def construct(self):\n        pass\n"
+    assert preflight_code(good) is None, "Valid scene code was rejected"
+    assert preflight_code("def broken(:"), "Syntax error was not caught"
+    assert preflight_code("x = 1"), "Code without a Scene was not caught"
+    print("✅ Preflight checks behave as expected")
+
+
+if __name__ == "__main__":
+    print("🚀 Starting Speculative Generation Tests...")
+    print("=" * 50)
+
+    results = {}
+    for name, test in [
+        ("Racing", test_first_success_wins_and_rest_cancelled),
+        ("Policy", test_policy_adapts_to_success_rate),
+        ("Preflight", test_preflight_rejects_broken_code),
+    ]:
+        try:
+            test()
+            results[name] = True
+        except AssertionError as e:
+            print(f"❌ {e}")
+            results[name] = False
+
+    print("\n" + "=" * 50)
+    print("🏁 Test Results Summary:")
+    for name, passed in results.items():
+        print(f"{name}: {'✅ PASSED' if passed else '❌ FAILED'}")
+    raise SystemExit(0 if all(results.values()) else 1)
@@ -0,0 +1,147 @@
+"""
+Test script for the persistent Tavily search and extraction cache.
+
+Uses a fake Tavily client that counts calls to check that a recurring error
+is answered from the cache under its normalized query, that extracted pages
+are reused by URL, that entries expire after their TTL, and that per-stage
+latency is recorded.
+"""
+
+import os
+import tempfile
+import time
+
+from src.utils import tavily_search
+from src.utils.tavily_cache import TavilyCache, normalize_query
+from src.utils.tavily_search import TavilyErrorSearchEngine
+
+TRACEBACK = """Traceback (most recent call last):
+  File "scene.py", line 12, in construct
+    side = triangle.get_side_length()
+AttributeError: 'Polygon' object has no attribute 'get_side_length'"""
+
+
+class FakeTavilyClient:
+    """Counts search and extract calls and returns canned results."""
+
+    def __init__(self):
+        self.searches = 0
+        self.extracted = []
+
+    def search(self, query, **kwargs):
+        self.searches += 1
+        return {"answer": "Compute side lengths from get_vertices()", "results": [
+            {"title": "Polygon", "url": "https://docs.manim.community/polygon", "content": "...", "score": 0.9},
+            {"title": "Issue", "url": "https://github.com/ManimCommunity/manim/issues/1", "content": "...", "score": 0.8},
+        ]}
+
+    def extract(self, urls, **kwargs):
+        self.extracted.extend(urls)
+        return {"results": [{"url": url, "raw_content": f"content of {url}"} for url in urls]}
+
+
+def _engine(cache):
+    tavily_search.TAVILY_AVAILABLE = True  # the fake client stands in for tavily-python
+    engine = TavilyErrorSearchEngine(cache=cache)
+    engine.client = FakeTavilyClient()
+    return engine
+
+
+def test_normalize_query():
+    """Case, whitespace, paths and numbers should not change the cache key, word order should."""
+    print("Testing query normalization...")
+    first = normalize_query("Manim TypeError: expected int, got str in /home/a/scene.py line 12 site:docs.manim.community")
+    second = normalize_query("manim  typeerror: expected int, got str in /tmp/b/scene.py line 7\nsite:docs.manim.community")
+    swapped = normalize_query("Manim TypeError: expected str, got int in /home/a/scene.py line 12 site:docs.manim.community")
+    assert first == second and first != swapped and "site:docs.manim.community" in first, \
+        f"Unexpected normalization: {first!r}, {second!r}, {swapped!r}"
+    print("✅ Equivalent queries share a cache key, reordered ones do not")
+
+
+def test_recurring_error_uses_cache():
+    """A recurring error should be resolved from cache, across engines sharing the database."""
+    print("Testing recurring errors...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tavily_cache.db")
+        first = _engine(TavilyCache(path))
+        analysis = first.analyze_error_for_search(TRACEBACK)
+        signature = analysis.search_query
+        analysis.search_query = "manim polygon side length"  # as if generated by the LLM
+        fresh = first.search_for_solution(analysis, cache_aliases=[signature])
+
+        second = _engine(TavilyCache(path))
+        reused = second.cached_solution(second.analyze_error_for_search(TRACEBACK))
+        miss = second.cached_solution(second.analyze_error_for_search("TypeError: Circle.__init__() got an unexpected keyword argument 'size'"))
+        metrics = second.get_stage_metrics()
+
+    ok = (first.client.searches == 1 and len(first.client.extracted) == 2
+          and reused is not None and second.client.searches == 0 and second.client.extracted == []
+          and all(solution["extracted_content"] for solution in reused["solutions"])
+          and reused["answer"] == fresh["answer"] and miss is None
+          and metrics["search"]["cache_hits"] == 1 and metrics["extract"]["cache_hits"] == 1)
+    assert ok, f"Unexpected calls: reused={reused is not None}, miss={miss}, metrics={metrics}"
+    print("✅ Recurring error answered from cache without search or extraction calls")
+
+
+def test_extractions_reused_by_url_and_expiry():
+    """Pages should be extracted once per URL, and expired entries should be fetched again."""
+    print("Testing URL cache and expiry...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = TavilyCache(os.path.join(tmp, "tavily_cache.db"), search_ttl=0.2, extract_ttl=60)
+        engine = _engine(cache)
+        first = engine.analyze_error_for_search(TRACEBACK)
+        engine.search_for_solution(first)
+        other = engine.analyze_error_for_search("ValueError: all input arrays must have same number of dimensions")
+        engine.search_for_solution(other)
+        time.sleep(0.25)
+        engine.search_for_solution(engine.analyze_error_for_search(TRACEBACK))
+        removed = cache.purge_expired()
+        metrics = engine.get_stage_metrics()
+
+    ok = (engine.client.searches == 3 and len(engine.client.extracted) == 2 and removed == 1
+          and metrics["search"]["calls"] == 3 and metrics["extract"]["calls"] == 3)
+    assert ok, (f"Unexpected calls: searches={engine.client.searches}, extracted={engine.client.extracted}, "
+                f"removed={removed}, metrics={metrics}")
+    print("✅ Pages extracted once per URL, expired searches fetched again")
+
+
+def test_cache_probe_has_no_side_effects():
+    """Probing for a cached search (the hedge rule of the fix strategies) should not count hits or misses."""
+    print("Testing cache probe...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = TavilyCache(os.path.join(tmp, "tavily_cache.db"))
+        engine = _engine(cache)
+        analysis = engine.analyze_error_for_search(TRACEBACK)
+        before = engine.has_cached_solution(analysis)
+        engine.search_for_solution(analysis)
+        after = engine.has_cached_solution(analysis)
+        stats = dict(cache.stats)
+
+    ok = not before and after and stats.get("search_hits", 0) == 0 and stats.get("search_misses", 0) == 1
+    assert ok, f"Unexpected probe: before={before}, after={after}, stats={stats}"
+    print("✅ Cached searches detected without touching hit/miss counts")
+
+
+if __name__ == "__main__":
+    print("🚀 Starting Tavily Cache Tests...")
+    print("=" * 50)
+
+    results = {}
+    for name, test in [
+        ("Query normalization", test_normalize_query),
+        ("Recurring errors", test_recurring_error_uses_cache),
+        ("URL cache and expiry", test_extractions_reused_by_url_and_expiry),
+        ("Cache probe", test_cache_probe_has_no_side_effects),
+    ]:
+        try:
+            test()
+            results[name] = True
+        except AssertionError as e:
+            print(f"❌ {e}")
+            results[name] = False
+
+    print("\n" + "=" * 50)
+    print("🏁 Test Results Summary:")
+    for name, passed in results.items():
+        print(f"{name}: {'✅ PASSED' if passed else '❌ FAILED'}")
+    raise SystemExit(0 if all(results.values()) else 1)